@@ -0,0 +1,10 @@
+"""
+Benchmarks for frappy.
+
+Each bench_* module can be run on its own, i.e.:
+
+    python -m benchmarks.bench_pool
+
+None of them need network access, anything talking HTTP uses the local
+stand-in server from benchmarks.server.
+"""
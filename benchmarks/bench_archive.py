@@ -0,0 +1,91 @@
+"""
+Archiving 200k tweets: size on disk and time to write, reopen and look up
+tweets by id, text format of twitter-log versus TweetArchive.
+"""
+
+from __future__ import print_function
+
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from frappy.services.twitter.archive import TweetArchive
+
+N_TWEETS = 200000
+N_LOOKUPS = 10000
+
+TWEETS = [{'id': 300000000 + i * 7,
+           'created_at': 'Wed Aug 27 13:08:45 +0000 2008',
+           'in_reply_to_status_id': 300000000 + i * 7 - 7 if i % 5 else None,
+           'user': {'screen_name': 'durden'},
+           'text': u'Tweet number %i about frappy and the web' % i}
+          for i in range(N_TWEETS, 0, -1)]
+
+
+def write_text(path):
+    with open(path, 'w') as out:
+        for tweet in TWEETS:
+            out.write("%s %s\nDate: %s\n" % (tweet['user']['screen_name'],
+                                             tweet['id'],
+                                             tweet['created_at']))
+            if tweet['in_reply_to_status_id']:
+                out.write("In-Reply-To: %s\n" % tweet['in_reply_to_status_id'])
+            out.write("\n    %s\n\n\n" % tweet['text'])
+
+
+def scan_text(path, ids):
+    """Find tweets with ids the only way the text format allows: a scan"""
+
+    found = 0
+    with open(path) as archive:
+        for line in archive:
+            if line.startswith('durden ') and int(line.split()[1]) in ids:
+                found += 1
+    return found
+
+
+def main():
+    directory = tempfile.mkdtemp()
+    ids = set(random.sample([tweet['id'] for tweet in TWEETS], N_LOOKUPS))
+
+    try:
+        text_path = os.path.join(directory, 'tweets.txt')
+        start = time.time()
+        write_text(text_path)
+        print("text:    write %.2fs, %6.1f MB" % (
+            time.time() - start, os.path.getsize(text_path) / 1e6))
+
+        start = time.time()
+        scan_text(text_path, ids)
+        print("text:    %i lookups by scanning %.2fs" % (N_LOOKUPS,
+                                                         time.time() - start))
+
+        archive_path = os.path.join(directory, 'archive')
+        start = time.time()
+        with TweetArchive(archive_path) as archive:
+            for tweet in TWEETS:
+                archive.append(tweet)
+        size = sum(os.path.getsize(os.path.join(archive_path, name))
+                   for name in os.listdir(archive_path))
+        print("archive: write %.2fs, %6.1f MB" % (time.time() - start,
+                                                  size / 1e6))
+
+        start = time.time()
+        with TweetArchive(archive_path) as archive:
+            resume_from = archive.max_id
+            opened = time.time()
+            for tweet_id in ids:
+                archive.get(tweet_id)
+            looked_up = time.time()
+        print("archive: reopen and resume from %i in %.4fs" % (
+            resume_from, opened - start))
+        print("archive: %i lookups by id %.2fs" % (
+            N_LOOKUPS, looked_up - opened))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
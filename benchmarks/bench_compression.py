@@ -0,0 +1,92 @@
+"""
+Bytes on the wire and calls/sec for a large JSON listing and a large gist
+upload against a local server, uncompressed and compressed.
+
+Over loopback compression only costs CPU time, the savings show up in the
+bytes (and on slow or metered links in the time).
+"""
+
+from __future__ import print_function
+
+import gzip
+import json
+import time
+import zlib
+
+from frappy.services.github import Github
+
+from benchmarks.server import StandInHandler, start_server
+
+COMMITS = json.dumps([{'sha': '%040x' % i,
+                       'commit': {'message': 'Commit number %i' % i,
+                                  'author': {'name': 'Luke Lee',
+                                             'date': '2011-07-02T10:00:00Z'}}}
+                      for i in range(2000)]).encode('utf8')
+
+FILES = {'frappy.py': {'content': open(__file__).read() * 20}}
+
+
+class CompressingHandler(StandInHandler):
+    """Serve COMMITS, compressed when asked for, and read any body"""
+
+    def _respond(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        if self.headers.get('Content-Encoding') == 'gzip':
+            gzip.decompress(body)
+
+        content = COMMITS
+        encoding = None
+        accepted = self.headers.get('Accept-Encoding') or ''
+        if 'gzip' in accepted:
+            content, encoding = gzip.compress(content, 6), 'gzip'
+        elif 'deflate' in accepted:
+            content, encoding = zlib.compress(content, 6), 'deflate'
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        if encoding:
+            self.send_header('Content-Encoding', encoding)
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    do_GET = do_HEAD = do_POST = do_PUT = do_PATCH = do_DELETE = _respond
+
+
+def measure(make_call, count):
+    start = time.time()
+    for _ in range(count):
+        call = make_call()
+    return call, count / (time.time() - start)
+
+
+def main(count=200):
+    server, domain = start_server(CompressingHandler)
+
+    for accept_encoding in ('identity', 'gzip', 'deflate'):
+        github = Github(domain=domain, secure=False)
+        github.accept_encoding = accept_encoding
+
+        call, rate = measure(
+            lambda: github.repos.durden.frappy.commits(), count)
+        call.response
+        print("listing %-8s %8i bytes in  (%7i decoded) %7.0f calls/s" % (
+                    accept_encoding, call.bytes_in, call.content_bytes_in,
+                    rate))
+
+    for compress_requests in (None, 'gzip'):
+        github = Github(domain=domain, secure=False,
+                        compress_requests=compress_requests)
+
+        call, rate = measure(
+            lambda: github.gists(files=FILES, method='post'), count)
+        print("gist    %-8s %8i bytes out (%7i content) %7.0f calls/s" % (
+                    compress_requests or 'identity', call.bytes_out,
+                    call.content_bytes_out, rate))
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
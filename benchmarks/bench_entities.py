@@ -0,0 +1,47 @@
+"""
+HTML entity decoding of a large batch of tweet texts: the old per-call
+regex built from name2codepoint versus htmlentitydecode and decode_many.
+"""
+
+from __future__ import print_function
+
+import re
+import time
+
+try:
+    from html.entities import name2codepoint
+except ImportError:
+    from htmlentitydefs import name2codepoint
+
+from frappy.core.util import htmlentitydecode, decode_many
+
+TEXTS = [
+    u'Just setting up my twttr',
+    u'Reading &quot;Python &amp; the web&quot; &#8212; so good &lt;3',
+    u'RT @durden: frappy now supports Github! http://t.co/abc123',
+    u'it&#39;s 5 &gt; 3 &#x263A;',
+] * 25000
+
+
+def old_htmlentitydecode(s):
+    return re.sub(
+        '&(%s);' % '|'.join(name2codepoint),
+        lambda m: chr(name2codepoint[m.group(1)]), s)
+
+
+def texts_per_sec(decode):
+    start = time.time()
+    decode(TEXTS)
+    return len(TEXTS) / (time.time() - start)
+
+
+def main():
+    print("old regex per call: %9.0f texts/s" % (texts_per_sec(
+        lambda texts: [old_htmlentitydecode(text) for text in texts])))
+    print("htmlentitydecode:   %9.0f texts/s" % (texts_per_sec(
+        lambda texts: [htmlentitydecode(text) for text in texts])))
+    print("decode_many:        %9.0f texts/s" % (texts_per_sec(decode_many)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Cost of recording request metrics: calls/sec against a local server and
+the pure overhead per call (with a stand-in pool answering instantly),
+without and with a RequestMetrics, followed by the metrics recorded.
+"""
+
+from __future__ import print_function
+
+import time
+
+from frappy.core.api import APICall
+from frappy.core.metrics import RequestMetrics
+
+from benchmarks.server import start_server
+
+
+class InstantResponse(object):
+    status_code = 200
+    headers = {}
+    content = b'{"login": "octocat"}'
+    url = 'http://localhost/users/octocat'
+
+
+class InstantPool(object):
+    """Pool answering every request right away without any I/O"""
+
+    def request(self, method, uri, **kwargs):
+        return InstantResponse()
+
+
+def calls_per_sec(call, count):
+    start = time.time()
+    for _ in range(count):
+        call.users.octocat(per_page=10).response
+    return count / (time.time() - start)
+
+
+def main(count=2000, overhead_count=50000):
+    server, domain = start_server()
+    metrics = RequestMetrics()
+
+    for pool, label, n in ((None, 'local server', count),
+                           (InstantPool(), 'no I/O', overhead_count)):
+        plain = APICall(None, 'json', domain, secure=False, pool=pool)
+        measured = APICall(None, 'json', domain, secure=False, pool=pool,
+                           metrics=metrics)
+
+        plain_rate = calls_per_sec(plain, n)
+        measured_rate = calls_per_sec(measured, n)
+        print("%-12s without metrics %8.0f calls/s, with %8.0f calls/s "
+              "(%.1f us/call)" % (label, plain_rate, measured_rate,
+                                  1e6 / measured_rate - 1e6 / plain_rate))
+
+    server.shutdown()
+
+    print()
+    print(metrics.to_prometheus())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+OAuth signatures/sec: Authorization headers from OAuth.generate_headers
+versus deriving the HMAC key for every request.
+"""
+
+from __future__ import print_function
+
+import base64
+import hashlib
+import hmac
+import time
+
+try:
+    from urllib.parse import quote
+except ImportError:
+    from urllib import quote
+
+from frappy.core.auth import OAuth
+
+URI = 'https://api.twitter.com/1/statuses/user_timeline.json'
+PARAMS = {'screen_name': 'durden', 'count': '200', 'include_rts': 'true'}
+
+
+class UncachedOAuth(OAuth):
+    """Signs requests with a freshly keyed HMAC each time"""
+
+    def _sign(self, base_url, method, enc_params):
+        key = self.consumer_secret + "&" + quote(self.token_secret, '')
+        message = '&'.join(quote(i, '') for i in [method.upper(), base_url,
+                                                  enc_params])
+        return base64.b64encode(hmac.new(
+                    key.encode('utf8'), message.encode('ascii'),
+                    hashlib.sha1).digest()).decode('ascii')
+
+
+def signatures_per_sec(auth, count):
+    start = time.time()
+    for _ in range(count):
+        auth.generate_headers(URI, 'get', PARAMS)
+    return count / (time.time() - start)
+
+
+def main(count=50000):
+    args = ('token', 'token_secret', 'consumer_key', 'consumer_secret')
+
+    print("HMAC keyed per request: %8.0f signatures/s" % (
+        signatures_per_sec(UncachedOAuth(*args), count)))
+    print("precomputed HMAC key:   %8.0f signatures/s" % (
+        signatures_per_sec(OAuth(*args), count)))
+
+
+if __name__ == "__main__":
+    main()
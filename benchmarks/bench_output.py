@@ -0,0 +1,92 @@
+"""
+Printing 100k tweets in the twitter-log text format to a file: the old way,
+with a print or printNicely call for every line, versus formatting whole
+tweets and writing them through an OutputBuffer.
+"""
+
+from __future__ import print_function
+
+import io
+import os
+import sys
+import tempfile
+import time
+
+from frappy.core.util import OutputBuffer
+from frappy.services.twitter.logger import format_tweet
+
+TWEETS = [{'id': 300000000 + i,
+           'created_at': 'Wed Aug 27 13:08:45 +0000 2008',
+           'in_reply_to_status_id': 300000000 + i - 1 if i % 5 else None,
+           'user': {'screen_name': 'durden'},
+           'text': u'Tweet number %i about frappy ☕\nand a second line' % i}
+          for i in range(100000)]
+
+
+def old_printNicely(string):
+    if hasattr(sys.stdout, 'buffer'):
+        sys.stdout.buffer.write(string.encode('utf8'))
+        print()
+    else:
+        print(string.encode('utf8'))
+
+
+def old_print_tweet(tweet):
+    print("%s %s\nDate: %s" % (tweet['user']['screen_name'],
+                               tweet['id'],
+                               tweet['created_at']))
+    if tweet.get('in_reply_to_status_id'):
+        print("In-Reply-To: %s" % tweet['in_reply_to_status_id'])
+    print()
+    for line in tweet['text'].splitlines():
+        old_printNicely('    ' + line)
+    print()
+    print()
+
+
+def tweets_per_sec(print_tweets, line_buffering):
+    """
+    Time print_tweets with stdout redirected to a file, line buffered like
+    a terminal or block buffered like a pipe
+    """
+
+    handle, path = tempfile.mkstemp()
+    os.close(handle)
+
+    stdout = sys.stdout
+    try:
+        out = io.TextIOWrapper(io.open(path, 'wb'), encoding='utf8',
+                               line_buffering=line_buffering)
+        sys.stdout = out
+        start = time.time()
+        print_tweets()
+        elapsed = time.time() - start
+    finally:
+        sys.stdout = stdout
+        out.close()
+        os.remove(path)
+
+    return len(TWEETS) / elapsed
+
+
+def main():
+    def old():
+        for tweet in TWEETS:
+            old_print_tweet(tweet)
+
+    def buffered():
+        output = OutputBuffer()
+        for tweet in TWEETS:
+            output.write(format_tweet(tweet))
+        output.flush()
+
+    for line_buffering in (False, True):
+        print("%s buffered stdout" % ('line' if line_buffering else 'block'))
+        print("  print per line:  %9.0f tweets/s" % (
+                                    tweets_per_sec(old, line_buffering)))
+        print("  OutputBuffer:    %9.0f tweets/s" % (
+                                    tweets_per_sec(buffered, line_buffering)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+Requests/sec through APICall with a pooled keep-alive session versus a new
+connection for every call (the old module-level requests.get behaviour).
+"""
+
+from __future__ import print_function
+
+import time
+
+from frappy.core.api import APICall
+from frappy.core.pool import ConnectionPool
+
+from benchmarks.server import start_server
+
+
+class UnpooledConnections(ConnectionPool):
+    """Pool which closes its connections after every request"""
+
+    def request(self, method, uri, **kwargs):
+        try:
+            return ConnectionPool.request(self, method, uri, **kwargs)
+        finally:
+            self.close()
+
+
+def requests_per_sec(call, count):
+    start = time.time()
+    for _ in range(count):
+        call.users.octocat()
+    return count / (time.time() - start)
+
+
+def main(count=2000):
+    server, domain = start_server()
+
+    pooled = APICall(None, 'json', domain, secure=False)
+    unpooled = APICall(None, 'json', domain, secure=False,
+                       pool=UnpooledConnections())
+
+    print("new connection per call: %8.1f req/s" % (
+        requests_per_sec(unpooled, count)))
+    print("pooled keep-alive:       %8.1f req/s" % (
+        requests_per_sec(pooled, count)))
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
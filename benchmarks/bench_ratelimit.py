@@ -0,0 +1,98 @@
+"""
+Requests sent, rejected and spread over time by RateLimiter policies against
+a local server emitting synthetic rate limit headers.
+"""
+
+from __future__ import print_function
+
+import threading
+import time
+
+from frappy.core.api import APICall, APIHTTPError
+from frappy.core.ratelimit import RateLimiter, RateLimitError
+
+from benchmarks.server import StandInHandler, start_server
+
+
+LIMIT = 50
+WINDOW = 2.0
+
+
+class RateLimitedHandler(StandInHandler):
+    """Allow LIMIT requests per WINDOW seconds, reject the rest with 403"""
+
+    lock = threading.Lock()
+    window_end = 0
+    used = 0
+
+    def _respond(self):
+        cls = RateLimitedHandler
+
+        with cls.lock:
+            now = time.time()
+            if now >= cls.window_end:
+                cls.window_end = now + WINDOW
+                cls.used = 0
+            cls.used += 1
+            remaining = LIMIT - cls.used
+            reset = cls.window_end
+
+        body = b'{}'
+        self.send_response(200 if remaining >= 0 else 403)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('x-ratelimit-limit', str(LIMIT))
+        self.send_header('x-ratelimit-remaining', str(max(remaining, 0)))
+        # Reset in seconds from now so sub-second windows work
+        self.send_header('x-ratelimit-reset', '%.3f' % (reset - time.time()))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = _respond
+
+
+def run(domain, policy, threads=8, per_thread=25):
+    limiter = None
+    if policy:
+        limiter = RateLimiter(policy)
+
+    call = APICall(None, 'json', domain, secure=False, rate_limiter=limiter)
+    counts = {'ok': 0, 'rejected': 0, 'failed fast': 0}
+    lock = threading.Lock()
+
+    def worker():
+        for _ in range(per_thread):
+            try:
+                call.users.octocat()
+                outcome = 'ok'
+            except RateLimitError:
+                outcome = 'failed fast'
+            except APIHTTPError:
+                outcome = 'rejected'
+            with lock:
+                counts[outcome] += 1
+
+    start = time.time()
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+
+    print("%-8s %5.2fs  %s" % (policy or 'none', time.time() - start,
+                              ', '.join('%s: %i' % item
+                                        for item in sorted(counts.items()))))
+
+
+def main():
+    server, domain = start_server(RateLimitedHandler)
+
+    for policy in (None, 'queue', 'block', 'fail'):
+        # Start every run in a fresh window
+        time.sleep(max(RateLimitedHandler.window_end - time.time(), 0))
+        run(domain, policy)
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
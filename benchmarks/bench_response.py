@@ -0,0 +1,83 @@
+"""
+CPU time and peak memory of APICall._handle_response on multi-MB
+Github-style JSON payloads.
+
+Compares eagerly decoding and re-encoding every response (what APICall used
+to do) with the lazy response, using the standard library and the fastest
+installed JSON backend.
+"""
+
+from __future__ import print_function
+
+import json
+import time
+import tracemalloc
+
+from frappy.core import jsonlib
+from frappy.core.api import APICall
+
+
+class FakeResponse(object):
+    status_code = 200
+    url = 'https://api.github.com/repos/durden/frappy/commits'
+
+    def __init__(self, content):
+        self.content = content
+        self.headers = {}
+
+
+def make_payload(commits=15000):
+    commit = {
+        'sha': '160185c313f7c49167ce122c85b13db527eeece2',
+        'url': 'https://api.github.com/repos/durden/frappy/commits/160185c',
+        'commit': {'message': 'Frappy supports Github! (use with caution..)',
+                   'author': {'name': 'Luke Lee', 'date': '2011-07-02'}},
+        'parents': [{'sha': 'b812be8c8dda041a694fd1560106e4ca9521bc18'}],
+        'stats': {'additions': 10, 'deletions': 2, 'total': 12},
+    }
+    return json.dumps([dict(commit, id=i) for i in range(commits)]).encode()
+
+
+def eager(call, resp):
+    # What _handle_response used to do for every call
+    response = json.loads(resp.content.decode('utf8'))
+    json.dumps(response)
+    return response
+
+
+def lazy(call, resp):
+    return call._handle_response(resp).response
+
+
+def measure(name, handle, content, rounds=10):
+    call = APICall(None, 'json', 'api.github.com')
+
+    start = time.process_time()
+    for _ in range(rounds):
+        handle(call, FakeResponse(content))
+    cpu = (time.process_time() - start) / rounds
+
+    tracemalloc.start()
+    handle(call, FakeResponse(content))
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    print("%-22s %7.1f ms/call  peak heap %6.1f MB" % (name, cpu * 1000,
+                                                  peak / 1048576.0))
+
+
+def main():
+    content = make_payload()
+    print("payload: %.1f MB" % (len(content) / 1048576.0))
+
+    measure('eager loads + dumps', eager, content)
+    measure('lazy (json)', lazy, content)
+
+    backend = jsonlib.use_fast_json()
+    if backend != 'json':
+        measure('lazy (%s)' % (backend), lazy, content)
+    jsonlib.use_backend('json')
+
+
+if __name__ == "__main__":
+    main()
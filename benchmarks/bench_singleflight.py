@@ -0,0 +1,66 @@
+"""
+Fanning out calls of which many are duplicates (as when looking up the
+authors of a batch of statuses) from a thread pool against a local server
+answering after a delay, without and with a SingleFlight: requests sent and
+wall time.
+"""
+
+from __future__ import print_function
+
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from frappy.core.singleflight import SingleFlight
+from frappy.services.github import Github
+
+from benchmarks.server import StandInHandler, start_server
+
+
+class SlowHandler(StandInHandler):
+    """Answer like StandInHandler after a delay, counting requests"""
+
+    delay = 0.05
+    count = 0
+    lock = threading.Lock()
+
+    def _respond(self):
+        with SlowHandler.lock:
+            SlowHandler.count += 1
+        time.sleep(self.delay)
+        StandInHandler._respond(self)
+
+    do_GET = do_HEAD = do_POST = do_PUT = do_PATCH = do_DELETE = _respond
+
+
+def fan_out(github, names, workers):
+    with ThreadPoolExecutor(workers) as executor:
+        return list(executor.map(lambda name: github.users(name).response,
+                                 names))
+
+
+def main(calls=2000, distinct=50, workers=32):
+    server, domain = start_server(SlowHandler)
+
+    # A few popular users are asked for over and over
+    rand = random.Random(0)
+    names = ['user%i' % (int(distinct * rand.random() ** 3))
+             for _ in range(calls)]
+
+    for label, flights in (('without', None), ('with', SingleFlight())):
+        github = Github(domain=domain, secure=False, single_flight=flights)
+
+        SlowHandler.count = 0
+        start = time.time()
+        fan_out(github, names, workers)
+        elapsed = time.time() - start
+
+        print("%-7s single flight: %5i calls, %5i requests, %.2fs" % (
+                    label, calls, SlowHandler.count, elapsed))
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
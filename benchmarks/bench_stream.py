@@ -0,0 +1,67 @@
+"""
+Messages/sec and peak memory of TwitterJSONIter over a recorded stream.
+
+    python -m benchmarks.bench_stream [size in MB]
+
+A synthetic recording of the requested size (default 300 MB) with a mix of
+newline framed tweets and keep-alive lines is written to a temporary file
+and fed through the iterator.
+"""
+
+from __future__ import print_function
+
+import io
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+
+from frappy.services.twitter.stream import TwitterJSONIter
+
+
+def make_recording(path, size):
+    tweet = {'id': 0, 'text': u'Streaming tweet ☃ ' * 6,
+             'created_at': 'Wed Aug 27 13:08:45 +0000 2008',
+             'user': {'screen_name': 'durden', 'location': 'Earth'}}
+
+    written = 0
+    with open(path, 'wb') as recording:
+        while written < size:
+            tweet['id'] += 1
+            line = json.dumps(tweet).encode('utf8') + b'\r\n'
+            if tweet['id'] % 100 == 0:
+                line += b'\r\n'
+            recording.write(line)
+            written += len(line)
+
+    return tweet['id']
+
+
+def main(size_mb=300):
+    fd, path = tempfile.mkstemp()
+    os.close(fd)
+
+    try:
+        expected = make_recording(path, size_mb * 1024 * 1024)
+
+        with io.open(path, 'rb') as recording:
+            start = time.time()
+            count = 0
+            for _ in TwitterJSONIter(recording, {}, read_size=65536):
+                count += 1
+            elapsed = time.time() - start
+    finally:
+        os.remove(path)
+
+    assert count == expected
+
+    print("%i messages in %.2fs: %.0f msgs/s, %.1f MB/s" % (
+        count, elapsed, count / elapsed, size_mb / elapsed))
+    print("peak RSS: %.1f MB" % (
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
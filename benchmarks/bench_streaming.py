@@ -0,0 +1,80 @@
+"""
+Peak memory and time of a call returning a large JSON array (about 50 MB)
+from a local server: buffered response, stream='items' and stream='raw'
+saved to a file.
+"""
+
+from __future__ import print_function
+
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.server import StandInHandler, start_server
+from frappy.core.api import APICall
+
+N_ITEMS = 150000
+
+ITEM = json.dumps({
+    'sha': '160185c313f7c49167ce122c85b13db527eeece2',
+    'url': 'https://api.github.com/repos/durden/frappy/commits/160185c',
+    'commit': {'message': 'Frappy supports Github! (use with caution..)',
+               'author': {'name': 'Luke Lee', 'date': '2011-07-02'}},
+    'parents': [{'sha': 'b812be8c8dda041a694fd1560106e4ca9521bc18'}],
+}).encode('utf8')
+
+
+class LargeArrayHandler(StandInHandler):
+    """Answer with a large JSON array, sent in chunks as it's generated"""
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        batch = b','.join([ITEM] * 100)
+        for i in range(0, N_ITEMS, 100):
+            chunk = (b'[' if i == 0 else b',') + batch
+            if i + 100 >= N_ITEMS:
+                chunk += b']'
+            self.wfile.write(b'%x\r\n%s\r\n' % (len(chunk), chunk))
+        self.wfile.write(b'0\r\n\r\n')
+
+
+def measure(name, consume):
+    start = time.time()
+    result = consume()
+    elapsed = time.time() - start
+
+    # Tracing allocations slows things down a lot, so it gets its own run
+    tracemalloc.start()
+    consume()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    print("%-22s %6.2f s  peak heap %7.1f MB  (%s)" % (
+                                name, elapsed, peak / 1048576.0, result))
+
+
+def main():
+    server, address = start_server(LargeArrayHandler)
+    api = APICall(None, 'json', address, secure=False)
+    handle, path = tempfile.mkstemp()
+    os.close(handle)
+
+    try:
+        measure('buffered', lambda: '%i items' % len(api.commits().response))
+        measure("stream='items'", lambda: '%i items' % sum(
+                                    1 for _ in api.commits(stream='items')))
+        measure("stream='raw' to file", lambda: '%i bytes' % (
+                                    api.commits(stream='raw').save(path)))
+    finally:
+        os.remove(path)
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
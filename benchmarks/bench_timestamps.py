@@ -0,0 +1,78 @@
+"""
+Rendering 100k statuses with -t -d (time and date stamps): the old
+get_time_string, using strptime and datetime for every status, versus the
+fast parser, first for new statuses and then again as refreshing does.
+"""
+
+from __future__ import print_function
+
+import datetime
+import time
+
+from frappy.services.twitter.cmdline import StatusFormatter, get_time_string
+
+N_STATUSES = 100000
+START = 1219842525
+
+STATUSES = [{'created_at': time.strftime("%a %b %d %H:%M:%S +0000 %Y",
+                                         time.gmtime(START + i * 37)),
+             'user': {'screen_name': 'durden'},
+             'text': 'Status number %i' % i}
+            for i in range(N_STATUSES)]
+
+OPTIONS = {'timestamp': True, 'datestamp': True}
+
+
+def old_get_time_string(status, options,
+                        format="%a %b %d %H:%M:%S +0000 %Y"):
+    timestamp = options["timestamp"]
+    datestamp = options["datestamp"]
+    t = time.strptime(status['created_at'], format)
+    i_hate_timezones = time.timezone
+    if (time.daylight):
+        i_hate_timezones = time.altzone
+    dt = datetime.datetime(*t[:-3]) - datetime.timedelta(
+        seconds=i_hate_timezones)
+    t = dt.timetuple()
+    if timestamp and datestamp:
+        return time.strftime("%Y-%m-%d %H:%M:%S ", t)
+    elif timestamp:
+        return time.strftime("%H:%M:%S ", t)
+    elif datestamp:
+        return time.strftime("%Y-%m-%d ", t)
+    return ""
+
+
+def statuses_per_sec(render):
+    start = time.time()
+    for status in STATUSES:
+        render(status, OPTIONS)
+    return N_STATUSES / (time.time() - start)
+
+
+def main():
+    for status in STATUSES[:1000]:
+        assert (old_get_time_string(status, OPTIONS) ==
+                get_time_string(status, OPTIONS))
+
+    def old_render(status, options):
+        return "%s%s %s" % (old_get_time_string(status, options),
+                            status['user']['screen_name'], status['text'])
+
+    print("strptime:           %9.0f statuses/s" % (
+                                            statuses_per_sec(old_render)))
+
+    formatter = StatusFormatter()
+    print("fast parser, new:   %9.0f statuses/s" % (
+                                            statuses_per_sec(formatter)))
+
+    # Refreshing renders (at most) the last couple of hundred statuses over
+    # and over again
+    del STATUSES[200:]
+    STATUSES.extend(STATUSES * (N_STATUSES // 200 - 1))
+    print("fast parser, again: %9.0f statuses/s" % (
+                                            statuses_per_sec(formatter)))
+
+
+if __name__ == "__main__":
+    main()
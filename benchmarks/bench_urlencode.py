@@ -0,0 +1,64 @@
+"""
+Parameter encodings/sec of urlencode_noplus versus the urllib.quote based
+implementation it replaced, on a typical signed request.
+"""
+
+from __future__ import print_function
+
+import time
+
+try:
+    import urllib.parse as urllib_parse
+except ImportError:
+    import urllib as urllib_parse
+
+from frappy.core.util import urlencode_noplus
+
+PARAMS = sorted({
+    'oauth_consumer_key': 'uS6hO2sV6tDKIOeVjhnFnQ',
+    'oauth_nonce': '8a1e4f4bd4c4af9f2c',
+    'oauth_signature_method': 'HMAC-SHA1',
+    'oauth_timestamp': '1318622958',
+    'oauth_token': '370773112-GmHxMAgYyLbNEtIKZeRNFsMKPR9EyMZeS9weJAEb',
+    'oauth_version': '1.0',
+    'status': u'Hello Ladies + Gentlemen, a signed OAuth request! ☃',
+    'include_entities': 'true',
+}.items())
+
+
+def quote_urlencode_noplus(query):
+    """Previous implementation"""
+
+    encoded_bits = []
+    for name, val in query:
+        if isinstance(name, str):
+            name = name.encode('utf-8')
+        else:
+            name = str(name)
+
+        if isinstance(val, str):
+            val = val.encode('utf-8')
+        else:
+            val = str(val)
+        encoded_bits.append("%s=%s" % (urllib_parse.quote(name, ""),
+                            urllib_parse.quote(val, "")))
+
+    return "&".join(encoded_bits)
+
+
+def encodings_per_sec(encode, count):
+    start = time.time()
+    for _ in range(count):
+        encode(PARAMS)
+    return count / (time.time() - start)
+
+
+def main(count=100000):
+    print("urllib quote:      %8.0f encodings/s" % (
+        encodings_per_sec(quote_urlencode_noplus, count)))
+    print("lookup table:      %8.0f encodings/s" % (
+        encodings_per_sec(urlencode_noplus, count)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Local HTTP stand-in for benchmarking API calls without network access.
+"""
+
+import json
+import threading
+import time
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Answer every request with a small JSON document"""
+
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def _respond(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            self.rfile.read(length)
+
+        body = json.dumps({'path': self.path,
+                           'method': self.command}).encode('utf8')
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('x-ratelimit-limit', '5000')
+        self.send_header('x-ratelimit-remaining', '4999')
+        self.send_header('x-ratelimit-reset', str(int(time.time()) + 3600))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_HEAD = do_POST = do_PUT = do_PATCH = do_DELETE = _respond
+
+
+class StandInServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+def start_server(handler=StandInHandler):
+    """Start server in background thread and return 'host:port' for it"""
+
+    server = StandInServer(('127.0.0.1', 0), handler)
+
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+
+    return server, '%s:%d' % server.server_address
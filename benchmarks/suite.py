@@ -0,0 +1,327 @@
+"""
+Offline benchmark suite, comparing results against stored baselines.
+
+    python -m benchmarks.suite [--save] [--baseline FILE] [--tolerance F]
+                               [--min-time SECONDS] [--repeat N] [name ...]
+
+Every benchmark is run --repeat times (default 3) for at least --min-time
+seconds (default 0.5), and the best run is reported in operations/sec.
+
+So results of different machines (and of one machine under different load)
+can be compared, every run is also scored relative to a calibration loop of
+plain Python run right before it: its ops/sec divided by the loops/sec of
+the calibration.  The median score of the runs counts.  Scores more than
+--tolerance (default 0.25, so 25%) lower than the baseline in --baseline
+(default benchmarks/baseline.json) are flagged as regressions, making the
+suite exit with status 1.  --save stores the scores as the new baseline
+instead.
+
+Startup is checked against fixed budgets rather than the baseline: the
+statements in IMPORT_BUDGETS are run with `python -X importtime` and fail
+when importing frappy takes longer than their budget or loads any of the
+modules they must not need.
+
+Calls go through a ReplayPool, so nothing touches the network.  Scores
+still vary somewhat between Python versions and CPUs, so keep the tolerance
+loose and save the baseline again when moving to another Python.
+"""
+
+from __future__ import print_function
+
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from getopt import gnu_getopt
+
+from frappy.core.auth import OAuth
+from frappy.core.transport import Cassette, ReplayPool
+from frappy.services.github import Github
+from frappy.services.twitter import Twitter
+from frappy.services.twitter.cmdline import StatusFormatter, _format_time
+from frappy.services.twitter.stream import TwitterJSONIter
+
+BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+# Name to (statement, milliseconds importing frappy may take, modules the
+# statement mustn't import)
+IMPORT_BUDGETS = {
+    'import_cli_help': (
+        "from frappy.services.twitter.cmdline import main; main(['help'])",
+        50, ('requests', 'aiohttp', 'asyncio', 'webbrowser', 'configparser',
+             'datetime')),
+    'import_cli': (
+        "import frappy.services.twitter.cmdline",
+        50, ('requests', 'aiohttp', 'asyncio')),
+    'import_twitter': (
+        "from frappy.services.twitter import Twitter",
+        100, ('aiohttp',)),
+}
+
+STATUSES = [{'id': 300000000 + i,
+             'created_at': time.strftime("%a %b %d %H:%M:%S +0000 %Y",
+                                         time.gmtime(1219842525 + i * 37)),
+             'in_reply_to_status_id': None,
+             'user': {'screen_name': 'durden', 'location': 'Earth'},
+             'text': u'Status number %i about frappy &amp; the web' % i}
+            for i in range(200)]
+
+COMMITS = [{'sha': '%040x' % i,
+            'url': 'https://api.github.com/repos/durden/frappy/commits/%x' % i,
+            'commit': {'message': 'Commit number %i' % i,
+                       'author': {'name': 'Luke Lee',
+                                  'date': '2011-07-02T10:00:00Z'}},
+            'parents': [{'sha': '%040x' % (i + 1)}]}
+           for i in range(100)]
+
+
+def make_cassette():
+    """Return cassette with the exchanges the call benchmarks make"""
+
+    cassette = Cassette()
+    cassette.add('get', 'https://api.github.com/repos/durden/frappy/commits'
+                 '?per_page=100', None, 200,
+                 {'Content-Type': 'application/json',
+                  'x-ratelimit-remaining': '4999'},
+                 json.dumps(COMMITS))
+    cassette.add('get', 'https://api.twitter.com/1/statuses/user_timeline.json'
+                 '?screen_name=durden&count=200', None, 200,
+                 {'Content-Type': 'application/json'},
+                 json.dumps(STATUSES))
+    return cassette
+
+
+def make_stream():
+    """Return recording of a stream of 1000 statuses, and its length"""
+
+    lines = [json.dumps(STATUSES[i % len(STATUSES)]).encode('utf8')
+             for i in range(1000)]
+    return b'\r\n'.join(lines) + b'\r\n', len(lines)
+
+
+def calibration():
+    """
+    Loop of plain Python (arithmetic, string formatting, dict and list
+    operations) other benchmarks are scored against
+    """
+
+    counts = {}
+    words = []
+    for i in range(100):
+        word = '%x' % (i * 7919)
+        counts[word[-1]] = counts.get(word[-1], 0) + len(word)
+        words.append(word)
+    ' '.join(words).split()
+    return 1
+
+
+def benchmarks():
+    """
+    Return dict of benchmarks, name to a function doing some operations and
+    returning how many it did
+    """
+
+    pool = ReplayPool(make_cassette())
+    github = Github(pool=pool)
+    twitter = Twitter(pool=pool, auth=OAuth('token', 'token secret',
+                                            'consumer key',
+                                            'consumer secret'))
+    oauth = twitter.auth
+    stream, n_messages = make_stream()
+    formatter = StatusFormatter()
+    options = {'timestamp': True, 'datestamp': True}
+
+    def uri_building():
+        call = github.repos.durden.frappy.commits
+        call._clone(call.missing_attrs)._prepare_call(per_page=100,
+                                                      sha='master')
+        return 1
+
+    def oauth_signing():
+        oauth.generate_headers(
+            'https://api.twitter.com/1/statuses/user_timeline.json', 'GET',
+            {'screen_name': 'durden', 'count': '200'})
+        return 1
+
+    def github_call_decode():
+        github.repos.durden.frappy.commits(per_page=100).response
+        return 1
+
+    def twitter_call_decode():
+        twitter.statuses.user_timeline(screen_name='durden',
+                                       count=200).response
+        return 1
+
+    def stream_parsing():
+        for _ in TwitterJSONIter(io.BytesIO(stream), {}):
+            pass
+        return n_messages
+
+    def cli_formatting():
+        # Time stamps of new statuses aren't cached yet
+        _format_time.cache_clear()
+        for status in STATUSES:
+            formatter(status, options)
+        return len(STATUSES)
+
+    return {
+        'uri_building': uri_building,
+        'oauth_signing': oauth_signing,
+        'github_call_decode': github_call_decode,
+        'twitter_call_decode': twitter_call_decode,
+        'stream_parsing': stream_parsing,
+        'cli_formatting': cli_formatting,
+    }
+
+
+def rate(benchmark, min_time):
+    """Run benchmark for at least min_time seconds and return ops/sec"""
+
+    ops = 0
+    start = time.perf_counter()
+    while True:
+        ops += benchmark()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            return ops / elapsed
+
+
+def measure(benchmark, min_time, repeat):
+    """
+    Run benchmark repeat times for at least min_time seconds, each run
+    right after a run of the calibration loop, and return the best ops/sec,
+    which is the least disturbed by anything else going on, and the median
+    score
+    """
+
+    # Warm up caches, lazy imports, etc.
+    calibration()
+    benchmark()
+
+    rates = []
+    scores = []
+    for _ in range(repeat):
+        calibration_rate = rate(calibration, min_time)
+        rates.append(rate(benchmark, min_time))
+        scores.append(rates[-1] / calibration_rate)
+
+    return max(rates), sorted(scores)[len(scores) // 2]
+
+
+def import_time(statement, repeat):
+    """
+    Run statement in a fresh interpreter with `-X importtime` repeat times
+    and return the best time spent importing frappy (in milliseconds) and
+    the set of all modules imported
+    """
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+                            [root] + [p for p in [env.get('PYTHONPATH')] if p])
+
+    best = None
+    modules = set()
+    with tempfile.TemporaryDirectory() as home:
+        # No config or oauth files to read
+        env['HOME'] = home
+
+        for _ in range(repeat):
+            proc = subprocess.run([sys.executable, '-X', 'importtime', '-c',
+                                   statement], env=env, cwd=home,
+                                  stdout=subprocess.DEVNULL,
+                                  stderr=subprocess.PIPE,
+                                  universal_newlines=True, check=True)
+
+            total = 0
+            for line in proc.stderr.splitlines():
+                if not line.startswith('import time:'):
+                    continue
+                _, cumulative, name = line[len('import time:'):].split('|')
+                if not cumulative.strip().isdigit():
+                    # Header
+                    continue
+                modules.add(name.strip())
+                # Top-level imports include the time of everything they
+                # imported in turn
+                if name.startswith(' frappy'):
+                    total += int(cumulative)
+
+            if best is None or total < best:
+                best = total
+
+    return best / 1000.0, modules
+
+
+def main(args=sys.argv[1:]):
+    opts, names = gnu_getopt(args, '', ['save', 'baseline=', 'tolerance=',
+                                        'min-time=', 'repeat='])
+    opts = dict(opts)
+
+    baseline_path = opts.get('--baseline', BASELINE)
+    tolerance = float(opts.get('--tolerance', 0.25))
+    min_time = float(opts.get('--min-time', 0.5))
+    repeat = int(opts.get('--repeat', 3))
+
+    baseline = {}
+    if os.path.exists(baseline_path):
+        with open(baseline_path) as baseline_file:
+            baseline = json.load(baseline_file)
+
+    all_benchmarks = benchmarks()
+
+    results = {}
+    regressions = []
+    for name in names or sorted(all_benchmarks):
+        if name not in all_benchmarks:
+            continue
+
+        ops, score = measure(all_benchmarks[name], min_time, repeat)
+        results[name] = float('%.4g' % (score))
+
+        line = "%-22s %12.0f ops/s  score %8.4g" % (name, ops, results[name])
+        if name in baseline:
+            ratio = results[name] / baseline[name]
+            line += "  %6.1f%% of baseline" % (ratio * 100)
+            if ratio < 1 - tolerance:
+                line += "  REGRESSION"
+                regressions.append(name)
+        print(line)
+
+    for name in sorted(IMPORT_BUDGETS):
+        if names and name not in names:
+            continue
+
+        statement, budget, unwanted = IMPORT_BUDGETS[name]
+        milliseconds, modules = import_time(statement, repeat)
+
+        line = "%-22s %12.1f ms     budget %i ms" % (name, milliseconds,
+                                                      budget)
+        imported = sorted(set(unwanted) & modules)
+        if milliseconds > budget or imported:
+            line += "  OVER BUDGET"
+            if imported:
+                line += " (imports %s)" % (', '.join(imported))
+            regressions.append(name)
+        print(line)
+
+    if '--save' in opts:
+        baseline.update(results)
+        with open(baseline_path, 'w') as baseline_file:
+            json.dump(baseline, baseline_file, indent=1, sort_keys=True)
+        print("Saved baseline to %s" % (baseline_path))
+        return 0
+
+    if regressions:
+        print("Regressions: %s" % (', '.join(regressions)))
+        return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
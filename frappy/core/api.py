@@ -2,27 +2,40 @@
 Base implementation of Frappy framework.
 """
 
+import time
 
+from frappy.core import jsonlib
 from frappy.core.auth import NoAuth
-import requests
+from frappy.core.compression import (ACCEPT_ENCODING, ENCODINGS, compress,
+                                     wire_size)
+from frappy.core.metrics import RequestSample
+from frappy.core.paginate import iter_pages, paginators
+from frappy.core.streaming import StreamingResponse, STREAM_MODES
+from frappy.core.util import urlencode_noplus
 
-try:
-    import json
-except ImportError:
-    import simplejson as json
+
+HTTP_METHODS = ('get', 'head', 'post', 'put', 'patch', 'delete', 'options')
+
+
+# Marks response content which hasn't been decoded yet
+_NOT_DECODED = object()
 
 
 class APIHTTPError(Exception):
     """
     Base Exception thrown by the APICall object when there is a
     general error interacting with the API.
+
+    `headers` holds the headers of the response, when there was one, i.e.
+    to find out when the rate limit resets.
     """
 
-    def __init__(self, status_code, uri):
+    def __init__(self, status_code, uri, headers=None):
         """Initalize error object"""
 
         self.status_code = status_code
         self.uri = uri
+        self.headers = headers if headers is not None else {}
 
         super(Exception, self).__init__()
 
@@ -40,9 +53,54 @@ class APICall(object):
     This class is very generic and should provide most of the send/retrieve
     functionality for API access.  Thus, you should be able to subclass it,
     and provide a basic __init__ method.
+
+    Each object sends its requests through a ConnectionPool so connections
+    are kept alive and reused between calls.  Pass the same `pool` to several
+    objects to share connections between them.
+
+    Pass a ResponseCache as `cache` to send conditional requests and reuse
+    unchanged responses, and a RateLimiter as `rate_limiter` to schedule
+    requests according to the rate limit headers of previous responses.
+    Pass a RequestMetrics as `metrics` to record timings and traffic of
+    every call (see frappy.core.metrics).
+
+    Attribute access and calls never modify the object they are made on.
+    Instead they return a new, lightweight object sharing the auth, pool and
+    configuration of the original, so a single object can safely be used from
+    many threads at once.
+
+    The raw body of a response is kept in `content` and only decoded when
+    `response` is first accessed.  Likewise, `response_json` is only created
+    when accessed.
+
+    Large responses can be streamed instead by passing stream='items' or
+    stream='raw' to a call, which then returns a StreamingResponse (see
+    frappy.core.streaming).
+
+    Responses are asked for compressed.  Request bodies are compressed
+    too when `compress_requests` is set to an encoding the API accepts them
+    in (see frappy.core.compression).
     """
 
-    def __init__(self, auth, req_format, domain, secure=True):
+    # Pagination scheme of the API used by paginate(), one of 'link',
+    # 'max_id', 'cursor' or 'page' (see frappy.core.paginate)
+    pagination = 'page'
+
+    # Accept-Encoding header sent with every request, None to leave it to
+    # the pool
+    accept_encoding = ACCEPT_ENCODING
+
+    # Request bodies smaller than this aren't worth compressing
+    compress_min_size = 1024
+
+    # Sizes of the request and response bodies of the call, as they went
+    # over the wire (compressed or not) and as content, set by every request
+    bytes_out = bytes_in = 0
+    content_bytes_out = content_bytes_in = 0
+
+    def __init__(self, auth, req_format, domain, secure=True, pool=None,
+                 cache=None, rate_limiter=None, metrics=None,
+                 single_flight=None, compress_requests=None):
 
         """Initialize call API object"""
 
@@ -50,6 +108,24 @@ class APICall(object):
         if auth is None:
             self.auth = NoAuth()
 
+        self.pool = pool
+        if pool is None:
+            # Imported here so importing this module (i.e. for its
+            # exceptions) doesn't load requests
+            from frappy.core.pool import ConnectionPool
+            self.pool = ConnectionPool()
+
+        self.cache = cache
+        self.rate_limiter = rate_limiter
+        self.metrics = metrics
+        self.single_flight = single_flight
+
+        if compress_requests is not None and compress_requests not in \
+                ENCODINGS:
+            raise ValueError("Unknown request compression '%s'" % (
+                                                        compress_requests))
+        self.compress_requests = compress_requests
+
         self.req_format = req_format
 
         secure_str = ''
@@ -62,11 +138,18 @@ class APICall(object):
         self.requested_uri = ""
         self.method = "get"
 
+        self.content = None
         self.response = None
         self.headers = {'request': {}, 'response': {}}
 
         self.missing_attrs = ()
 
+        # Stream mode of the request in progress, if any
+        self._stream = None
+
+        # Endpoint template of the request in progress, if measured
+        self._endpoint = None
+
     def __getattr__(self, k):
         """
         Look for attribute k in base object, other wise append to uri
@@ -77,8 +160,30 @@ class APICall(object):
         <domain>/statuses/public_timeline.
         """
 
-        self.missing_attrs += (k,)
-        return self
+        # Don't turn special method lookups (copy, pickle, etc.) into uri parts
+        if k.startswith('__') and k.endswith('__'):
+            raise AttributeError(k)
+
+        return self._clone(self.missing_attrs + (k,))
+
+    def _clone(self, missing_attrs=()):
+        """
+        Return new object sharing auth, pool and configuration with this one,
+        but with its own request state (uri, headers, response, etc.)
+        """
+
+        clone = object.__new__(self.__class__)
+        clone.__dict__.update(self.__dict__)
+
+        clone.uri = self.base_uri
+        clone.requested_uri = ""
+        clone.method = "get"
+        clone.content = None
+        clone.response = None
+        clone.headers = {'request': {}, 'response': {}}
+        clone.missing_attrs = missing_attrs
+
+        return clone
 
     def service_build_uri(self, *args, **kwargs):
         """
@@ -126,10 +231,10 @@ class APICall(object):
         # otherwise they'll just be appended at the end later
         return kwargs
 
-    def _handle_auth(self):
+    def _handle_auth(self, **kwargs):
         """
-        Setup authentication in headers and return properly encoded request
-        data
+        Setup authentication in headers for request to self.uri sending
+        kwargs as query string or form encoded data
         """
 
         if self.auth is None:
@@ -138,31 +243,210 @@ class APICall(object):
         self.headers['request'].clear()
         self.headers['response'].clear()
 
-        self.headers['request'].update(self.auth.generate_headers())
+        self.headers['request'].update(self.auth.generate_headers(
+                                            self.uri, self.method, kwargs))
 
     def _set_request_method(self, **kwargs):
-        """Set request method for response by passing in 'method' kwarg"""
+        """
+        Set request method for response by passing in 'method' kwarg and
+        return the other keyword arguments
+        """
+
         self.method = kwargs.pop('method', 'get')
+        return kwargs
 
     def __call__(self, *args, **kwargs):
+        """
+        Send off request on a copy of this object, so objects shared between
+        threads are never modified, and return the copy holding the response
+        """
+
+        return self._clone(self.missing_attrs)._request(*args, **kwargs)
+
+    def _request(self, *args, **kwargs):
         """
         Finish building uri with leftover arguments, append authentication, and
         send off request
         """
 
+        self._stream = kwargs.pop('stream', None)
+        if self._stream is not None and self._stream not in STREAM_MODES:
+            raise ValueError("Unknown stream mode '%s'" % (self._stream))
+
+        if self.metrics is not None:
+            return self._measured_request(args, kwargs)
+
+        kwargs = self._prepare_call(*args, **kwargs)
+        request_args = self._request_args(**kwargs)
+
+        key = self._flight_key(request_args)
+        if key is not None:
+            return self.single_flight.do(
+                            key, lambda: self._send_and_handle(request_args))
+
+        return self._send_and_handle(request_args)
+
+    def _send_and_handle(self, request_args):
+        """Send request with request_args and return the handled response"""
+
+        resp = self._send_request(request_args)
+
+        return self._handle_response(resp)
+
+    def _flight_key(self, request_args):
+        """
+        Return key identical requests in flight are coalesced by in
+        self.single_flight, or None if the request mustn't be coalesced
+        """
+
+        if (self.single_flight is None or self._stream is not None or
+                not self.request_method_is_safe()):
+            return None
+
+        return (self.method,
+                self.pool.full_uri(self.uri, request_args['params']),
+                self.auth.identity())
+
+    def _measured_request(self, args, kwargs):
+        """
+        Make request like _request does, recording how long every phase
+        took along with the traffic in self.metrics.
+
+        Requests answered with the response of an identical one in flight
+        aren't recorded, as they never went out.
+        """
+
+        phases = {}
+        request_args, key = self._measured_prepare(args, kwargs, phases)
+
+        if key is not None:
+            return self.single_flight.do(
+                    key, lambda: self._measured_send(request_args, phases))
+
+        return self._measured_send(request_args, phases)
+
+    def _measured_prepare(self, args, kwargs, phases):
+        """
+        Prepare call like _request does, adding how long that took to
+        phases, and return the request arguments and single flight key
+        """
+
+        self._endpoint = self._endpoint_template(args)
+
+        start = time.perf_counter()
+        try:
+            kwargs = self._prepare_call(*args, **kwargs)
+            phases['prepare'] = time.perf_counter() - start
+
+            request_args = self._request_args(**kwargs)
+            return request_args, self._flight_key(request_args)
+        except BaseException:
+            self.metrics.record(self._request_sample(phases, None))
+            raise
+
+    def _measured_send(self, request_args, phases):
+        """
+        Send request with request_args and return the handled response,
+        adding the durations of its phases to phases and recording them in
+        self.metrics
+        """
+
+        timer = time.perf_counter
+        resp = None
+
+        mark = timer()
+        try:
+            resp = self._send_request(request_args)
+            start, mark = mark, timer()
+            phases['send'] = mark - start
+
+            # Time until the headers were parsed, as measured by requests
+            elapsed = getattr(resp, 'elapsed', None)
+            if elapsed is not None:
+                phases['wait'] = min(elapsed.total_seconds(), phases['send'])
+
+            try:
+                return self._handle_response(resp)
+            finally:
+                phases['handle_response'] = timer() - mark
+        finally:
+            self.metrics.record(self._request_sample(phases, resp))
+
+    def _endpoint_template(self, args):
+        """
+        Return uri parts of call with ids and positional arguments replaced
+        by placeholders, so all calls of an endpoint are recorded together
+        """
+
+        parts = [':id' if part.isdigit() else part
+                 for part in self.missing_attrs]
+        parts.extend(':arg' for arg in args)
+
+        return '/'.join(parts)
+
+    def _request_sample(self, phases, resp):
+        """Return RequestSample of call answered by resp (None if it wasn't)"""
+
+        status = None
+        bytes_out = 0
+        bytes_in = 0
+
+        if resp is not None:
+            status = resp.status_code
+            bytes_out = self.bytes_out
+
+            # Streamed bodies haven't been read yet
+            if self._stream:
+                bytes_in = int(resp.headers.get('content-length') or 0)
+            else:
+                bytes_in = wire_size(resp, len(resp.content))
+
+        return RequestSample(self.method, self._endpoint, phases, status,
+                             bytes_out, bytes_in)
+
+    def _prepare_call(self, *args, **kwargs):
+        """
+        Build uri, request method and authentication for request and return
+        leftover keyword arguments to send as request data
+        """
+
         kwargs = self._build_uri(**kwargs)
 
         # Wrapper for child classes to customize creation of the uri
         kwargs = self.service_build_uri(*args, **kwargs)
 
-        self._set_request_method(**kwargs)
+        kwargs = self._set_request_method(**kwargs)
 
         # Append any authentication specified to request
-        self._handle_auth()
+        self._handle_auth(**kwargs)
 
-        resp = self._send_request(**kwargs)
+        return kwargs
 
-        return self._handle_response(resp)
+    def paginate(self, *args, **kwargs):
+        """
+        Return generator of the items on all pages of results for the call,
+        starting with the page args and kwargs request.  The next page is
+        fetched in the background while the current one is being consumed.
+
+        For example, all commits of a repository:
+
+            for commit in g.repos.durden.frappy.commits.paginate(per_page=100):
+                print(commit['sha'])
+
+        Pages are followed using the scheme of the service (`pagination`),
+        unless the call is made with `pagination` set to another one.
+        """
+
+        return iter_pages(self, self._paginator(kwargs), args, kwargs)
+
+    def _paginator(self, kwargs):
+        """Pop pagination from kwargs and return paginator for the scheme"""
+
+        pagination = kwargs.pop('pagination', None) or self.pagination
+        if pagination not in paginators:
+            raise ValueError("Unknown pagination scheme '%s'" % (pagination))
+
+        return paginators[pagination]()
 
     def _prepare_request_params(self, **kwargs):
         """Handle encoding or any special processing of request parameters"""
@@ -176,32 +460,85 @@ class APICall(object):
         """
         return self.method == 'get' or self.method == 'head'
 
-    def _send_request(self, **kwargs):
-        """Send request to self.uri with associated (encoded) data"""
+    def _request_args(self, **kwargs):
+        """
+        Verify request method and return the (encoded) data and headers to
+        send with request as keyword arguments for the pool
+        """
 
-        # Make it lowercase to b/c the methods in requests module are lowercase
+        # Keep lowercase to stay consistent w/ request_method_is_safe()
         self.method = self.method.lower()
-        method_call = getattr(requests, self.method, None)
 
-        if method_call is None:
+        if self.method not in HTTP_METHODS:
             raise AttributeError(
                             '%s not a supported HTTP method' % (self.method))
 
         arg_data = self._prepare_request_params(**kwargs)
+        headers = self.headers['request']
+
+        # Encode params the same way they were signed with (for OAuth)
+        if isinstance(arg_data, dict):
+            arg_data = urlencode_noplus(arg_data)
+
+            if not self.request_method_is_safe():
+                headers['Content-Type'] = 'application/x-www-form-urlencoded'
+
+        if self.accept_encoding:
+            headers.setdefault('Accept-Encoding', self.accept_encoding)
+
+        self.bytes_out = self.bytes_in = 0
+        self.content_bytes_out = self.content_bytes_in = 0
 
         # 'get' and 'head' take params to put in query string
         if self.request_method_is_safe():
-            resp = method_call(self.uri, params=arg_data,
-                               headers=self.headers['request'])
+            return {'params': arg_data, 'headers': headers}
 
+        if isinstance(arg_data, str):
+            arg_data = arg_data.encode('utf8')
+
+        self.content_bytes_out = self.bytes_out = len(arg_data or b'')
+
+        if (self.compress_requests is not None and
+                self.bytes_out >= self.compress_min_size):
+            arg_data = compress(arg_data, self.compress_requests)
+            headers['Content-Encoding'] = self.compress_requests
+            self.bytes_out = len(arg_data)
+
+        return {'data': arg_data, 'headers': headers}
+
+    def _send_request(self, request_args):
+        """
+        Send request to self.uri with request_args (as returned by
+        _request_args) and return the response
+        """
+
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire(self._rate_limit_key(), self.uri)
+
+        if self._stream:
+            # Streamed bodies are never held in memory, so can't be cached
+            resp = self.pool.request(self.method, self.uri, stream=True,
+                                     **request_args)
+        elif self.cache is not None and self.request_method_is_safe():
+            resp = self.cache.request(self.pool, self.method, self.uri,
+                                      self.auth.identity(), **request_args)
+        else:
+            resp = self.pool.request(self.method, self.uri, **request_args)
+
+        if self.rate_limiter is not None:
+            self.rate_limiter.update(self._rate_limit_key(), resp.headers)
+
+        if self.request_method_is_safe():
             # Update uri with full location (including query params encoded)
             self.uri = resp.url
-        else:
-            resp = method_call(self.uri, data=arg_data,
-                               headers=self.headers['request'])
 
         return resp
 
+    def _rate_limit_key(self):
+        """Key rate limits are tracked by, limits are per host and user"""
+
+        return (self.base_uri, self.auth.identity())
+
     def _handle_response(self, resp):
         """Verify response code and format data accordingly"""
 
@@ -211,20 +548,68 @@ class APICall(object):
         self._reset_uri()
 
         # 200 - ok, 201 - created
+        # Note 304 only makes it here when there was nothing cached for it
         if resp.status_code != 200 and resp.status_code != 201:
+            if self._stream:
+                resp.close()
             if (resp.status_code == 304):
                 return []
             else:
-                raise APIHTTPError(resp.status_code, self.requested_uri)
+                raise APIHTTPError(resp.status_code, self.requested_uri,
+                                   resp.headers)
 
-        if "json" == self.req_format:
-            self.response = json.loads(resp.content.decode('utf8'))
-            self.response_json = json.dumps(self.response)
-        else:
-            self.response = resp.content.decode('utf8')
+        if self._stream:
+            return StreamingResponse(resp, self._stream)
+
+        # Decoding is left until response is actually used
+        self.content = resp.content
+        self.content_bytes_in = len(self.content)
+        self.bytes_in = wire_size(resp, self.content_bytes_in)
+        self._response = _NOT_DECODED
+        self._response_json = None
 
         return self
 
+    @property
+    def response(self):
+        """
+        Response data, decoded from the raw content on first access.
+        """
+
+        if self._response is _NOT_DECODED:
+            # Only calls made through _measured_request have an endpoint
+            measured = self._endpoint is not None
+            if measured:
+                start = time.perf_counter()
+
+            if "json" == self.req_format:
+                self._response = jsonlib.loads(self.content)
+            else:
+                self._response = self.content.decode('utf8')
+
+            if measured:
+                self.metrics.record_phase(self.method, self._endpoint,
+                                          'decode',
+                                          time.perf_counter() - start)
+
+        return self._response
+
+    @response.setter
+    def response(self, value):
+        self._response = value
+        self._response_json = None
+
+    @property
+    def response_json(self):
+        """
+        Response data encoded as JSON, created on first access.
+        """
+
+        if self._response_json is None:
+            self._response_json = jsonlib.dumps(self.response)
+
+        return self._response_json
+
     def _reset_uri(self):
         """Clear active request uri to make way for another request"""
 
@@ -0,0 +1,317 @@
+"""
+Asyncio implementation of the Frappy framework.
+
+AsyncAPICall works exactly like APICall, including the uri building,
+service_build_uri hooks and authentication, except that calls return a
+coroutine which has to be awaited to get the response.
+"""
+
+import asyncio
+import functools
+import time
+
+from frappy.core.api import APICall
+from frappy.core.paginate import iter_pages_async
+
+# aiohttp takes longer to import than everything else together, so it's
+# only imported once the first asynchronous request is sent: False until
+# then, None when it isn't installed
+_aiohttp = False
+
+
+def _get_aiohttp():
+    """Return the aiohttp module, or None when it isn't installed"""
+
+    global _aiohttp
+
+    if _aiohttp is False:
+        try:
+            import aiohttp
+        except ImportError:
+            aiohttp = None
+        _aiohttp = aiohttp
+
+    return _aiohttp
+
+
+class AsyncResponse(object):
+    """
+    Fully read response of an asynchronous request, providing the parts of
+    the requests response interface APICall relies on.
+    """
+
+    def __init__(self, status_code, headers, content, url):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.url = url
+
+
+class AsyncConnectionPool(object):
+    """
+    Pool of keep-alive HTTP connections for asynchronous requests.
+
+    Requests are sent with an aiohttp ClientSession when aiohttp is
+    installed. `pool_maxsize` is the max number of connections open at once,
+    `limit_per_host` the max number of connections open to a single host and
+    `keepalive_timeout` the number of seconds idle connections are kept.
+
+    Without aiohttp, requests are sent through the blocking `pool` in the
+    event loop's default executor instead.  A `pool` that's passed in is
+    left open by close, it's up to its owner to close it.
+
+    Note the aiohttp session is bound to the event loop the first request
+    was made in, so don't share a pool between event loops.
+    """
+
+    def __init__(self, pool_maxsize=100, limit_per_host=10,
+                 keepalive_timeout=60, pool=None):
+
+        self.pool_maxsize = pool_maxsize
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+
+        self.pool = pool
+        self._owns_pool = pool is None
+        if pool is None:
+            from frappy.core.pool import ConnectionPool
+            self.pool = ConnectionPool(pool_maxsize=limit_per_host,
+                                       keepalive_timeout=keepalive_timeout)
+
+        self.session = None
+
+    def _get_session(self):
+        """Return aiohttp session, creating it on first use"""
+
+        aiohttp = _get_aiohttp()
+
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(
+                            limit=self.pool_maxsize,
+                            limit_per_host=self.limit_per_host,
+                            keepalive_timeout=self.keepalive_timeout)
+            self.session = aiohttp.ClientSession(connector=connector)
+
+        return self.session
+
+    async def request(self, method, uri, params=None, data=None,
+                      headers=None):
+        """Send request using a pooled connection and return the response"""
+
+        if _get_aiohttp() is None:
+            loop = asyncio.get_event_loop()
+            return await loop.run_in_executor(None, functools.partial(
+                            self.pool.request, method, uri, params=params,
+                            data=data, headers=headers))
+
+        # aiohttp only takes text headers, authenticators may generate bytes
+        headers = dict((_to_str(k), _to_str(v))
+                       for k, v in (headers or {}).items())
+
+        # params come encoded the way they were signed (for OAuth), which
+        # aiohttp would quote again, so pass the full uri on as encoded
+        uri = self.pool.full_uri(uri, params)
+
+        session = self._get_session()
+        async with session.request(method, _encoded_url(uri), data=data,
+                                   headers=headers) as resp:
+            content = await resp.read()
+            return AsyncResponse(resp.status, resp.headers, content,
+                                 str(resp.url))
+
+    async def close(self):
+        """Close all pooled connections"""
+
+        if self.session is not None:
+            await self.session.close()
+
+        if self._owns_pool:
+            self.pool.close()
+
+
+class AsyncAPICall(APICall):
+    """
+    Asynchronous version of APICall.
+
+    Calls build their request exactly like APICall but return a coroutine
+    which resolves to the response object once awaited, i.e.:
+
+        commit = await g.repos.durden.frappy.commits('160185c313f7')
+
+    Requests are sent through `async_pool`, an AsyncConnectionPool which is
+    created on the fly when not given.  A `cache` and `metrics` are used
+    just like with APICall.
+
+    This class is meant to be mixed in front of an existing service class to
+    create the asynchronous flavour of that service:
+
+        class AsyncGithub(AsyncAPICall, Github):
+            pass
+    """
+
+    def __init__(self, *args, **kwargs):
+
+        async_pool = kwargs.pop('async_pool', None)
+
+        super(AsyncAPICall, self).__init__(*args, **kwargs)
+
+        self.async_pool = async_pool
+        if async_pool is None:
+            self.async_pool = AsyncConnectionPool(pool=self.pool)
+            # Closing it closes the pool APICall created, but never one
+            # that was passed in
+            self.async_pool._owns_pool = kwargs.get('pool') is None
+
+    async def _request(self, *args, **kwargs):
+        """
+        Finish building uri with leftover arguments, append authentication, and
+        send off request
+        """
+
+        if kwargs.get('stream') is not None:
+            raise ValueError("Asynchronous calls can't stream responses")
+
+        if self.metrics is not None:
+            return await self._measured_request(args, kwargs)
+
+        kwargs = self._prepare_call(*args, **kwargs)
+        request_args = self._request_args(**kwargs)
+
+        key = self._flight_key(request_args)
+        if key is not None:
+            return await self.single_flight.do_async(
+                            key, lambda: self._send_and_handle(request_args))
+
+        return await self._send_and_handle(request_args)
+
+    async def _measured_request(self, args, kwargs):
+        """
+        Make request like _request does, recording how long every phase
+        took along with the traffic in self.metrics
+        """
+
+        phases = {}
+        request_args, key = self._measured_prepare(args, kwargs, phases)
+
+        if key is not None:
+            return await self.single_flight.do_async(
+                    key, lambda: self._measured_send(request_args, phases))
+
+        return await self._measured_send(request_args, phases)
+
+    async def _measured_send(self, request_args, phases):
+        """
+        Send request with request_args and return the handled response,
+        adding the durations of its phases to phases and recording them in
+        self.metrics
+        """
+
+        timer = time.perf_counter
+        resp = None
+
+        mark = timer()
+        try:
+            resp = await self._send_request(request_args)
+            start, mark = mark, timer()
+            phases['send'] = mark - start
+
+            try:
+                return self._handle_response(resp)
+            finally:
+                phases['handle_response'] = timer() - mark
+        finally:
+            self.metrics.record(self._request_sample(phases, resp))
+
+    async def _send_and_handle(self, request_args):
+        """Send request with request_args and return the handled response"""
+
+        resp = await self._send_request(request_args)
+
+        return self._handle_response(resp)
+
+    async def _send_request(self, request_args):
+        """
+        Send request to self.uri with request_args (as returned by
+        _request_args) and return the response
+        """
+
+        if self.rate_limiter is not None:
+            await self.rate_limiter.acquire_async(self._rate_limit_key(),
+                                                  self.uri)
+
+        if self.cache is not None and self.request_method_is_safe():
+            resp = await self.cache.request_async(self.async_pool,
+                                                  self.method, self.uri,
+                                                  self.auth.identity(),
+                                                  **request_args)
+        else:
+            resp = await self.async_pool.request(self.method, self.uri,
+                                                 **request_args)
+
+        if self.rate_limiter is not None:
+            self.rate_limiter.update(self._rate_limit_key(), resp.headers)
+
+        if self.request_method_is_safe():
+            # Update uri with full location (including query params encoded)
+            self.uri = resp.url
+
+        return resp
+
+    def paginate(self, *args, **kwargs):
+        """
+        Return asynchronous generator of the items on all pages of results
+        for the call, like APICall.paginate does:
+
+            async for commit in g.repos.durden.frappy.commits.paginate():
+                print(commit['sha'])
+        """
+
+        return iter_pages_async(self, self._paginator(kwargs), args, kwargs)
+
+    async def close(self):
+        """Close all connections of the pool used by this object"""
+
+        await self.async_pool.close()
+
+
+async def bounded_gather(calls, limit=100, return_exceptions=False):
+    """
+    Await all `calls` (coroutines or other awaitables) like asyncio.gather,
+    but never have more than `limit` of them running at once.  Results are
+    returned in the same order as `calls`.
+
+    This makes fanning out thousands of calls easy:
+
+        repos = await bounded_gather(
+                    [g.repos.durden(name) for name in names], limit=50)
+    """
+
+    semaphore = asyncio.Semaphore(limit)
+
+    async def bounded(call):
+        async with semaphore:
+            return await call
+
+    return await asyncio.gather(*[bounded(call) for call in calls],
+                                return_exceptions=return_exceptions)
+
+
+def _encoded_url(uri):
+    """Return uri as URL aiohttp sends as it is, without quoting it"""
+
+    # yarl comes with aiohttp
+    import yarl
+
+    return yarl.URL(uri, encoded=True)
+
+
+def _to_str(value):
+    """Decode bytes header names and values"""
+
+    if isinstance(value, bytes):
+        return value.decode('latin1')
+
+    return value
+
+
+__all__ = ["AsyncAPICall", "AsyncConnectionPool", "bounded_gather"]
@@ -6,12 +6,11 @@ calls
 from __future__ import print_function
 
 try:
-    import urllib.parse as urllib_parse
     from base64 import encodebytes
 except ImportError:
-    import urllib as urllib_parse
     from base64 import encodestring as encodebytes
 
+from itertools import count
 from time import time
 from random import getrandbits
 
@@ -19,6 +18,8 @@ import hashlib
 import hmac
 import base64
 
+from frappy.core.util import percent_encode, urlencode_noplus
+
 
 class Auth(object):
     """
@@ -29,12 +30,19 @@ class Auth(object):
         """"""
         pass
 
-    def generate_headers(self):
+    def generate_headers(self, uri=None, method='GET', params=None):
         """Generates headers which should be added to the request if required
-        by the authentication scheme in use."""
+        by the authentication scheme in use.  Schemes signing requests get
+        the uri, method and params of the request."""
 
         return {}
 
+    def identity(self):
+        """Returns string identifying the credentials in use, i.e. to keep
+        cached responses of different users apart."""
+
+        return ''
+
 
 class UserPassAuth(Auth):
     """
@@ -48,11 +56,14 @@ class UserPassAuth(Auth):
 
         Auth.__init__(self)
 
-    def generate_headers(self):
+    def generate_headers(self, uri=None, method='GET', params=None):
         return {b"Authorization": b"Basic " + encodebytes(
                     ("%s:%s" % (self.username, self.password)).encode('utf8'))
                     .strip(b'\n')}
 
+    def identity(self):
+        return self.username
+
 
 class NoAuth(Auth):
     """
@@ -64,6 +75,10 @@ class NoAuth(Auth):
 class OAuth(Auth):
     """
     An OAuth authenticator.
+
+    Every request is signed with HMAC-SHA1 in an Authorization header.  The
+    HMAC key is only derived once from the secrets and copied for each
+    request to keep signing cheap.
     """
     def __init__(self, token, token_secret, consumer_key, consumer_secret):
         """
@@ -76,36 +91,94 @@ class OAuth(Auth):
         self.token_secret = token_secret
         self.consumer_key = consumer_key
         self.consumer_secret = consumer_secret
+
+        self._hmac = None
+        self._hmac_secrets = None
+
+        self._nonce_prefix = getrandbits(64)
+        self._nonces = count()
+
         Auth.__init__(self)
 
-    def encode_params(self, base_url, method, params):
-        """Encode oauth keys and params in format suitable for uri"""
+    def identity(self):
+        return "%s:%s" % (self.consumer_key, self.token)
 
-        params = params.copy()
+    def _signing_hmac(self):
+        """
+        Return HMAC object keyed with the consumer and token secrets, which
+        only has to be copied to sign a request
+        """
+
+        secrets = (self.consumer_secret, self.token_secret)
+
+        if self._hmac_secrets != secrets:
+            key = self.consumer_secret + "&" + \
+                        percent_encode(self.token_secret)
+            self._hmac = hmac.new(key.encode('utf8'), digestmod=hashlib.sha1)
+            self._hmac_secrets = secrets
+
+        return self._hmac
+
+    def _oauth_params(self):
+        """Return oauth protocol parameters for a new request"""
+
+        params = {
+            'oauth_consumer_key': self.consumer_key,
+            'oauth_signature_method': 'HMAC-SHA1',
+            'oauth_version': '1.0',
+            'oauth_timestamp': str(int(time())),
+            # Unique per authenticator without asking for randomness each time
+            'oauth_nonce': '%x%x' % (self._nonce_prefix, next(self._nonces)),
+        }
 
         if self.token:
             params['oauth_token'] = self.token
 
-        params['oauth_consumer_key'] = self.consumer_key
-        params['oauth_signature_method'] = 'HMAC-SHA1'
-        params['oauth_version'] = '1.0'
-        params['oauth_timestamp'] = str(int(time()))
-        params['oauth_nonce'] = str(getrandbits(64))
+        return params
 
-        enc_params = urlencode_noplus(sorted(params.items()))
-
-        key = self.consumer_secret + "&" + \
-                        urllib_parse.quote(self.token_secret, '')
+    def _sign(self, base_url, method, enc_params):
+        """Return signature of request with encoded, sorted params"""
 
         message = '&'.join(
-            urllib_parse.quote(i, '') for i in [method.upper(), base_url,
-                                                enc_params])
+            percent_encode(i) for i in [method.upper(), base_url, enc_params])
+
+        signing_hmac = self._signing_hmac().copy()
+        signing_hmac.update(message.encode('ascii'))
+
+        return base64.b64encode(signing_hmac.digest()).decode('ascii')
+
+    def encode_params(self, base_url, method, params):
+        """Encode oauth keys and params in format suitable for uri"""
+
+        params = params.copy()
+        params.update(self._oauth_params())
+
+        enc_params = urlencode_noplus(sorted(params.items()))
+
+        signature = self._sign(base_url, method, enc_params)
 
-        signature = (base64.b64encode(hmac.new(
-                    key.encode('ascii'), message.encode('ascii'), hashlib.sha1)
-                                      .digest()))
         return enc_params + "&" + "oauth_signature=" + \
-                urllib_parse.quote(signature, '')
+                percent_encode(signature)
+
+    def generate_headers(self, uri=None, method='GET', params=None):
+        """
+        Generate signed Authorization header for request to uri (without
+        query string) sending params, either in the query string or as form
+        encoded body
+        """
+
+        oauth_params = self._oauth_params()
+
+        all_params = dict(params or {})
+        all_params.update(oauth_params)
+
+        signature = self._sign(uri, method,
+                               urlencode_noplus(sorted(all_params.items())))
+        oauth_params['oauth_signature'] = signature
+
+        return {'Authorization': 'OAuth ' + ', '.join(
+                    '%s="%s"' % (name, percent_encode(value))
+                    for name, value in sorted(oauth_params.items()))}
 
     @staticmethod
     def write_token_file(filename, oauth_token, oauth_token_secret):
@@ -127,32 +200,3 @@ class OAuth(Auth):
         token_file = open(filename)
         return token_file.readline().strip(), token_file.readline().strip()
 
-
-def urlencode_noplus(query):
-    """
-    Apparently contrary to the HTTP RFCs, spaces in arguments must be encoded
-    as %20 rather than '+' when constructing an OAuth signature (and therefore
-    also in the request itself.) So here is a specialized version which does
-    exactly that.
-    """
-
-    if hasattr(query, "items"):
-        # mapping objects
-        query = list(query.items())
-
-    encoded_bits = []
-    for name, val in query:
-        # and do unicode here while we are at it...
-        if isinstance(name, str):
-            name = name.encode('utf-8')
-        else:
-            name = str(name)
-
-        if isinstance(val, str):
-            val = val.encode('utf-8')
-        else:
-            val = str(val)
-        encoded_bits.append("%s=%s" % (urllib_parse.quote(name, ""),
-                            urllib_parse.quote(val, "")))
-
-    return "&".join(encoded_bits)
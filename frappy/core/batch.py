@@ -0,0 +1,137 @@
+"""
+Running large batches of independent API calls concurrently.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+
+class BatchResult(object):
+    """
+    Outcome of one call in a batch: either the `response` (the object a
+    call returns) or the `error` raised by it.  `index` is the position of
+    the call in the batch.
+    """
+
+    def __init__(self, index, descriptor, response=None, error=None):
+        self.index = index
+        self.descriptor = descriptor
+        self.response = response
+        self.error = error
+
+    @property
+    def ok(self):
+        """Determine if call succeeded"""
+
+        return self.error is None
+
+
+class BatchExecutor(object):
+    """
+    Run batches of calls on `client` (an APICall or service object) over a
+    pool of `workers` threads, all sharing the connection pool of the client.
+    Make sure that connection pool has at least `workers` connections per
+    host (pool_maxsize), otherwise connections can't be kept alive.
+
+    Each call is described by a (path, kwargs, method) tuple, where path is
+    either a '/' separated string or a sequence of uri parts, and kwargs and
+    method are optional:
+
+        batch = BatchExecutor(Github(), workers=16)
+        results = batch.run([('repos/durden/frappy',),
+                             ('repos/durden/frappy/commits', {'page': 2}),
+                             (['users', 'durden'], {}, 'get')])
+
+    Any error raised by a call is captured in its BatchResult instead of
+    aborting the batch.  When the rate limit is used up, as told by the
+    headers of a response, no further calls are started until it resets
+    (unless the client has a rate_limiter of its own taking care of that).
+    """
+
+    def __init__(self, client, workers=8):
+        self.client = client
+        self.workers = workers
+
+        self._paused_until = 0
+        self._lock = threading.Lock()
+
+    def _build_call(self, descriptor):
+        """Return call object and keyword arguments for descriptor"""
+
+        path = descriptor[0]
+        kwargs = dict(descriptor[1]) if len(descriptor) > 1 else {}
+        method = descriptor[2] if len(descriptor) > 2 else None
+
+        if isinstance(path, str):
+            path = [part for part in path.split('/') if part]
+
+        call = self.client
+        for part in path:
+            call = getattr(call, str(part))
+
+        if method is not None:
+            kwargs['method'] = method
+
+        return call, kwargs
+
+    def _wait_for_rate_limit(self):
+        """Wait until rate limit resets if it has been used up"""
+
+        delay = self._paused_until - time.time()
+        if delay > 0:
+            time.sleep(delay)
+
+    def _track_rate_limit(self, response):
+        """Pause batch once response says the rate limit is used up"""
+
+        # Uncached 304 responses come back as an empty list, without headers
+        headers = getattr(response, 'headers', None)
+        if headers is None or \
+                'x-ratelimit-remaining' not in headers['response']:
+            return
+
+        if response.rate_limit_remaining <= 0:
+            with self._lock:
+                self._paused_until = max(self._paused_until,
+                                         response.rate_limit_reset)
+
+    def _run_one(self, index, descriptor):
+        """Run call for descriptor and return its BatchResult"""
+
+        if getattr(self.client, 'rate_limiter', None) is None:
+            self._wait_for_rate_limit()
+
+        # Whatever goes wrong with one call (a bad descriptor, HTTP or network
+        # error, etc.) belongs to that call and mustn't abort the others
+        try:
+            call, kwargs = self._build_call(descriptor)
+            response = call(**kwargs)
+            self._track_rate_limit(response)
+        except Exception as err:
+            return BatchResult(index, descriptor, error=err)
+
+        return BatchResult(index, descriptor, response=response)
+
+    def as_completed(self, descriptors):
+        """Yield BatchResult of every call as soon as it's done"""
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = [executor.submit(self._run_one, index, descriptor)
+                       for index, descriptor in enumerate(descriptors)]
+
+            for future in as_completed(futures):
+                yield future.result()
+
+    def run(self, descriptors):
+        """Return list of BatchResult of every call, in order of descriptors"""
+
+        results = [None] * len(descriptors)
+
+        for result in self.as_completed(descriptors):
+            results[result.index] = result
+
+        return results
+
+
+__all__ = ["BatchExecutor", "BatchResult"]
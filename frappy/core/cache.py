@@ -0,0 +1,308 @@
+"""
+Response caching using conditional requests.
+
+Responses carrying an ETag or Last-Modified header are stored, and the next
+identical request is sent with If-None-Match/If-Modified-Since headers.  When
+the server answers 304 Not Modified the stored body is used instead, which
+saves bandwidth and (for most APIs) doesn't count against the rate limit.
+
+Asynchronous calls use the same caches, through `request_async`.
+"""
+
+import hashlib
+import os
+import json
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+
+class CacheEntry(object):
+    """Stored body of a response along with its validators"""
+
+    def __init__(self, content, etag=None, last_modified=None,
+                 stored_at=None):
+        self.content = content
+        self.etag = etag
+        self.last_modified = last_modified
+        self.stored_at = time.time() if stored_at is None else stored_at
+
+    def conditional_headers(self):
+        """Headers to make a request conditional on this entry"""
+
+        headers = {}
+
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+
+        return headers
+
+
+class CachedResponse(object):
+    """
+    Response served from the cache, with the headers of the 304 response the
+    server sent for it (i.e. up-to-date rate limits) and its (empty) raw body
+    """
+
+    def __init__(self, entry, resp):
+        self.status_code = 200
+        self.headers = resp.headers
+        self.content = entry.content
+        self.url = resp.url
+        self.raw = getattr(resp, 'raw', None)
+
+
+class ResponseCache(object):
+    """
+    ABC for response caches.
+
+    Subclasses only have to implement storage with `get` and `set`.  The
+    `hits`, `misses` and `bytes_saved` counters show how well the cache
+    performs; `bytes_saved` is the size of all bodies served from the cache.
+    """
+
+    def __init__(self, ttl=None):
+        self.ttl = ttl
+
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+
+        self._stats_lock = threading.Lock()
+
+    def get(self, key):
+        """Return entry stored for key or None"""
+
+        raise NotImplementedError
+
+    def set(self, key, entry):
+        """Store entry for key"""
+
+        raise NotImplementedError
+
+    def is_expired(self, entry):
+        """Determine if entry outlived the ttl of the cache"""
+
+        return (self.ttl is not None and
+                time.time() - entry.stored_at > self.ttl)
+
+    @staticmethod
+    def make_key(method, uri, identity):
+        """Create key for a request from everything that identifies it"""
+
+        key = '%s %s %s' % (method.upper(), uri, identity)
+        return hashlib.sha1(key.encode('utf8')).hexdigest()
+
+    def request(self, pool, method, uri, identity, params=None,
+                headers=None, **kwargs):
+        """
+        Send request through pool, conditional on any stored entry, and
+        return either the response or the stored body if it's unchanged
+        """
+
+        key, entry, headers = self._conditional(pool, method, uri, identity,
+                                                params, headers)
+
+        resp = pool.request(method, uri, params=params, headers=headers,
+                            **kwargs)
+
+        return self._handle(key, entry, resp)
+
+    async def request_async(self, async_pool, method, uri, identity,
+                            params=None, headers=None, **kwargs):
+        """
+        Asynchronous version of request, sending request through async_pool
+        (an AsyncConnectionPool)
+        """
+
+        key, entry, headers = self._conditional(async_pool.pool, method, uri,
+                                                identity, params, headers)
+
+        resp = await async_pool.request(method, uri, params=params,
+                                        headers=headers, **kwargs)
+
+        return self._handle(key, entry, resp)
+
+    def _conditional(self, pool, method, uri, identity, params, headers):
+        """
+        Return key of request, entry stored for it (or None) and headers to
+        send it with, conditional on that entry
+        """
+
+        key = self.make_key(method, pool.full_uri(uri, params), identity)
+        entry = self.get(key)
+
+        headers = dict(headers or {})
+        if entry is not None:
+            headers.update(entry.conditional_headers())
+
+        return key, entry, headers
+
+    def _handle(self, key, entry, resp):
+        """
+        Return stored body of entry if resp says it's unchanged, otherwise
+        store resp when it can be validated later and return it
+        """
+
+        if resp.status_code == 304 and entry is not None:
+            with self._stats_lock:
+                self.hits += 1
+                self.bytes_saved += len(entry.content)
+
+            return CachedResponse(entry, resp)
+
+        with self._stats_lock:
+            self.misses += 1
+
+        etag = resp.headers.get('etag')
+        last_modified = resp.headers.get('last-modified')
+
+        if resp.status_code == 200 and (etag or last_modified):
+            self.set(key, CacheEntry(resp.content, etag, last_modified))
+
+        return resp
+
+    def stats(self):
+        """Return counters as a dict"""
+
+        return {'hits': self.hits, 'misses': self.misses,
+                'bytes_saved': self.bytes_saved}
+
+
+class MemoryCache(ResponseCache):
+    """
+    In-memory LRU cache.
+
+    Least recently used entries are evicted once there are more than
+    `max_entries` entries or their bodies take more than `max_bytes` bytes.
+    Entries older than `ttl` seconds are dropped.
+    """
+
+    def __init__(self, max_entries=1000, max_bytes=64 * 1024 * 1024,
+                 ttl=None):
+        ResponseCache.__init__(self, ttl)
+
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            if self.is_expired(entry):
+                self._remove(key)
+                return None
+
+            # Mark as most recently used
+            del self._entries[key]
+            self._entries[key] = entry
+
+            return entry
+
+    def set(self, key, entry):
+        if len(entry.content) > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = entry
+            self.size += len(entry.content)
+
+            while (len(self._entries) > self.max_entries or
+                   self.size > self.max_bytes):
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key):
+        """Remove entry, caller must hold lock"""
+
+        self.size -= len(self._entries.pop(key).content)
+
+    def clear(self):
+        """Remove all entries"""
+
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+
+# Names of the files DiskCache stores entries in, keys made by make_key
+_DISK_KEY = re.compile(r'[0-9a-f]{40}\Z')
+
+
+class DiskCache(ResponseCache):
+    """
+    On-disk cache storing one file per entry in `directory`, so responses
+    survive restarts and can be shared between processes.  Entries older than
+    `ttl` seconds are dropped.
+
+    Each file holds a line of JSON with the validators followed by the raw
+    body, so nothing read from the directory is ever executed.  Files which
+    can't be read that way count as missing.
+    """
+
+    def __init__(self, directory, ttl=None):
+        ResponseCache.__init__(self, ttl)
+
+        self.directory = directory
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key)
+
+    def get(self, key):
+        try:
+            with open(self._path(key), 'rb') as entry_file:
+                meta = json.loads(entry_file.readline().decode('utf8'))
+                entry = CacheEntry(entry_file.read(), meta['etag'],
+                                   meta['last_modified'],
+                                   float(meta['stored_at']))
+        except (IOError, OSError, ValueError, KeyError, TypeError):
+            return None
+
+        if self.is_expired(entry):
+            self._remove(key)
+            return None
+
+        return entry
+
+    def set(self, key, entry):
+        # Write to a temporary file first so readers never see partial entries
+        meta = {'etag': entry.etag, 'last_modified': entry.last_modified,
+                'stored_at': entry.stored_at}
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(fd, 'wb') as entry_file:
+            # json.dumps escapes newlines, so the body starts after the first
+            entry_file.write(json.dumps(meta).encode('utf8') + b'\n')
+            entry_file.write(entry.content)
+
+        os.replace(tmp_path, self._path(key))
+
+    def _remove(self, key):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def clear(self):
+        """Remove all entries, leaving any other files in directory alone"""
+
+        for key in os.listdir(self.directory):
+            if _DISK_KEY.match(key):
+                self._remove(key)
+
+
+__all__ = ["ResponseCache", "MemoryCache", "DiskCache"]
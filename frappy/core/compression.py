@@ -0,0 +1,82 @@
+"""
+Compressed transfers.
+
+Calls ask for compressed responses with the Accept-Encoding header of
+ACCEPT_ENCODING: gzip and deflate, plus brotli when brotli (or brotlicffi)
+is installed.  Responses are decompressed as they're read, so streamed
+responses stay streamed.
+
+Request bodies are sent uncompressed unless the service is made with
+`compress_requests` set to one of ENCODINGS, for APIs accepting compressed
+bodies:
+
+    g = Github(auth=auth, compress_requests='gzip')
+    gist = g.gists(files=files, method='post')
+    print(gist.bytes_out, gist.content_bytes_out)
+
+Every call counts the bytes of the bodies it sent and received as they went
+over the wire (`bytes_out`, `bytes_in`) and uncompressed
+(`content_bytes_out`, `content_bytes_in`).
+"""
+
+import zlib
+
+try:
+    import brotli
+except ImportError:
+    try:
+        import brotlicffi as brotli
+    except ImportError:
+        brotli = None
+
+# Encodings that can be decompressed, in order of preference
+ENCODINGS = ('br', 'gzip', 'deflate') if brotli else ('gzip', 'deflate')
+
+ACCEPT_ENCODING = ', '.join(ENCODINGS)
+
+
+def compress(data, encoding, level=6):
+    """
+    Return data (bytes or text, encoded as UTF-8) compressed with encoding
+    (one of ENCODINGS), at level 0-9
+
+    >>> zlib.decompress(compress(b'frappy' * 100, 'gzip'), 31)[:12]
+    b'frappyfrappy'
+    """
+
+    if not isinstance(data, bytes):
+        data = data.encode('utf8')
+
+    if encoding not in ENCODINGS:
+        raise ValueError("Can't compress with '%s'" % (encoding))
+
+    if encoding == 'br':
+        return brotli.compress(data, quality=level)
+
+    # 31 is a gzip header and trailer, 15 a zlib one (which HTTP's deflate
+    # is, in spite of the name)
+    compressor = zlib.compressobj(level, zlib.DEFLATED,
+                                  31 if encoding == 'gzip' else 15)
+    return compressor.compress(data) + compressor.flush()
+
+
+def wire_size(resp, default):
+    """
+    Return number of bytes the body of resp took on the wire, which is its
+    compressed size if it was compressed, or default when that's unknown
+    """
+
+    # urllib3 responses (under requests) count the bytes read off the socket
+    raw = getattr(resp, 'raw', None)
+    if raw is not None and hasattr(raw, 'decode_content'):
+        return raw.tell()
+
+    if resp.headers.get('content-encoding'):
+        length = resp.headers.get('content-length')
+        if length and length.isdigit():
+            return int(length)
+
+    return default
+
+
+__all__ = ["ACCEPT_ENCODING", "ENCODINGS", "compress", "wire_size"]
@@ -0,0 +1,77 @@
+"""
+JSON backend used to decode and encode API responses.
+
+The standard library json module is used by default.  Call use_fast_json()
+to switch to orjson or ujson, whichever is importable first, which are
+several times faster on large payloads.  Without either of them installed
+the standard library stays in use.
+"""
+
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
+
+def _stdlib_loads(data):
+    if isinstance(data, bytes):
+        data = data.decode('utf8')
+    return json.loads(data)
+
+
+def _load_backend(name):
+    """Return (loads, dumps) of backend with name, raising ImportError"""
+
+    if name == 'json':
+        return _stdlib_loads, json.dumps
+
+    if name == 'orjson':
+        import orjson
+        return orjson.loads, lambda obj: orjson.dumps(obj).decode('utf8')
+
+    if name == 'ujson':
+        import ujson
+        return ujson.loads, ujson.dumps
+
+    raise ValueError("Unknown JSON backend '%s'" % (name))
+
+
+backend = 'json'
+_loads, _dumps = _load_backend(backend)
+
+
+def use_backend(name):
+    """Use JSON backend with name ('json', 'orjson' or 'ujson')"""
+
+    global backend, _loads, _dumps
+
+    _loads, _dumps = _load_backend(name)
+    backend = name
+
+
+def use_fast_json():
+    """
+    Use the fastest JSON backend available and return its name
+    """
+
+    for name in ('orjson', 'ujson', 'json'):
+        try:
+            use_backend(name)
+            return name
+        except ImportError:
+            pass
+
+
+def loads(data):
+    """Decode JSON document in data (bytes or text)"""
+
+    return _loads(data)
+
+
+def dumps(obj):
+    """Encode obj to JSON text"""
+
+    return _dumps(obj)
+
+
+__all__ = ["loads", "dumps", "use_backend", "use_fast_json"]
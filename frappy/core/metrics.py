@@ -0,0 +1,258 @@
+"""
+Timing and traffic metrics of API calls.
+
+Pass a RequestMetrics object as `metrics` to a service (or APICall) to
+record, for every call, how long each phase of the request took:
+
+    prepare          building the uri from attributes and arguments, and
+                     the authentication headers (i.e. OAuth signing)
+    send             sending the request and reading the response, including
+                     DNS, connecting and TLS (requests doesn't break these up)
+    wait             part of send until the response headers arrived
+                     (not measured for asynchronous calls)
+    handle_response  checking and handling the response
+    decode           decoding the response, which happens when `response`
+                     is first used, so after the call returned
+
+along with the bytes sent and received and the status codes, aggregated per
+endpoint template (the uri parts of the call, with ids and positional
+arguments replaced by placeholders):
+
+    metrics = RequestMetrics()
+    g = Github(metrics=metrics)
+    g.repos.durden.frappy.commits()
+    print(metrics.to_prometheus())
+
+Without metrics no time is spent on any of this.
+"""
+
+import bisect
+import threading
+
+from frappy.core import jsonlib
+
+PHASES = ('prepare', 'send', 'wait', 'handle_response', 'decode')
+
+# Upper bounds of histogram buckets in seconds
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class RequestSample(object):
+    """
+    Measurements of a single call: durations of `phases` (name to
+    seconds), `bytes_out`/`bytes_in` of request and response bodies as they
+    went over the wire (so compressed, if they were) and `status` code,
+    which is None when no response arrived
+    """
+
+    def __init__(self, method, endpoint, phases, status=None, bytes_out=0,
+                 bytes_in=0):
+        self.method = method
+        self.endpoint = endpoint
+        self.phases = phases
+        self.status = status
+        self.bytes_out = bytes_out
+        self.bytes_in = bytes_in
+
+    @property
+    def duration(self):
+        """Total time spent on call"""
+
+        # Waiting is part of sending
+        return sum(seconds for phase, seconds in self.phases.items()
+                   if phase != 'wait')
+
+
+class Histogram(object):
+    """Counts of observed values per bucket, plus their count and sum"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self):
+        """Return list of (upper bound, cumulative count), ending with inf"""
+
+        total = 0
+        result = []
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+
+class _EndpointStats(object):
+    """Aggregated samples of one method and endpoint"""
+
+    def __init__(self, buckets):
+        self.phases = dict((phase, Histogram(buckets)) for phase in PHASES)
+        self.statuses = {}
+        self.bytes_out = 0
+        self.bytes_in = 0
+
+
+class RequestMetrics(object):
+    """
+    Collects RequestSamples of calls into per-endpoint histograms.
+
+    `callback`, when given, is called with every RequestSample as well, i.e.
+    to feed another metrics system or log slow calls.  It's called in the
+    thread making the call, so keep it quick.
+
+    A single object can be shared between any number of services and
+    threads.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, callback=None):
+        self.buckets = tuple(buckets)
+        self.callback = callback
+
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def record(self, sample):
+        """Add sample to the aggregates and pass it on to the callback"""
+
+        with self._lock:
+            key = (sample.method, sample.endpoint)
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = _EndpointStats(self.buckets)
+
+            for phase, seconds in sample.phases.items():
+                stats.phases[phase].observe(seconds)
+
+            stats.statuses[sample.status] = stats.statuses.get(
+                                                    sample.status, 0) + 1
+            stats.bytes_out += sample.bytes_out
+            stats.bytes_in += sample.bytes_in
+
+        if self.callback is not None:
+            self.callback(sample)
+
+    def record_phase(self, method, endpoint, phase, seconds):
+        """
+        Add duration of a phase that ended after its call was recorded (i.e.
+        decode) to the aggregates
+        """
+
+        with self._lock:
+            stats = self._stats.get((method, endpoint))
+            if stats is None:
+                stats = self._stats[(method, endpoint)] = _EndpointStats(
+                                                                self.buckets)
+            stats.phases[phase].observe(seconds)
+
+    def reset(self):
+        """Forget everything recorded so far"""
+
+        with self._lock:
+            self._stats = {}
+
+    def as_dict(self):
+        """
+        Return the aggregates as a dict, keyed by 'METHOD endpoint', of
+        dicts with the requests per status, bytes and, per phase, the
+        count, sum and cumulative bucket counts of its durations
+        """
+
+        result = {}
+        with self._lock:
+            for (method, endpoint), stats in sorted(self._stats.items()):
+                phases = {}
+                for phase, histogram in stats.phases.items():
+                    if not histogram.count:
+                        continue
+                    phases[phase] = {
+                        'count': histogram.count,
+                        'sum': histogram.sum,
+                        'buckets': [[_bound_str(bound), count] for bound, count
+                                    in histogram.cumulative()],
+                    }
+
+                result['%s %s' % (method.upper(), endpoint)] = {
+                    'statuses': dict((str(status), count) for status, count
+                                     in stats.statuses.items()),
+                    'bytes_out': stats.bytes_out,
+                    'bytes_in': stats.bytes_in,
+                    'phases': phases,
+                }
+
+        return result
+
+    def to_json(self):
+        """Return the aggregates of as_dict encoded as JSON"""
+
+        return jsonlib.dumps(self.as_dict())
+
+    def to_prometheus(self, prefix='frappy'):
+        """Return the aggregates in the Prometheus text exposition format"""
+
+        lines = [
+            '# TYPE %s_request_phase_seconds histogram' % (prefix),
+        ]
+        requests = []
+        bytes_out = []
+        bytes_in = []
+
+        with self._lock:
+            for (method, endpoint), stats in sorted(self._stats.items()):
+                labels = 'method="%s",endpoint="%s"' % (
+                                method.upper(), _escape_label(endpoint))
+
+                for phase in PHASES:
+                    histogram = stats.phases[phase]
+                    if not histogram.count:
+                        continue
+
+                    phase_labels = '%s,phase="%s"' % (labels, phase)
+                    for bound, count in histogram.cumulative():
+                        lines.append('%s_request_phase_seconds_bucket{%s,'
+                                     'le="%s"} %i' % (prefix, phase_labels,
+                                                      _bound_str(bound),
+                                                      count))
+                    lines.append('%s_request_phase_seconds_sum{%s} %r' % (
+                                        prefix, phase_labels, histogram.sum))
+                    lines.append('%s_request_phase_seconds_count{%s} %i' % (
+                                        prefix, phase_labels, histogram.count))
+
+                for status, count in sorted(stats.statuses.items(),
+                                            key=lambda item: str(item[0])):
+                    requests.append('%s_requests_total{%s,status="%s"} %i' % (
+                            prefix, labels, status or 'error', count))
+
+                bytes_out.append('%s_request_bytes_total{%s} %i' % (
+                                            prefix, labels, stats.bytes_out))
+                bytes_in.append('%s_response_bytes_total{%s} %i' % (
+                                            prefix, labels, stats.bytes_in))
+
+        lines.append('# TYPE %s_requests_total counter' % (prefix))
+        lines.extend(requests)
+        lines.append('# TYPE %s_request_bytes_total counter' % (prefix))
+        lines.extend(bytes_out)
+        lines.append('# TYPE %s_response_bytes_total counter' % (prefix))
+        lines.extend(bytes_in)
+
+        return '\n'.join(lines) + '\n'
+
+
+def _bound_str(bound):
+    if bound == float('inf'):
+        return '+Inf'
+    return repr(float(bound))
+
+
+def _escape_label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n',
+                                                                   '\\n')
+
+
+__all__ = ["RequestMetrics", "RequestSample", "Histogram", "PHASES"]
@@ -0,0 +1,218 @@
+"""
+Lazy iteration over paginated API results.
+
+Each paginator understands one pagination scheme: how to find the items in a
+page and which arguments request the next page.  `iter_pages` yields the
+items of every page while fetching the following page in the background,
+`iter_pages_async` does the same for asynchronous calls.
+"""
+
+import re
+
+try:
+    from urllib.parse import urlparse, parse_qsl
+except ImportError:
+    from urlparse import urlparse, parse_qsl
+
+
+def _list_items(response):
+    """Return response if it's a list, otherwise its first list value"""
+
+    if isinstance(response, list):
+        return response
+
+    if isinstance(response, dict):
+        for value in response.values():
+            if isinstance(value, list):
+                return value
+
+    return []
+
+
+class Paginator(object):
+    """
+    ABC for pagination schemes.
+    """
+
+    def items(self, page):
+        """Return list of items in page (an APICall holding a response)"""
+
+        return _list_items(page.response)
+
+    def next_kwargs(self, page, kwargs):
+        """
+        Return keyword arguments requesting the page after page, which was
+        requested with kwargs, or None if page was the last one
+        """
+
+        raise NotImplementedError
+
+
+class LinkPaginator(Paginator):
+    """
+    Follow rel="next" in the Link header, i.e. Github:
+
+        Link: <https://api.github.com/...?page=3>; rel="next", ...
+    """
+
+    link_next = re.compile(r'<([^>]*)>\s*;\s*rel="?next"?')
+
+    def next_kwargs(self, page, kwargs):
+        match = self.link_next.search(
+                            page.headers['response'].get('link', ''))
+        if match is None:
+            return None
+
+        next_kwargs = dict(kwargs)
+        next_kwargs.update(parse_qsl(urlparse(match.group(1)).query))
+
+        return next_kwargs
+
+
+class MaxIdPaginator(Paginator):
+    """
+    Ask for items older than the oldest one seen so far with max_id, i.e.
+    Twitter timelines
+    """
+
+    def next_kwargs(self, page, kwargs):
+        ids = [item['id'] for item in self.items(page)]
+        if not ids:
+            return None
+
+        next_kwargs = dict(kwargs)
+        next_kwargs['max_id'] = min(ids) - 1
+
+        return next_kwargs
+
+
+class CursorPaginator(Paginator):
+    """
+    Pass on next_cursor of the previous page as cursor, i.e. Twitter
+    friends/followers/lists
+    """
+
+    def next_kwargs(self, page, kwargs):
+        cursor = page.response.get('next_cursor', 0)
+        if not cursor:
+            return None
+
+        next_kwargs = dict(kwargs)
+        next_kwargs['cursor'] = cursor
+
+        return next_kwargs
+
+
+class PagePaginator(Paginator):
+    """
+    Count page numbers up until an empty (or short, when per_page was given)
+    page comes back
+    """
+
+    def next_kwargs(self, page, kwargs):
+        items = self.items(page)
+        if not items or len(items) < int(kwargs.get('per_page', 1)):
+            return None
+
+        next_kwargs = dict(kwargs)
+        next_kwargs['page'] = int(kwargs.get('page', 1)) + 1
+
+        return next_kwargs
+
+
+paginators = {
+    'link': LinkPaginator,
+    'max_id': MaxIdPaginator,
+    'cursor': CursorPaginator,
+    'page': PagePaginator,
+}
+
+
+def iter_pages(call, paginator, args, kwargs, prefetch=True):
+    """
+    Yield the items of all pages returned by call, starting with the page
+    requested by args and kwargs.  When prefetch is set the next page is
+    requested in the background as soon as the current one arrived.
+    """
+
+    executor = None
+    if prefetch:
+        # Imported here as it pulls in logging, which slows down importing
+        # frappy for everyone not prefetching
+        from concurrent.futures import ThreadPoolExecutor
+        executor = ThreadPoolExecutor(max_workers=1)
+
+    def fetch(page_kwargs):
+        if executor is None:
+            return _Done(call(*args, **page_kwargs))
+        return executor.submit(call, *args, **page_kwargs)
+
+    try:
+        pending = fetch(kwargs)
+
+        while pending is not None:
+            page = pending.result()
+            if not _is_page(page):
+                return
+
+            kwargs = paginator.next_kwargs(page, kwargs)
+            pending = None
+            if kwargs is not None:
+                pending = fetch(kwargs)
+
+            for item in paginator.items(page):
+                yield item
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+
+async def iter_pages_async(call, paginator, args, kwargs):
+    """
+    Asynchronous version of iter_pages, for calls returning a coroutine.
+    The next page is always requested in the background.
+    """
+
+    import asyncio
+
+    pending = asyncio.ensure_future(call(*args, **kwargs))
+    try:
+        while pending is not None:
+            page = await pending
+            pending = None
+            if not _is_page(page):
+                return
+
+            kwargs = paginator.next_kwargs(page, kwargs)
+            if kwargs is not None:
+                pending = asyncio.ensure_future(call(*args, **kwargs))
+
+            for item in paginator.items(page):
+                yield item
+    finally:
+        if pending is not None:
+            pending.cancel()
+
+
+def _is_page(page):
+    """
+    Return whether page is a call holding a response, not what some calls
+    return instead (i.e. the empty list of an uncached 304), which ends
+    paginating
+    """
+
+    return hasattr(page, 'headers')
+
+
+class _Done(object):
+    """Already available result with the interface of a Future"""
+
+    def __init__(self, result):
+        self._result = result
+
+    def result(self):
+        return self._result
+
+
+__all__ = ["Paginator", "LinkPaginator", "MaxIdPaginator", "CursorPaginator",
+           "PagePaginator", "iter_pages", "iter_pages_async"]
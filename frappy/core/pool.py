@@ -0,0 +1,125 @@
+"""
+Connection pooling for API calls.
+
+A ConnectionPool wraps a single requests Session so every request made
+through it reuses open keep-alive connections instead of paying for a new
+TCP (and TLS) handshake each time.  One pool can be handed to as many
+APICall objects as needed to share connections between them.
+"""
+
+import socket
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    from urllib3.exceptions import HTTPError as _Urllib3HTTPError
+    from urllib3.util.retry import Retry
+except ImportError:
+    from requests.packages.urllib3.exceptions import \
+        HTTPError as _Urllib3HTTPError
+    from requests.packages.urllib3.util.retry import Retry
+
+
+# Errors raised by a pool when the connection fails or breaks, either while
+# sending a request or while reading a streamed response
+NETWORK_ERRORS = (requests.RequestException, _Urllib3HTTPError, socket.error)
+
+# Methods retried after their connection broke, which are safe to send twice
+RETRY_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS'])
+
+
+class ConnectionPool(object):
+    """
+    Pool of keep-alive HTTP connections shared by APICall objects.
+
+    `pool_connections` is the number of hosts to keep pools for,
+    `pool_maxsize` is the max number of connections kept open per host and
+    `pool_block` controls whether a request waits for a free connection
+    when all `pool_maxsize` connections are in use.
+
+    Connections which sat idle longer than `keepalive_timeout` seconds are
+    dropped before the next request instead of risking a reset from a server
+    which already closed them.  Requests that still hit a reset socket are
+    retried up to `retries` times, if their method is one of RETRY_METHODS
+    (GET, HEAD and OPTIONS).
+    """
+
+    def __init__(self, pool_connections=10, pool_maxsize=10,
+                 pool_block=False, keepalive_timeout=60, retries=2):
+
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self.keepalive_timeout = keepalive_timeout
+        self.retries = retries
+
+        self._lock = threading.Lock()
+        self._last_used = None
+
+        self.session = self._create_session()
+
+    def _create_session(self):
+        """Create session with pooled adapters mounted for http and https"""
+
+        session = requests.Session()
+
+        # Only retry on connection level failures (i.e. a keep-alive socket
+        # the server closed on us), never on HTTP status codes
+        retry_kwargs = dict(total=self.retries, connect=self.retries,
+                            read=self.retries, redirect=0, status=0,
+                            raise_on_status=False)
+        try:
+            retry = Retry(allowed_methods=RETRY_METHODS, **retry_kwargs)
+        except TypeError:
+            # urllib3 before 1.26
+            retry = Retry(method_whitelist=RETRY_METHODS, **retry_kwargs)
+
+        adapter = HTTPAdapter(pool_connections=self.pool_connections,
+                              pool_maxsize=self.pool_maxsize,
+                              pool_block=self.pool_block, max_retries=retry)
+
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+
+        return session
+
+    def _expire_idle(self):
+        """Drop pooled connections if they have been idle too long"""
+
+        now = time.time()
+
+        with self._lock:
+            last_used = self._last_used
+            self._last_used = now
+
+        if (self.keepalive_timeout is not None and last_used is not None and
+                now - last_used > self.keepalive_timeout):
+            # Adapters recreate their connection pools on demand, so the
+            # session can keep being used after this
+            self.session.close()
+
+    def request(self, method, uri, **kwargs):
+        """Send request using a pooled connection and return the response"""
+
+        self._expire_idle()
+        return self.session.request(method, uri, **kwargs)
+
+    @staticmethod
+    def full_uri(uri, params=None):
+        """Return uri with params encoded in query string like request()"""
+
+        prepared = requests.models.PreparedRequest()
+        prepared.prepare_url(uri, params)
+
+        return prepared.url
+
+    def close(self):
+        """Close all pooled connections"""
+
+        self.session.close()
+
+
+__all__ = ["ConnectionPool", "NETWORK_ERRORS", "RETRY_METHODS"]
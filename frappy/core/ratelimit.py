@@ -0,0 +1,178 @@
+"""
+Scheduling of requests according to the rate limit headers APIs send back.
+"""
+
+import asyncio
+import threading
+import time
+
+from frappy.core.api import APIHTTPError
+
+
+class RateLimitError(APIHTTPError):
+    """
+    Raised instead of sending a request which would exceed the rate limit.
+    """
+
+    def __init__(self, uri, reset):
+        """Initalize error object"""
+
+        self.reset = reset
+
+        APIHTTPError.__init__(self, 429, uri)
+
+    def __str__(self):
+        """Stringify error"""
+
+        return ("Rate limit exhausted until %.0f for URL: %s " % (self.reset,
+                                                               self.uri))
+
+
+class _Bucket(object):
+    """Remaining requests for one host and identity until reset"""
+
+    def __init__(self, limit, remaining, reset):
+        self.limit = limit
+        self.remaining = remaining
+        self.reset = reset
+        self.next_slot = 0
+
+
+class RateLimiter(object):
+    """
+    Token bucket scheduler driven by x-ratelimit headers.
+
+    There is a bucket per host and auth identity which is refilled from the
+    x-ratelimit-remaining and x-ratelimit-reset headers of every response.
+    Before sending a request a token is taken from its bucket according to
+    `policy`:
+
+        'queue': Spread the remaining requests evenly until reset.  Every
+                 request waits for the next free slot, in order of arrival.
+        'block': Send requests right away while there are tokens left, and
+                 wait for the reset once they run out.
+        'fail':  Like 'block', but raise RateLimitError instead of waiting.
+
+    A single RateLimiter can be shared by any number of APICall objects and
+    threads.  Asynchronous code should use `acquire_async`.
+
+    Waiting callers check back at least every `poll_interval` seconds.
+    """
+
+    policies = ('queue', 'block', 'fail')
+
+    def __init__(self, policy='queue', poll_interval=1):
+        if policy not in self.policies:
+            raise ValueError("Unknown rate limit policy '%s'" % (policy))
+
+        self.policy = policy
+        self.poll_interval = poll_interval
+
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def update(self, key, headers):
+        """Refill bucket for key from rate limit headers of a response"""
+
+        limit = _header(headers, 'limit')
+        remaining = _header(headers, 'remaining')
+        reset = _header(headers, 'reset')
+        if remaining is None or reset is None:
+            return
+
+        # Some APIs send seconds until reset instead of an epoch time
+        if reset < 1000000000:
+            reset += time.time()
+
+        with self._lock:
+            bucket = self._buckets.get(key)
+
+            # Allow for a second of jitter in relative reset times
+            if bucket is None or abs(bucket.reset - reset) >= 1:
+                self._buckets[key] = _Bucket(limit, remaining, reset)
+            else:
+                # Responses to requests still in flight haven't been counted
+                # by the server yet, so never hand back tokens
+                bucket.remaining = min(bucket.remaining, remaining)
+
+    def _take(self, key, uri):
+        """
+        Try to take a token for a request to key and return whether one was
+        taken along with the number of seconds to wait before going on
+        """
+
+        with self._lock:
+            bucket = self._buckets.get(key)
+            now = time.time()
+
+            # Nothing known about limits (yet)
+            if bucket is None:
+                return True, 0
+
+            # Limit window has passed, so allow a full window of requests
+            # until the first response tells the new reset time
+            if bucket.reset <= now:
+                if bucket.limit is None:
+                    del self._buckets[key]
+                    return True, 0
+
+                bucket.remaining = bucket.limit
+                bucket.reset = float('inf')
+                bucket.next_slot = 0
+
+            if bucket.remaining <= 0:
+                if self.policy == 'fail':
+                    raise RateLimitError(uri, bucket.reset)
+
+                # Wait for reset (or, if it isn't known yet, for a response
+                # telling it) before trying again
+                return False, min(bucket.reset - now, self.poll_interval)
+
+            bucket.remaining -= 1
+
+            if self.policy != 'queue' or bucket.reset == float('inf'):
+                return True, 0
+
+            interval = (bucket.reset - now) / (bucket.remaining + 1)
+            slot = max(now, bucket.next_slot)
+            bucket.next_slot = slot + interval
+
+            return True, slot - now
+
+    def acquire(self, key, uri=''):
+        """Take a token for a request to key, waiting as long as needed"""
+
+        while True:
+            taken, delay = self._take(key, uri)
+            if delay > 0:
+                time.sleep(delay)
+            if taken:
+                return
+
+    async def acquire_async(self, key, uri=''):
+        """Asynchronous version of acquire"""
+
+        while True:
+            taken, delay = self._take(key, uri)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if taken:
+                return
+
+
+def _header(headers, name):
+    """Return numeric value of rate limit header or None"""
+
+    # Twitter uses x-rate-limit-* in newer API versions
+    for prefix in ('x-ratelimit-', 'x-rate-limit-'):
+        value = headers.get(prefix + name)
+        if value is not None:
+            try:
+                return float(value)
+            except ValueError:
+                return None
+
+    return None
+
+
+__all__ = ["RateLimiter", "RateLimitError"]
@@ -0,0 +1,140 @@
+"""
+Coalescing identical requests which are in flight at the same time.
+
+Pass a SingleFlight object as `single_flight` to a service (or APICall) and
+safe (GET and HEAD) calls made while an identical call is still waiting for
+its response don't send a request of their own.  They wait for the call in
+flight and return its result instead, so any number of threads or tasks
+asking for the same resource at once cost a single request, a single
+decode and a single token of the rate limit:
+
+    flights = SingleFlight()
+    g = Github(single_flight=flights)
+    with ThreadPoolExecutor(50) as executor:
+        users = list(executor.map(lambda name: g.users(name), names))
+
+Calls are identical when method, full uri (query string included) and
+auth identity are.  Callers sharing a call get the same result object, so
+treat its `response` as read-only.  Errors are shared as well.
+"""
+
+import asyncio
+import threading
+
+
+class _Flight(object):
+    """Call in flight, with its outcome once it's done"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.finished = False
+        self.result = None
+        self.error = None
+
+
+class SingleFlight(object):
+    """
+    Runs one call per key at a time, handing its outcome to every caller
+    that asked for the same key while it was running.
+
+    `calls` counts the calls actually made, `shared` the calls answered
+    with the outcome of another one.
+
+    A single object can be shared by any number of services and threads.
+    Asynchronous code uses `do_async`, which coalesces calls of tasks
+    running in the same event loop.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.shared = 0
+
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, call):
+        """
+        Return call(), or the result of the call made for key by another
+        thread if one is in flight
+        """
+
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self.calls += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            flight.done.wait()
+            if not flight.finished:
+                # Interrupted, so make the call after all
+                return self.do(key, call)
+            return self._outcome(flight)
+
+        try:
+            flight.result = call()
+            flight.finished = True
+        except Exception as err:
+            flight.error = err
+            flight.finished = True
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+        return flight.result
+
+    async def do_async(self, key, call):
+        """
+        Asynchronous version of do, call returning an awaitable
+        """
+
+        key = (asyncio.get_running_loop(), key)
+
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                flight.future = asyncio.get_running_loop().create_future()
+                self.calls += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            # Shielded so a waiting task being cancelled doesn't cancel
+            # the call for everybody else
+            await asyncio.shield(flight.future)
+            if not flight.finished:
+                # Cancelled, so make the call after all
+                return await self.do_async(key[1], call)
+            return self._outcome(flight)
+
+        try:
+            flight.result = await call()
+            flight.finished = True
+        except Exception as err:
+            flight.error = err
+            flight.finished = True
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.future.set_result(None)
+
+        return flight.result
+
+    @staticmethod
+    def _outcome(flight):
+        """Return result of finished flight or raise its error"""
+
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+
+__all__ = ["SingleFlight"]
@@ -0,0 +1,193 @@
+"""
+Streaming large responses instead of reading them into memory at once.
+
+Pass stream='items' to any call to iterate over the elements of a top-level
+JSON array as they are parsed off the connection, or stream='raw' to
+iterate over chunks of the raw body, i.e. to write it to a file:
+
+    for item in g.repos.durden.frappy.commits(per_page=100, stream='items'):
+        print(item['sha'])
+
+    g.repos.durden.frappy.tarball.master(stream='raw').save('frappy.tar.gz')
+
+Either way only a chunk (or a single array element) is held in memory at a
+time, no matter how large the response is.
+"""
+
+import codecs
+import json
+import re
+
+from frappy.core.compression import wire_size
+
+STREAM_MODES = ('items', 'raw')
+
+_whitespace = re.compile(r'[ \t\n\r]*')
+
+# What may follow the part of a number decoded so far when the rest of it
+# is still to come, i.e. '3' of '3.14' or '2' of '2e5'
+_number_rest = re.compile(r'[-+.eE0-9]*\Z')
+
+
+def iter_json_array(chunks):
+    """
+    Yield the elements of the JSON array, encoded as UTF-8, split up in
+    chunks (of bytes) as they are complete.  Raises ValueError if the
+    document isn't an array or ends prematurely.
+
+    >>> list(iter_json_array([b'[{"a": 1', b'}, 23', b'4, "x"]']))
+    [{'a': 1}, 234, 'x']
+    >>> list(iter_json_array([b'[1, 3.', b'14, 2e', b'5, -', b'1]']))
+    [1, 3.14, 200000.0, -1]
+    """
+
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder('utf8')()
+
+    buf = ''
+    pos = 0
+    # Expecting: '[', first element or ']', element, ',' or ']', nothing
+    state = 'start'
+
+    # Elements spanning many chunks are only tried again once the part of
+    # the buffer they're in doubled, so they aren't parsed over and over
+    retry_size = 0
+
+    for chunk, final in _with_final(chunks):
+        buf = buf[pos:] + utf8.decode(chunk, final)
+        pos = 0
+
+        if len(buf) < retry_size and not final:
+            continue
+        retry_size = 0
+
+        while True:
+            pos = _whitespace.match(buf, pos).end()
+            if pos == len(buf):
+                break
+
+            char = buf[pos]
+            if state == 'start':
+                if char != '[':
+                    raise ValueError("Response is not a JSON array")
+                state = 'first'
+                pos += 1
+            elif state in ('first', 'next') and char == ']':
+                state = 'end'
+                pos += 1
+            elif state == 'next':
+                if char != ',':
+                    raise ValueError("Expecting ',' at %i" % (pos))
+                state = 'element'
+                pos += 1
+            elif state in ('first', 'element'):
+                try:
+                    item, end = decoder.raw_decode(buf, pos)
+                except ValueError:
+                    if final:
+                        raise
+                    retry_size = 2 * (len(buf) - pos)
+                    break
+
+                # Numbers (or anything else) ending the buffer may continue
+                # in the next chunk
+                if not final and _number_rest.match(buf, end):
+                    break
+
+                yield item
+                state = 'next'
+                pos = end
+            else:
+                raise ValueError("Extra data after JSON array at %i" % (pos))
+
+    if state != 'end':
+        raise ValueError("JSON array ended prematurely")
+
+
+def _with_final(chunks):
+    """Yield (chunk, final) pairs, ending with an empty final chunk"""
+
+    for chunk in chunks:
+        if chunk:
+            yield chunk, False
+    yield b'', True
+
+
+class StreamingResponse(object):
+    """
+    Response of a call made with stream='items' or stream='raw', iterating
+    over array elements or raw chunks of `chunk_size` bytes respectively.
+
+    The connection is released once iteration finishes, or on `close`.
+
+    `content_bytes_in` counts the bytes of the body read so far, and
+    `bytes_in` how many of them came over the wire (less when the body is
+    compressed).
+    """
+
+    def __init__(self, resp, mode, chunk_size=65536):
+        if mode not in STREAM_MODES:
+            raise ValueError("Unknown stream mode '%s'" % (mode))
+
+        self.mode = mode
+        self.chunk_size = chunk_size
+
+        self.status_code = resp.status_code
+        self.headers = resp.headers
+        self.url = resp.url
+        self.content_bytes_in = 0
+
+        self._resp = resp
+
+    def iter_raw(self):
+        """Yield the body in chunks, decompressed if it was compressed"""
+
+        try:
+            for chunk in self._resp.iter_content(self.chunk_size):
+                self.content_bytes_in += len(chunk)
+                yield chunk
+        finally:
+            self.close()
+
+    def __iter__(self):
+        if self.mode == 'raw':
+            return self.iter_raw()
+
+        return iter_json_array(self.iter_raw())
+
+    @property
+    def bytes_in(self):
+        """Bytes of the body read so far as they came over the wire"""
+
+        return wire_size(self._resp, self.content_bytes_in)
+
+    def save(self, file):
+        """
+        Write the raw body to file, a path or a file object opened for
+        writing bytes, and return the number of bytes written
+        """
+
+        if not hasattr(file, 'write'):
+            with open(file, 'wb') as out:
+                return self.save(out)
+
+        written = 0
+        for chunk in self.iter_raw():
+            file.write(chunk)
+            written += len(chunk)
+
+        return written
+
+    def close(self):
+        """Release the connection"""
+
+        self._resp.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+__all__ = ["StreamingResponse", "iter_json_array", "STREAM_MODES"]
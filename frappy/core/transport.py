@@ -0,0 +1,224 @@
+"""
+Recording API exchanges to cassettes and replaying them without a network.
+
+A cassette is a list of request/response exchanges, stored as a JSON file.
+RecordingPool and ReplayPool take the place of the ConnectionPool of a
+service, so everything on top of the pool (uri building, auth, caching,
+response handling, etc.) runs exactly as it does against the real API:
+
+    # Record once against the real API
+    recorder = RecordingPool(Cassette('github.json'))
+    g = Github(pool=recorder)
+    g.repos.durden.frappy.commits()
+    recorder.cassette.save()
+
+    # Replay as often as needed, offline and at the speed of memory
+    g = Github(pool=ReplayPool(Cassette.load('github.json')))
+    g.repos.durden.frappy.commits()
+
+Requests are matched on method, full uri (including query string) and
+body.  Request headers are never recorded, so credentials don't end up in
+cassettes.
+"""
+
+import base64
+import io
+import json
+import os
+import threading
+
+from requests.structures import CaseInsensitiveDict
+
+from frappy.core.pool import ConnectionPool
+
+
+class CassetteMiss(LookupError):
+    """
+    Raised by ReplayPool for a request that isn't in its cassette.
+    """
+
+    def __init__(self, method, uri):
+        self.method = method
+        self.uri = uri
+
+        LookupError.__init__(self)
+
+    def __str__(self):
+        return "No recorded response for %s %s" % (self.method.upper(),
+                                                   self.uri)
+
+
+class RecordedResponse(object):
+    """
+    Response replayed from a cassette, with the parts of the interface of
+    requests' Response used by frappy
+    """
+
+    def __init__(self, status_code, headers, content, url):
+        self.status_code = status_code
+        self.headers = CaseInsensitiveDict(headers)
+        self.content = content
+        self.url = url
+
+        # Streams read from the raw response
+        self.raw = io.BytesIO(content)
+
+    def iter_content(self, chunk_size=1):
+        for start in range(0, len(self.content), chunk_size):
+            yield self.content[start:start + chunk_size]
+
+    def close(self):
+        pass
+
+
+def _body_bytes(body):
+    if body is None:
+        return b''
+    if isinstance(body, bytes):
+        return body
+    return body.encode('utf8')
+
+
+class Cassette(object):
+    """
+    Exchanges recorded at `path`, saved there with `save`.
+    """
+
+    def __init__(self, path=None, exchanges=None):
+        self.path = path
+        self.exchanges = exchanges if exchanges is not None else []
+
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path):
+        """Return cassette with the exchanges saved at path"""
+
+        with open(path) as cassette_file:
+            return cls(path, json.load(cassette_file)['exchanges'])
+
+    def save(self, path=None):
+        """Write exchanges to path (or the path the cassette was made for)"""
+
+        path = path or self.path
+
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as cassette_file:
+            json.dump({'exchanges': self.exchanges}, cassette_file, indent=1,
+                      sort_keys=True)
+        os.replace(tmp_path, path)
+
+    def add(self, method, uri, body, status_code, headers, content,
+            url=None):
+        """Add exchange, with body and content as bytes or text"""
+
+        content = _body_bytes(content)
+
+        # Bodies are stored decompressed, so mustn't claim to be compressed
+        headers = CaseInsensitiveDict(headers)
+        if headers.pop('content-encoding', None) is not None:
+            headers['Content-Length'] = str(len(content))
+
+        response = {'status': status_code, 'headers': dict(headers),
+                    'url': url or uri}
+        try:
+            response['body'] = content.decode('utf8')
+        except UnicodeDecodeError:
+            response['body_base64'] = base64.b64encode(content).decode('ascii')
+
+        exchange = {
+            'request': {'method': method.lower(), 'uri': uri,
+                        'body': _body_bytes(body).decode('utf8', 'replace')},
+            'response': response,
+        }
+
+        with self._lock:
+            self.exchanges.append(exchange)
+
+
+class RecordingPool(object):
+    """
+    Pool sending requests through `pool` (a new ConnectionPool by default)
+    and recording every exchange in `cassette`
+    """
+
+    def __init__(self, cassette, pool=None):
+        self.cassette = cassette
+        self.pool = pool if pool is not None else ConnectionPool()
+
+    def request(self, method, uri, **kwargs):
+        resp = self.pool.request(method, uri, **kwargs)
+
+        self.cassette.add(method, self.full_uri(uri, kwargs.get('params')),
+                          kwargs.get('data'), resp.status_code, resp.headers,
+                          resp.content, resp.url)
+
+        # The body was read for recording, so serve it from memory
+        if kwargs.get('stream'):
+            return RecordedResponse(resp.status_code, resp.headers,
+                                    resp.content, resp.url)
+
+        return resp
+
+    full_uri = staticmethod(ConnectionPool.full_uri)
+
+    def close(self):
+        self.pool.close()
+
+
+class ReplayPool(object):
+    """
+    Pool answering requests with the responses recorded in `cassette`.
+
+    Requests recorded more than once are answered with their responses in
+    recorded order, repeating the last one once all have been used (so
+    replays can be looped as often as needed).  Unknown requests raise
+    CassetteMiss.
+    """
+
+    def __init__(self, cassette):
+        self.cassette = cassette
+
+        self._responses = {}
+        self._used = {}
+        self._lock = threading.Lock()
+
+        for exchange in cassette.exchanges:
+            request = exchange['request']
+            key = (request['method'], request['uri'], request['body'])
+            self._responses.setdefault(key, []).append(
+                                    self._response(exchange['response']))
+
+    @staticmethod
+    def _response(recorded):
+        if 'body_base64' in recorded:
+            content = base64.b64decode(recorded['body_base64'])
+        else:
+            content = recorded['body'].encode('utf8')
+
+        return (recorded['status'], recorded['headers'], content,
+                recorded['url'])
+
+    def request(self, method, uri, **kwargs):
+        uri = self.full_uri(uri, kwargs.get('params'))
+        key = (method.lower(), uri,
+               _body_bytes(kwargs.get('data')).decode('utf8', 'replace'))
+
+        responses = self._responses.get(key)
+        if responses is None:
+            raise CassetteMiss(method, uri)
+
+        with self._lock:
+            used = self._used.get(key, 0)
+            self._used[key] = used + 1
+
+        return RecordedResponse(*responses[min(used, len(responses) - 1)])
+
+    full_uri = staticmethod(ConnectionPool.full_uri)
+
+    def close(self):
+        pass
+
+
+__all__ = ["Cassette", "CassetteMiss", "RecordedResponse", "RecordingPool",
+           "ReplayPool"]
@@ -6,18 +6,74 @@ Internal utility functions.
 """
 
 
+import atexit
 import re
 import sys
+import threading
 try:
     from html.entities import name2codepoint
 except ImportError:
     from htmlentitydefs import name2codepoint
 
 
+# Named, decimal and hex entities
+_entity = re.compile(r'&(#[0-9]+|#[xX][0-9a-fA-F]+|[A-Za-z][A-Za-z0-9]*);')
+
+
+def _entity_char(match):
+    """
+    Return character for entity match, unknown entities are kept as is.
+    Numeric references to 0, surrogates or beyond U+10FFFF can't be encoded
+    (i.e. as UTF-8), so decode to U+FFFD as in HTML5.
+    """
+
+    entity = match.group(1)
+
+    if entity[0] != '#':
+        codepoint = name2codepoint.get(entity)
+        if codepoint is None:
+            return match.group(0)
+        return chr(codepoint)
+
+    if entity[1] in 'xX':
+        codepoint = int(entity[2:], 16)
+    else:
+        codepoint = int(entity[1:])
+
+    if codepoint == 0 or 0xD800 <= codepoint <= 0xDFFF or \
+            codepoint > 0x10FFFF:
+        return '\ufffd'
+
+    return chr(codepoint)
+
+
 def htmlentitydecode(s):
-    return re.sub(
-        '&(%s);' % '|'.join(name2codepoint),
-        lambda m: chr(name2codepoint[m.group(1)]), s)
+    """
+    Decode named, decimal and hex HTML entities in s
+
+    >>> htmlentitydecode('&lt;3 &amp; it&#39;s &#x263A; &bogus;')
+    "<3 & it's \u263a &bogus;"
+    >>> htmlentitydecode('&#55357;&#56832; &#0; &#x110000;')
+    '\ufffd\ufffd \ufffd \ufffd'
+    """
+
+    if '&' not in s:
+        return s
+
+    return _entity.sub(_entity_char, s)
+
+
+def decode_many(strings):
+    """
+    Return list of strings with HTML entities decoded
+
+    >>> decode_many(['a &amp; b', 'no entities', '&quot;c&quot;'])
+    ['a & b', 'no entities', '"c"']
+    """
+
+    sub = _entity.sub
+
+    return [s if '&' not in s else sub(_entity_char, s) for s in strings]
 
 
 def smrt_input(globals_, locals_, ps1=">>> ", ps2="... "):
@@ -27,6 +83,7 @@ def smrt_input(globals_, locals_, ps1=">>> ", ps2="... "):
             prompt = ps2
         else:
             prompt = ps1
+        stdout_buffer.flush()
         inputs.append(input(prompt))
         try:
             ret = eval('\n'.join(inputs), globals_, locals_)
@@ -37,11 +94,155 @@ def smrt_input(globals_, locals_, ps1=">>> ", ps2="... "):
             pass
 
 
+# RFC 3986 unreserved characters are never escaped, every other byte is
+_is_unreserved = re.compile(r'[A-Za-z0-9._~-]*\Z').match
+_ESCAPES = [chr(i) if _is_unreserved(chr(i)) else '%%%02X' % i
+            for i in range(256)]
+
+# Parameter names are few and repeated on every request (oauth_* etc.)
+_name_cache = {}
+
+
+def percent_encode(value):
+    """
+    Percent-encode value as RFC 3986 (and OAuth) ask for, escaping all
+    but unreserved characters.  Text is encoded as UTF-8 first.
+
+    >>> percent_encode(u'caf\xe9 & cr\xe8me~')
+    'caf%C3%A9%20%26%20cr%C3%A8me~'
+    """
+
+    if isinstance(value, bytes):
+        data = value
+    else:
+        if not isinstance(value, str):
+            value = str(value)
+
+        # Most values (keys, tokens, ids, etc.) need no escaping at all
+        if _is_unreserved(value):
+            return value
+
+        data = value.encode('utf8')
+
+    return ''.join(map(_ESCAPES.__getitem__, bytearray(data)))
+
+
+def _encode_name(name):
+    try:
+        return _name_cache[name]
+    except (KeyError, TypeError):
+        encoded = percent_encode(name)
+
+    if len(_name_cache) < 1024:
+        try:
+            _name_cache[name] = encoded
+        except TypeError:
+            pass
+
+    return encoded
+
+
+def urlencode_noplus(query):
+    """
+    Encode query, a mapping or a sequence of (name, value) pairs, as query
+    string with spaces encoded as %20 rather than '+', which OAuth requires
+    for signing (and therefore also in the request itself.)  Pairs are kept
+    in the given order, values that are lists or tuples are repeated and
+    None values are left out.
+
+    >>> urlencode_noplus([('q', 'frappy api'), ('ids', [1, 2]), ('x', None)])
+    'q=frappy%20api&ids=1&ids=2'
+    """
+
+    if hasattr(query, "items"):
+        query = query.items()
+
+    encoded_bits = []
+    for name, val in query:
+        if val is None:
+            continue
+
+        name = _encode_name(name)
+
+        if isinstance(val, (list, tuple)):
+            encoded_bits.extend(name + '=' + percent_encode(item)
+                                for item in val)
+        else:
+            encoded_bits.append(name + '=' + percent_encode(val))
+
+    return "&".join(encoded_bits)
+
+
+class OutputBuffer(object):
+    """
+    Buffered UTF-8 output to a text stream (sys.stdout at the time of
+    writing by default) which is safe to share between threads.
+
+    Text is collected until `buffer_size` characters are pending or `flush`
+    is called, then encoded and written in one go, so printing many small
+    strings costs about as much as printing one large one.
+    """
+
+    def __init__(self, stream=None, buffer_size=65536):
+        self.stream = stream
+        self.buffer_size = buffer_size
+
+        self._pending = []
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def write(self, text):
+        """Queue text for output"""
+
+        with self._lock:
+            self._pending.append(text)
+            self._size += len(text)
+            if self._size >= self.buffer_size:
+                self._flush()
+
+    def flush(self):
+        """Write out everything queued so far"""
+
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        if not self._pending:
+            return
+
+        text = ''.join(self._pending)
+        self._pending = []
+        self._size = 0
+
+        stream = self.stream if self.stream is not None else sys.stdout
+        if hasattr(stream, 'buffer'):
+            # Anything printed directly has to go out first
+            stream.flush()
+            stream.buffer.write(text.encode('utf8'))
+            stream.buffer.flush()
+        else:
+            stream.write(text)
+            stream.flush()
+
+
+# Shared by everything printing to stdout, so output stays in order
+stdout_buffer = OutputBuffer()
+atexit.register(stdout_buffer.flush)
+
+
 def printNicely(string):
+    """
+    Print string followed by a newline right away, after anything still
+    waiting in stdout_buffer
+    """
+
+    stdout_buffer.flush()
+
     if hasattr(sys.stdout, 'buffer'):
         sys.stdout.buffer.write(string.encode('utf8'))
         print()
     else:
         print(string.encode('utf8'))
 
-__all__ = ["htmlentitydecode", "smrt_input"]
+__all__ = ["htmlentitydecode", "decode_many", "smrt_input", "percent_encode",
+           "urlencode_noplus", "OutputBuffer", "stdout_buffer", "printNicely"]
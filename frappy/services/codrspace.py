@@ -27,10 +27,11 @@ class Codrspace(APICall):
 
     """
 
-    def __init__(self, username, api_key, domain="codrspace.com/api/"):
+    def __init__(self, username, api_key, domain="codrspace.com/api/",
+                 **kwargs):
 
         APICall.__init__(self, auth=None, req_format='json', domain=domain,
-                         secure=False)
+                         secure=False, **kwargs)
 
         self._api_key = api_key
         self._username = username
@@ -45,6 +46,7 @@ class Codrspace(APICall):
 
         return kwargs
 
+
 if __name__ == "__main__":
     import doctest
     doctest.testmod()
@@ -0,0 +1,20 @@
+"""
+Asynchronous flavour of the Codrspace API, in a module of its own so using
+Codrspace (from frappy.services.codrspace) doesn't import asyncio.
+"""
+
+from frappy.core.async_api import AsyncAPICall
+from frappy.services.codrspace import Codrspace
+
+
+class AsyncCodrspace(AsyncAPICall, Codrspace):
+    """
+    Asynchronous flavour of Codrspace, all calls have to be awaited
+
+    c = AsyncCodrspace('durden', 'c139439a4d682d2db84a8d603eddb5c38c56d8e5')
+    posts = await c.post()
+    """
+    pass
+
+
+__all__ = ["AsyncCodrspace"]
@@ -35,12 +35,12 @@ class Forrst(APICall):
     """
 
     def __init__(self, req_format="json", domain="forrst.com/api",
-                 secure=False, auth=None, api_version='v2'):
+                 secure=False, auth=None, api_version='v2', **kwargs):
 
         domain += "/%s" % (api_version)
 
         APICall.__init__(self, auth=auth, req_format=req_format, domain=domain,
-                         secure=secure)
+                         secure=secure, **kwargs)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,20 @@
+"""
+Asynchronous flavour of the Forrst API, in a module of its own so using
+Forrst (from frappy.services.forrst) doesn't import asyncio.
+"""
+
+from frappy.core.async_api import AsyncAPICall
+from frappy.services.forrst import Forrst
+
+
+class AsyncForrst(AsyncAPICall, Forrst):
+    """
+    Asynchronous flavour of Forrst, all calls have to be awaited
+
+    f = AsyncForrst()
+    x = await f.users.info(username='durden')
+    """
+    pass
+
+
+__all__ = ["AsyncForrst"]
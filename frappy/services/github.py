@@ -62,13 +62,21 @@ class Github(APICall):
     >>> x = g.repos.durden.frappy.commits(page=2,per_page=2)
     >>> x.requested_uri
     u'https://api.github.com/repos/durden/frappy/commits?per_page=2&page=2'
+
+    Iterate over all pages of results with paginate()
+    -------------------------------------------------
+
+    for commit in g.repos.durden.frappy.commits.paginate(per_page=100):
+        print(commit['sha'])
     """
 
+    pagination = 'link'
+
     def __init__(self, req_format="json", domain="api.github.com",
-                 secure=True, auth=None):
+                 secure=True, auth=None, **kwargs):
 
         APICall.__init__(self, auth=auth, req_format=req_format, domain=domain,
-                         secure=secure)
+                         secure=secure, **kwargs)
 
     def _prepare_request_params(self, **kwargs):
         """Encode specific request data as json"""
@@ -79,6 +87,7 @@ class Github(APICall):
 
         return json.dumps(kwargs)
 
+
 if __name__ == "__main__":
     import doctest
     doctest.testmod()
@@ -0,0 +1,21 @@
+"""
+Asynchronous flavour of the Github API, in a module of its own so using
+Github (from frappy.services.github) doesn't import asyncio.
+"""
+
+from frappy.core.async_api import AsyncAPICall
+from frappy.services.github import Github
+
+
+class AsyncGithub(AsyncAPICall, Github):
+    """
+    Asynchronous flavour of Github, all calls have to be awaited
+
+    g = AsyncGithub()
+    commit = await g.repos.durden.frappy.commits(
+                                    '160185c313f7c49167ce122c85b13db527eeece2')
+    """
+    pass
+
+
+__all__ = ["AsyncGithub"]
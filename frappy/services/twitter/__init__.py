@@ -2,26 +2,33 @@
 The minimalist yet fully featured Twitter API and Python toolset.
 
 The Twitter and TwitterStream classes are the key to building your own
-Twitter-enabled applications.
+Twitter-enabled applications, see their documentation for examples.
 
+They are only imported on first use, so the command-line tools in this
+package start without loading the HTTP libraries they don't need.
 """
 
-from .twitter import Twitter
-from .stream import TwitterStream
+import importlib
 
+_LAZY = {
+    'Twitter': '.twitter',
+    'AsyncTwitter': '.twitter_async',
+    'TwitterStream': '.stream',
+}
 
-# Who needs Sphinx? Not me!
 
-__doc__ += """
-The Twitter class
-=================
-"""
-__doc__ += Twitter.__doc__
+def __getattr__(name):
+    if name not in _LAZY:
+        raise AttributeError("module %r has no attribute %r" % (__name__,
+                                                                 name))
+
+    value = getattr(importlib.import_module(_LAZY[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY))
 
-__doc__ += """
-The TwitterStream class
-=======================
-"""
-__doc__ += TwitterStream.__doc__
 
-__all__ = ["Twitter", "TwitterStream"]
+__all__ = ["Twitter", "AsyncTwitter", "TwitterStream"]
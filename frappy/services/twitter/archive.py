@@ -0,0 +1,385 @@
+"""
+Compact, append-only, columnar archive of tweets.
+
+An archive is a directory holding one file per column of fixed-size values
+(native byte order) plus a file with the UTF-8 encoded screen names and
+texts the columns point into:
+
+    id.col            tweet id                                 int64
+    created_at.col    creation time in UTC epoch seconds       int64
+    in_reply_to.col   id of tweet replied to, 0 if none        int64
+    user_offset.col   offset of screen name in strings.dat     int64
+    user_length.col   length of screen name in bytes           int32
+    text_offset.col   offset of text in strings.dat            int64
+    text_length.col   length of text in bytes                  int32
+    strings.dat       screen names and texts
+    meta.json         number of tweets, lowest and highest id stored, etc.
+
+Columns are memory-mapped for reading, so archives with millions of tweets
+open instantly and only the parts actually read are loaded.
+
+Timelines are fetched (and appended) newest first, so the id column is made
+of a few runs of ordered ids, which meta.json keeps track of.  Looking up a
+tweet by id is a binary search of every run right in the mapped column,
+without building an index.
+
+meta.json is written last on every flush, so it's what the archive holds:
+whatever a writer dying halfway through a flush left beyond the tweets
+counted in it is dropped on opening.
+"""
+
+import json
+import mmap
+import os
+from array import array
+from bisect import bisect_left
+
+from frappy.services.twitter.timestamps import parse_created_at
+
+COLUMNS = (
+    ('id', 'q'),
+    ('created_at', 'q'),
+    ('in_reply_to', 'q'),
+    ('user_offset', 'q'),
+    ('user_length', 'i'),
+    ('text_offset', 'q'),
+    ('text_length', 'i'),
+)
+
+STRINGS = 'strings.dat'
+META = 'meta.json'
+
+# Past this many runs of ordered ids, tweets are looked up with an index
+# sorted in memory instead
+MAX_RUNS = 32
+
+
+class TweetArchive(object):
+    """
+    Columnar archive of tweets in `directory`, created if it doesn't exist.
+
+    Tweets (as decoded from the API) are added with `append`, which buffers
+    them until `flush` or `close`.  Reading works like a sequence of dicts
+    in the order tweets were appended, and `get` looks tweets up by id with
+    a binary search of every run of ordered ids (see the module docs).
+
+    `meta` holds the lowest (`min_id`) and highest (`max_id`) tweet id
+    stored, so fetching can be resumed without reading the archive, the
+    number of tweets and bytes of strings written and the runs of ordered
+    ids (as [start, end, step] with step -1 descending, 1 ascending and 0
+    for equal ids, or None once there are too many), along with whatever else
+    callers want to keep there (i.e. whether the history of a user has been
+    archived completely.)
+    """
+
+    def __init__(self, directory, buffer_size=1024):
+        self.directory = directory
+        self.buffer_size = buffer_size
+
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        self.meta = {'min_id': None, 'max_id': None}
+        meta_path = self._path(META)
+        if os.path.exists(meta_path):
+            with open(meta_path) as meta_file:
+                self.meta.update(json.load(meta_file))
+
+        self._buffers = dict((name, array(typecode))
+                             for name, typecode in COLUMNS)
+        self._strings = bytearray()
+        self._user_offsets = {}
+
+        self._length = self._recover()
+        self._strings_size = os.path.getsize(self._path(STRINGS))
+
+        self._last_id = None
+        if self._length:
+            with open(self._path('id.col'), 'rb') as ids:
+                ids.seek((self._length - 1) * 8)
+                self._last_id = array('q', ids.read(8))[0]
+
+        if 'runs' not in self.meta:
+            # Archives from before runs were kept are searched with an index
+            self.meta['runs'] = [] if not self._length else None
+
+        self._maps = None
+        self._index = None
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _recover(self):
+        """
+        Cut columns and strings back to what meta accounts for, in case a
+        previous writer died halfway through a flush, and return the number
+        of tweets
+        """
+
+        sizes = []
+        for name, typecode in COLUMNS:
+            path = self._path(name + '.col')
+            open(path, 'ab').close()
+            sizes.append(os.path.getsize(path) // array(typecode).itemsize)
+
+        open(self._path(STRINGS), 'ab').close()
+
+        # Archives written before meta counted tweets are trusted as far as
+        # all their columns go
+        length = min(sizes)
+        if self.meta.get('length') is not None:
+            length = min(length, self.meta['length'])
+
+        strings_size = self.meta.get('strings_size')
+        if (strings_size is not None and
+                os.path.getsize(self._path(STRINGS)) > strings_size):
+            with open(self._path(STRINGS), 'r+b') as strings:
+                strings.truncate(strings_size)
+
+        for name, typecode in COLUMNS:
+            path = self._path(name + '.col')
+            size = length * array(typecode).itemsize
+            if os.path.getsize(path) != size:
+                with open(path, 'r+b') as column:
+                    column.truncate(size)
+
+        # Runs of tweets cut off are gone as well
+        if self.meta.get('runs'):
+            self.meta['runs'] = [[start, min(end, length), step]
+                                 for start, end, step in self.meta['runs']
+                                 if start < length]
+
+        return length
+
+    def __len__(self):
+        return self._length + len(self._buffers['id'])
+
+    @property
+    def min_id(self):
+        return self.meta['min_id']
+
+    @property
+    def max_id(self):
+        return self.meta['max_id']
+
+    def append(self, tweet):
+        """Add tweet to the archive"""
+
+        tweet_id = tweet['id']
+        screen_name = tweet['user']['screen_name']
+        text = tweet['text'].encode('utf8')
+
+        # Screen names repeat a lot, so only store each once per session
+        user = self._user_offsets.get(screen_name)
+        if user is None:
+            encoded = screen_name.encode('utf8')
+            user = (self._strings_size + len(self._strings), len(encoded))
+            self._strings += encoded
+            self._user_offsets[screen_name] = user
+
+        buffers = self._buffers
+        buffers['id'].append(tweet_id)
+        buffers['created_at'].append(parse_created_at(tweet['created_at']))
+        buffers['in_reply_to'].append(tweet.get('in_reply_to_status_id') or 0)
+        buffers['user_offset'].append(user[0])
+        buffers['user_length'].append(user[1])
+        buffers['text_offset'].append(self._strings_size + len(self._strings))
+        buffers['text_length'].append(len(text))
+        self._strings += text
+
+        self._add_to_runs(tweet_id, self._length + len(buffers['id']) - 1)
+
+        if self.meta['min_id'] is None or tweet_id < self.meta['min_id']:
+            self.meta['min_id'] = tweet_id
+        if self.meta['max_id'] is None or tweet_id > self.meta['max_id']:
+            self.meta['max_id'] = tweet_id
+
+        if len(buffers['id']) >= self.buffer_size:
+            self.flush()
+
+    def _add_to_runs(self, tweet_id, position):
+        """
+        Track run of ordered ids the tweet just appended at position
+        belongs to
+        """
+
+        runs = self.meta['runs']
+        last_id, self._last_id = self._last_id, tweet_id
+        if runs is None:
+            return
+
+        run = runs[-1] if runs else None
+        if run is not None and run[1] == position:
+            step = (tweet_id > last_id) - (tweet_id < last_id)
+            if step == 0 or run[2] in (0, step):
+                run[1] += 1
+                run[2] = run[2] or step
+                return
+
+        if len(runs) == MAX_RUNS:
+            self.meta['runs'] = None
+        else:
+            runs.append([position, position + 1, 0])
+
+    def flush(self):
+        """Write buffered tweets and meta data to disk"""
+
+        if len(self._buffers['id']):
+            # Strings go first so columns never point past the end of them
+            with open(self._path(STRINGS), 'ab') as strings:
+                strings.write(self._strings)
+            self._strings_size += len(self._strings)
+            self._strings = bytearray()
+
+            for name, typecode in COLUMNS:
+                with open(self._path(name + '.col'), 'ab') as column:
+                    self._buffers[name].tofile(column)
+
+            self._length += len(self._buffers['id'])
+            self._buffers = dict((name, array(typecode))
+                                 for name, typecode in COLUMNS)
+
+            self._unmap()
+
+        self.meta['length'] = self._length
+        self.meta['strings_size'] = self._strings_size
+
+        tmp_path = self._path(META + '.tmp')
+        with open(tmp_path, 'w') as meta_file:
+            json.dump(self.meta, meta_file)
+        os.replace(tmp_path, self._path(META))
+
+    def close(self):
+        """Flush and release the archive"""
+
+        self.flush()
+        self._unmap()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _map(self):
+        """Return memory-mapped columns and strings, mapping on first use"""
+
+        if len(self._buffers['id']):
+            self.flush()
+
+        if self._maps is None:
+            self._maps = {}
+            for name, typecode in COLUMNS + (('strings', 'B'),):
+                if not self._length:
+                    # Empty files can't be mapped
+                    self._maps[name] = (None, memoryview(array(typecode)))
+                    continue
+
+                path = self._path(name + '.col')
+                if name == 'strings':
+                    path = self._path(STRINGS)
+                with open(path, 'rb') as mapped_file:
+                    mapped = mmap.mmap(mapped_file.fileno(), 0,
+                                       access=mmap.ACCESS_READ)
+                self._maps[name] = (mapped, memoryview(mapped).cast(
+                                                            typecode))
+
+        return dict((name, view) for name, (_, view) in self._maps.items())
+
+    def _unmap(self):
+        if self._maps is not None:
+            for mapped, view in self._maps.values():
+                view.release()
+                if mapped is not None:
+                    mapped.close()
+        self._maps = None
+        self._index = None
+
+    def column(self, name):
+        """
+        Return memoryview of all values in column with name.
+
+        The view is released when the archive is next flushed (which
+        appending may do) or closed, so copy the values (i.e. with
+        `view.tolist()`) to keep them any longer.
+        """
+
+        return self._map()[name]
+
+    def __getitem__(self, position):
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < len(self):
+            raise IndexError(position)
+
+        maps = self._map()
+        strings = maps['strings']
+
+        user_offset = maps['user_offset'][position]
+        text_offset = maps['text_offset'][position]
+
+        return {
+            'id': maps['id'][position],
+            'created_at': maps['created_at'][position],
+            'in_reply_to_status_id': maps['in_reply_to'][position] or None,
+            'screen_name': bytes(strings[user_offset:user_offset +
+                                 maps['user_length'][position]]).decode(
+                                                                    'utf8'),
+            'text': bytes(strings[text_offset:text_offset +
+                          maps['text_length'][position]]).decode('utf8'),
+        }
+
+    def __iter__(self):
+        for position in range(len(self)):
+            yield self[position]
+
+    def get(self, tweet_id, default=None):
+        """Return tweet with tweet_id or default"""
+
+        position = self._find(tweet_id)
+        if position is None:
+            return default
+
+        return self[position]
+
+    def _find(self, tweet_id):
+        """Return position of tweet with tweet_id or None"""
+
+        runs = self.meta['runs']
+        if runs is None:
+            return self._find_indexed(tweet_id)
+
+        ids = self.column('id')
+        for start, end, step in runs:
+            # Lowest position in run with an id not past tweet_id
+            low, high = start, end
+            while low < high:
+                middle = (low + high) // 2
+                if (ids[middle] - tweet_id) * step < 0:
+                    low = middle + 1
+                else:
+                    high = middle
+            if low < end and ids[low] == tweet_id:
+                return low
+
+        return None
+
+    def _find_indexed(self, tweet_id):
+        """Return position of tweet with tweet_id using an index in memory"""
+
+        if self._index is None:
+            ids = self.column('id')
+            order = array('q', sorted(range(len(ids)),
+                                      key=ids.__getitem__))
+            self._index = (array('q', (ids[i] for i in order)), order)
+
+        sorted_ids, order = self._index
+        position = bisect_left(sorted_ids, tweet_id)
+
+        if position == len(sorted_ids) or sorted_ids[position] != tweet_id:
+            return None
+
+        return order[position]
+
+
+__all__ = ["TweetArchive"]
@@ -27,8 +27,13 @@ ACTIONS:
 OPTIONS:
 
  -r --refresh               run this command forever, polling every once
-                            in a while (default: every 5 minutes)
+                            in a while for new statuses (default: about
+                            every 10 minutes, more often when there's a
+                            lot going on, less often when it's quiet)
  -R --refresh-rate <rate>   set the refresh rate (in seconds)
+ -s --stream                show friends, public or replies statuses as
+                            they happen using the streaming API, polling
+                            like --refresh if that fails
  -f --format <format>       specify the output format for status updates
  -c --config <filename>     read username and password from given config
                             file (default ~/.twitter)
@@ -71,30 +76,23 @@ import time
 from getopt import gnu_getopt as getopt, GetoptError
 import re
 import os.path
+from functools import lru_cache
+
+# Only what every action needs is imported here, the API client (and its
+# errors), OAuth, config file parsing, etc. are imported by the actions using
+# them, so running help (or a mistyped action) doesn't wait for them
+from .timestamps import (parse_with_format, CREATED_AT_FORMAT,
+                         SEARCH_CREATED_AT_FORMAT)
 
-try:
-    from ConfigParser import SafeConfigParser
-except ImportError:
-    from configparser import ConfigParser as SafeConfigParser
-import datetime
-try:
-    from urllib.parse import quote
-except ImportError:
-    from urllib2 import quote
-
-from .twitter import Twitter
-from .oauth_dance import oauth_dance
-
-from frappy.core.api import APIHTTPError
-from frappy.core.auth import OAuth
 from frappy.core import ansi
-from frappy.core.util import smrt_input, printNicely
+from frappy.core.util import smrt_input, stdout_buffer
 
 
 OPTIONS = {
     'action': 'friends',
     'refresh': False,
     'refresh_rate': 600,
+    'stream': False,
     'format': 'default',
     'prompt': '[cyan]twitter[R]> ',
     'config_filename': os.environ.get('HOME', '') + os.sep + '.twitter',
@@ -110,8 +108,8 @@ OPTIONS = {
 def parse_args(args, options):
     long_opts = ['help', 'format=', 'refresh', 'oauth=',
                  'refresh-rate=', 'config=', 'length=', 'timestamp',
-                 'datestamp', 'no-ssl']
-    short_opts = "e:p:f:h?rR:c:l:td"
+                 'datestamp', 'no-ssl', 'stream']
+    short_opts = "e:p:f:h?rR:c:l:tds"
     opts, extra_args = getopt(args, short_opts, long_opts)
 
     for opt, arg in opts:
@@ -121,6 +119,8 @@ def parse_args(args, options):
             options['refresh'] = True
         elif opt in ('-R', '--refresh-rate'):
             options['refresh_rate'] = int(arg)
+        elif opt in ('-s', '--stream'):
+            options['stream'] = True
         elif opt in ('-l', '--length'):
             options["length"] = int(arg)
         elif opt in ('-t', '--timestamp'):
@@ -142,23 +142,40 @@ def parse_args(args, options):
     options['extra_args'] = extra_args[1:]
 
 
-def get_time_string(status, options, format="%a %b %d %H:%M:%S +0000 %Y"):
-    timestamp = options["timestamp"]
-    datestamp = options["datestamp"]
-    t = time.strptime(status['created_at'], format)
-    i_hate_timezones = time.timezone
-    if (time.daylight):
-        i_hate_timezones = time.altzone
-    dt = datetime.datetime(*t[:-3]) - datetime.timedelta(
-        seconds=i_hate_timezones)
-    t = dt.timetuple()
+_utc_offset = None
+
+
+def get_utc_offset():
+    """Return seconds local time is behind UTC, worked out only once"""
+
+    global _utc_offset
+    if _utc_offset is None:
+        i_hate_timezones = time.timezone
+        if (time.daylight):
+            i_hate_timezones = time.altzone
+        _utc_offset = i_hate_timezones
+    return _utc_offset
+
+
+@lru_cache(maxsize=4096)
+def _format_time(created_at, timestamp, datestamp, format):
     if timestamp and datestamp:
-        return time.strftime("%Y-%m-%d %H:%M:%S ", t)
+        stamp_format = "%Y-%m-%d %H:%M:%S "
     elif timestamp:
-        return time.strftime("%H:%M:%S ", t)
+        stamp_format = "%H:%M:%S "
     elif datestamp:
-        return time.strftime("%Y-%m-%d ", t)
-    return ""
+        stamp_format = "%Y-%m-%d "
+    else:
+        return ""
+    t = time.gmtime(parse_with_format(created_at, format) - get_utc_offset())
+    return time.strftime(stamp_format, t)
+
+
+def get_time_string(status, options, format=CREATED_AT_FORMAT):
+    # Refreshing renders the same statuses over and over, so rendered
+    # strings are cached
+    return _format_time(status['created_at'], options["timestamp"],
+                        options["datestamp"], format)
 
 
 class StatusFormatter(object):
@@ -252,7 +269,7 @@ class SearchFormatter(object):
 
     def __call__(self, result, options):
         return("%s%s %s" % (
-            get_time_string(result, options, "%a, %d %b %Y %H:%M:%S +0000"),
+            get_time_string(result, options, SEARCH_CREATED_AT_FORMAT),
             result['from_user'], result['text']))
 
 
@@ -276,7 +293,7 @@ class AnsiSearchFormatter(object):
     def __call__(self, result, options):
         colour = self._colourMap.colourFor(result['from_user'])
         return ("%s%s%s%s %s" % (
-            get_time_string(result, options, "%a, %d %b %Y %H:%M:%S +0000"),
+            get_time_string(result, options, SEARCH_CREATED_AT_FORMAT),
             ansi.cmdColour(colour), result['from_user'],
             ansi.cmdReset(), result['text']))
 
@@ -328,6 +345,8 @@ formatters['lists'] = lists_formatters
 
 
 def get_formatter(action_type, options):
+    from frappy.core.api import APIHTTPError
+
     formatters_dict = formatters.get(action_type)
     if (not formatters_dict):
         raise APIHTTPError(
@@ -341,6 +360,9 @@ def get_formatter(action_type, options):
 
 
 class Action(object):
+    # Actions that don't talk to Twitter run without authorizing or
+    # creating a client (and without importing what that takes)
+    needs_twitter = True
 
     def ask(self, subject='perform this action', careful=False):
         '''
@@ -353,6 +375,7 @@ class Action(object):
             sample = '(Y/n)'
 
         prompt = 'You really want to %s %s? ' % (subject, sample)
+        stdout_buffer.flush()
         try:
             answer = input(prompt).lower()
             if careful:
@@ -374,16 +397,21 @@ class Action(object):
     def __call__(self, twitter, options):
         action = actions.get(options['action'], NoSuchAction)()
         try:
-            doAction = lambda: action(twitter, options)
-            if (options['refresh'] and isinstance(action, StatusAction)):
-                while True:
-                    doAction()
-                    time.sleep(options['refresh_rate'])
+            if (options['stream'] and isinstance(action, StatusAction)):
+                if not isinstance(action, TimelineAction):
+                    raise NoSuchActionError(
+                        "You can only stream the friends, public, or replies "
+                        "actions.")
+                action.stream(twitter, options)
+            elif (options['refresh'] and isinstance(action, StatusAction)):
+                action.refresh(twitter, options)
             else:
-                doAction()
+                action(twitter, options)
         except KeyboardInterrupt:
             print('\n[Keyboard Interrupt]', file=sys.stderr)
             pass
+        finally:
+            stdout_buffer.flush()
 
 
 class NoSuchActionError(Exception):
@@ -391,6 +419,8 @@ class NoSuchActionError(Exception):
 
 
 class NoSuchAction(Action):
+    needs_twitter = False
+
     def __call__(self, twitter, options):
         raise NoSuchActionError("No such action: %s" % (options['action']))
 
@@ -398,11 +428,141 @@ class NoSuchAction(Action):
 class StatusAction(Action):
     def __call__(self, twitter, options):
         statuses = self.getStatuses(twitter, options)
+        self.printStatuses(statuses, options)
+
+    def printStatuses(self, statuses, options):
         sf = get_formatter('status', options)
         for status in statuses:
             statusStr = sf(status, options)
             if statusStr.strip():
-                printNicely(statusStr)
+                stdout_buffer.write(statusStr + '\n')
+
+    def refresh(self, twitter, options):
+        '''
+        Run the action over and over, every refresh rate seconds.
+        '''
+        while True:
+            self(twitter, options)
+            stdout_buffer.flush()
+            time.sleep(options['refresh_rate'])
+
+
+class TimelineAction(StatusAction):
+    '''
+    Action showing a timeline, which can be polled for new statuses only
+    and streamed.  Subclasses implement fetchStatuses() and openStream().
+    '''
+    # Refreshing polls between a quarter and four times the refresh rate
+    min_refresh_factor = 0.25
+    max_refresh_factor = 4
+
+    def fetchStatuses(self, twitter, options, **kwargs):
+        raise NotImplementedError
+
+    def getStatuses(self, twitter, options):
+        return reversed(self.fetchStatuses(twitter, options).response)
+
+    def refresh(self, twitter, options, since_id=None):
+        '''
+        Poll for statuses forever, only asking for and printing those newer
+        than the newest one seen so far (or `since_id`).  How often is
+        adapted to how many new statuses come in and how much of the rate
+        limit is left.
+        '''
+        interval = options['refresh_rate']
+        while True:
+            kwargs = {}
+            if since_id is not None:
+                kwargs['since_id'] = since_id
+            call = self.fetchStatuses(twitter, options, **kwargs)
+            statuses = call.response if call else []
+
+            # Not every timeline knows since_id
+            if since_id is not None:
+                statuses = [s for s in statuses if s['id'] > since_id]
+
+            self.printStatuses(reversed(statuses), options)
+            stdout_buffer.flush()
+
+            if statuses:
+                since_id = max([since_id or 0] + [s['id'] for s in statuses])
+
+            interval = self.nextRefreshInterval(
+                interval, len(statuses), call, options)
+            time.sleep(interval)
+
+    def nextRefreshInterval(self, interval, n_new, call, options):
+        '''
+        Return seconds to wait before polling again after `n_new` statuses
+        came in, polling twice as often when a whole page of them did (so
+        some might have been missed) and less often when none did.  Never
+        polls faster than the rest of the rate limit allows.
+        '''
+        if n_new >= options['length']:
+            interval /= 2.0
+        elif not n_new:
+            interval *= 1.5
+
+        rate = options['refresh_rate']
+        interval = min(max(interval, rate * self.min_refresh_factor),
+                       rate * self.max_refresh_factor)
+
+        headers = call.headers['response'] if call else {}
+        if 'x-ratelimit-remaining' in headers:
+            # Spread the requests left evenly until the limit resets
+            until_reset = call.rate_limit_reset - time.time()
+            interval = max(interval,
+                           until_reset / max(call.rate_limit_remaining, 1))
+
+        return interval
+
+    # Streaming API serving the statuses of the action, see openStream()
+    stream_domain = 'stream.twitter.com'
+    stream_api_version = '1'
+
+    # Reconnects in a row before giving up on the stream
+    stream_max_reconnects = 5
+
+    def streamClient(self, twitter):
+        '''
+        Returns a TwitterStream for the streaming API of the action sharing
+        authentication and connections with `twitter`.
+        '''
+        from .stream import TwitterStream
+        return TwitterStream(
+            domain=self.stream_domain,
+            api_version=self.stream_api_version,
+            secure=twitter.base_uri.startswith('https'),
+            auth=twitter.auth,
+            pool=twitter.pool,
+            max_reconnects=self.stream_max_reconnects)
+
+    def openStream(self, twitter, options):
+        raise NotImplementedError
+
+    def stream(self, twitter, options):
+        '''
+        Print statuses from the streaming API as they arrive.  When the
+        stream can't be opened or keeps failing, poll for them like
+        refreshing does instead, starting after the last status streamed.
+        '''
+        from frappy.core.api import APIHTTPError
+        from frappy.core.pool import NETWORK_ERRORS
+
+        since_id = None
+        try:
+            for message in self.openStream(twitter, options):
+                # Skip friend lists, deletions, limit notices, etc.
+                if 'text' not in message or 'user' not in message:
+                    continue
+                self.printStatuses([message], options)
+                stdout_buffer.flush()
+                since_id = max(since_id or 0, message['id'])
+        except (APIHTTPError,) + NETWORK_ERRORS as e:
+            print("Streaming failed (%s), polling instead." % (
+                str(e).strip()), file=sys.stderr)
+
+        self.refresh(twitter, options, since_id)
 
 
 class SearchAction(Action):
@@ -412,28 +572,36 @@ class SearchAction(Action):
         twitter.domain = "search.twitter.com"
         twitter.uriparts = ()
 
+        try:
+            from urllib.parse import quote
+        except ImportError:
+            from urllib2 import quote
+
         # We need to bypass the TwitterCall parameter encoding, so we
         # don't encode the plus sign, so we have to encode it ourselves
         query_string = "+".join(
             [quote(term)
              for term in options['extra_args']])
 
-        results = twitter.search(q=query_string)['results']
+        results = twitter.search(q=query_string).response['results']
         f = get_formatter('search', options)
         for result in results:
             resultStr = f(result, options)
             if resultStr.strip():
-                printNicely(resultStr)
+                stdout_buffer.write(resultStr + '\n')
 
 
 class AdminAction(Action):
     def __call__(self, twitter, options):
+        from frappy.core.api import APIHTTPError
+
         if not (options['extra_args'] and options['extra_args'][0]):
             raise APIHTTPError("You need to specify a user (screen name)")
         af = get_formatter('admin', options)
         try:
             user = self.getUser(twitter, options['extra_args'][0])
         except APIHTTPError as e:
+            stdout_buffer.flush()
             print("There was a problem following or leaving specified user.")
             print("You may be trying to follow a user your already following;")
             print("Leaving a user you are not currently following;")
@@ -442,65 +610,86 @@ class AdminAction(Action):
             print()
             print(e)
         else:
-            printNicely(af(options['action'], user))
+            stdout_buffer.write(af(options['action'], user) + '\n')
 
 
 class ListsAction(StatusAction):
     def getStatuses(self, twitter, options):
+        from frappy.core.api import APIHTTPError
+
         if not options['extra_args']:
             raise APIHTTPError("Please provide a user to query for lists")
 
         screen_name = options['extra_args'][0]
 
         if not options['extra_args'][1:]:
-            lists = twitter.user.lists(user=screen_name)['lists']
+            lists = twitter.user.lists(user=screen_name).response['lists']
             if not lists:
-                printNicely("This user has no lists.")
+                stdout_buffer.write("This user has no lists.\n")
             for list in lists:
                 lf = get_formatter('lists', options)
-                printNicely(lf(list))
+                stdout_buffer.write(lf(list) + '\n')
             return []
         else:
             return reversed(twitter.user.lists.list.statuses(
-                    user=screen_name, list=options['extra_args'][1]))
+                    user=screen_name, list=options['extra_args'][1]).response)
 
 
 class MyListsAction(ListsAction):
     def getStatuses(self, twitter, options):
-        screen_name = twitter.account.verify_credentials()['screen_name']
-        options['extra_args'].insert(0, screen_name)
+        screen_name = twitter.account.verify_credentials().response[
+            'screen_name']
+        # Leave options alone, so refreshing doesn't add screen_name again
+        options = dict(options,
+                       extra_args=[screen_name] + options['extra_args'])
         return ListsAction.getStatuses(self, twitter, options)
 
 
-class FriendsAction(StatusAction):
-    def getStatuses(self, twitter, options):
-        return reversed(twitter.statuses.friends_timeline(
-                                                    count=options["length"]))
+class FriendsAction(TimelineAction):
+    def fetchStatuses(self, twitter, options, **kwargs):
+        return twitter.statuses.friends_timeline(count=options["length"],
+                                                 **kwargs)
 
+    stream_domain = 'userstream.twitter.com'
+    stream_api_version = '2'
 
-class PublicAction(StatusAction):
-    def getStatuses(self, twitter, options):
-        return reversed(twitter.statuses.public_timeline(
-                                                    count=options["length"]))
+    def openStream(self, twitter, options):
+        return self.streamClient(twitter).user()
 
 
-class RepliesAction(StatusAction):
-    def getStatuses(self, twitter, options):
-        return reversed(twitter.statuses.replies(count=options["length"]))
+class PublicAction(TimelineAction):
+    def fetchStatuses(self, twitter, options, **kwargs):
+        return twitter.statuses.public_timeline(count=options["length"],
+                                                **kwargs)
+
+    def openStream(self, twitter, options):
+        return self.streamClient(twitter).statuses.sample()
+
+
+class RepliesAction(TimelineAction):
+    def fetchStatuses(self, twitter, options, **kwargs):
+        return twitter.statuses.replies(count=options["length"], **kwargs)
+
+    def openStream(self, twitter, options):
+        screen_name = twitter.account.verify_credentials().response[
+            'screen_name']
+        return self.streamClient(twitter).statuses.filter(
+            track='@' + screen_name, method='post')
 
 
 class FollowAction(AdminAction):
     def getUser(self, twitter, user):
-        return twitter.friendships.create(id=user)
+        return twitter.friendships.create(id=user).response
 
 
 class LeaveAction(AdminAction):
     def getUser(self, twitter, user):
-        return twitter.friendships.destroy(id=user)
+        return twitter.friendships.destroy(id=user).response
 
 
 class SetStatusAction(Action):
     def __call__(self, twitter, options):
+        stdout_buffer.flush()
         statusTxt = (" ".join(options['extra_args'])
                      if options['extra_args']
                      else str(input("message: ")))
@@ -568,6 +757,8 @@ class PythonPromptAction(Action):
 
 
 class HelpAction(Action):
+    needs_twitter = False
+
     def __call__(self, twitter, options):
         print(__doc__)
 
@@ -595,6 +786,11 @@ actions = {
 def loadConfig(filename):
     options = dict(OPTIONS)
     if os.path.exists(filename):
+        try:
+            from ConfigParser import SafeConfigParser
+        except ImportError:
+            from configparser import ConfigParser as SafeConfigParser
+
         cp = SafeConfigParser()
         cp.read([filename])
         for option in ('format', 'prompt'):
@@ -603,6 +799,33 @@ def loadConfig(filename):
     return options
 
 
+def get_twitter(options):
+    '''
+    Returns the Twitter client for `options`, authorizing the tool first
+    when that's asked for or no OAuth token has been stored yet.
+    '''
+    from .oauth_dance import oauth_dance
+    from .twitter import Twitter
+    from frappy.core.auth import OAuth
+
+    oauth_filename = os.path.expanduser(options['oauth_filename'])
+
+    if (options['action'] == 'authorize'
+        or not os.path.exists(oauth_filename)):
+        oauth_dance(
+            "the Command-Line Tool", CONSUMER_KEY, CONSUMER_SECRET,
+            options['oauth_filename'])
+
+    oauth_token, oauth_token_secret = OAuth.read_token_file(oauth_filename)
+
+    return Twitter(
+        auth=OAuth(
+            oauth_token, oauth_token_secret, CONSUMER_KEY, CONSUMER_SECRET),
+        secure=options['secure'],
+        api_version='1',
+        domain='api.twitter.com')
+
+
 def main(args=sys.argv[1:]):
     arg_options = {}
     try:
@@ -625,36 +848,27 @@ def main(args=sys.argv[1:]):
             if v:
                 options[k] = v
 
-    if options['refresh'] and options['action'] not in (
-        'friends', 'public', 'replies'):
-        print("You can only refresh the friends, public, or replies actions.",
-               file=sys.stderr)
+    if ((options['refresh'] or options['stream']) and options['action']
+            not in ('friends', 'public', 'replies')):
+        print("You can only refresh or stream the friends, public, or "
+              "replies actions.", file=sys.stderr)
         print("Use 'twitter -h' for help.", file=sys.stderr)
         return 1
 
-    oauth_filename = os.path.expanduser(options['oauth_filename'])
-
-    if (options['action'] == 'authorize'
-        or not os.path.exists(oauth_filename)):
-        oauth_dance(
-            "the Command-Line Tool", CONSUMER_KEY, CONSUMER_SECRET,
-            options['oauth_filename'])
-
-    oauth_token, oauth_token_secret = OAuth.read_token_file(oauth_filename)
-
-    twitter = Twitter(
-        auth=OAuth(
-            oauth_token, oauth_token_secret, CONSUMER_KEY, CONSUMER_SECRET),
-        secure=options['secure'],
-        api_version='1',
-        domain='api.twitter.com')
+    twitter = None
+    if actions.get(options['action'], NoSuchAction).needs_twitter:
+        twitter = get_twitter(options)
 
     try:
         Action()(twitter, options)
     except NoSuchActionError as e:
         print(e, file=sys.stderr)
         raise SystemExit(1)
-    except APIHTTPError as e:
+    except Exception as e:
+        # Raised by the actions, which imported the API client
+        from frappy.core.api import APIHTTPError
+        if not isinstance(e, APIHTTPError):
+            raise
         print(str(e), file=sys.stderr)
         print("Use 'twitter -h' for help.", file=sys.stderr)
         raise SystemExit(1)
@@ -3,7 +3,9 @@ twitter-log - Twitter Logger/Archiver
 
 USAGE:
 
-    twitter-log <screen_name> [max_id]
+    twitter-log [options] <screen_name> [max_id]
+    twitter-log [options] <screen_name> <screen_name> ...
+    twitter-log [options] -f <file>
 
 DESCRIPTION:
 
@@ -20,79 +22,253 @@ DESCRIPTION:
 
     Each tweet is separated by two blank lines.
 
+    Several users are archived concurrently.  Their tweets are printed as
+    they arrive, so tweets of different users are interleaved.
+
+OPTIONS:
+
+    -a --archive <directory>  store tweets of every user in a compact binary
+                              archive in directory/<screen_name> instead of
+                              printing them.  The progress of every user is
+                              checkpointed in the archive, so running again
+                              with the same directory resumes exactly where
+                              it left off, then only fetches tweets newer
+                              than the newest one already archived.
+    -f --file <file>          read screen names from file, one per line
+                              ('-' reads them from standard input)
+    -w --workers <number>     number of users archived at once (default 8)
+
 """
 
 from __future__ import print_function
 
+import os
 import sys
-from time import sleep
+from concurrent.futures import ThreadPoolExecutor
+from getopt import gnu_getopt, GetoptError
+from time import sleep, time
 
 from frappy.core.api import APIHTTPError
+from frappy.core.pool import ConnectionPool, NETWORK_ERRORS
+from frappy.core.ratelimit import RateLimiter
+from frappy.services.twitter.archive import TweetArchive
 from frappy.services.twitter.twitter import Twitter
 from frappy.core.auth import NoAuth
-from frappy.core.util import printNicely
+from frappy.core.util import stdout_buffer
+
+# Retrying won't help with these, i.e. protected or unknown users
+FATAL_STATUS_CODES = (401, 403, 404)
+
+# Longest pause between retries when Twitter doesn't tell the reset time
+MAX_RETRY_DELAY = 300
 
 
 def log_debug(msg):
     print(msg, file=sys.stderr)
 
 
-def get_tweets(twitter, screen_name, max_id=None):
+def format_tweet(tweet):
+    """Return tweet in the text archive format"""
+
+    lines = ["%s %s" % (tweet['user']['screen_name'], tweet['id']),
+             "Date: %s" % (tweet['created_at'])]
+    if tweet.get('in_reply_to_status_id'):
+        lines.append("In-Reply-To: %s" % tweet['in_reply_to_status_id'])
+    lines.append("")
+    lines.extend('    ' + line for line in tweet['text'].splitlines())
+    lines.extend(("", "", ""))
+
+    return '\n'.join(lines)
+
+
+def print_tweet(tweet):
+    """
+    Print tweet through the shared stdout buffer, in one piece so tweets of
+    users archived concurrently don't get mixed up
+    """
+
+    stdout_buffer.write(format_tweet(tweet))
+
+
+def get_tweets(twitter, screen_name, max_id=None, since_id=None):
+    """
+    Yield all tweets of screen_name older than max_id (inclusive) and newer
+    than since_id, newest first
+    """
+
     kwargs = dict(count=3200, screen_name=screen_name)
     if max_id:
         kwargs['max_id'] = max_id
+    if since_id:
+        kwargs['since_id'] = since_id
 
-    n_tweets = 0
-    tweets = twitter.statuses.user_timeline(**kwargs)
-
-    for tweet in tweets.response:
+    for tweet in twitter.statuses.user_timeline.paginate(**kwargs):
         if tweet['id'] == max_id:
             continue
-        print("%s %s\nDate: %s" % (tweet['user']['screen_name'],
-                                   tweet['id'],
-                                   tweet['created_at']))
-        if tweet.get('in_reply_to_status_id'):
-            print("In-Reply-To: %s" % tweet['in_reply_to_status_id'])
-        print()
-        for line in tweet['text'].splitlines():
-            printNicely('    ' + line + '\n')
-        print()
-        print()
-        max_id = tweet['id']
-        n_tweets += 1
-    return n_tweets, max_id
+        yield tweet
 
 
-def main(args=sys.argv[1:]):
-    twitter = Twitter(
-        auth=NoAuth(),
-        api_version='1',
-        domain='api.twitter.com')
+def retry_delay(error, attempt):
+    """
+    Return seconds to wait before retrying after error, until the rate limit
+    resets when the response told when that is, otherwise backing off
+    exponentially with the number of attempt
+    """
 
-    if not args:
-        print(__doc__)
-        return 1
+    headers = getattr(error, 'headers', {})
+    for name in ('x-ratelimit-reset', 'x-rate-limit-reset'):
+        try:
+            return max(float(headers[name]) - time(), 0) + 1
+        except (KeyError, ValueError):
+            pass
 
-    screen_name = args[0]
+    return min(3 * 2 ** (attempt - 1), MAX_RETRY_DELAY)
 
-    if args[1:]:
-        max_id = args[1]
-    else:
-        max_id = None
+
+def fetch_all(twitter, screen_name, handle_tweet, max_id=None, since_id=None):
+    """
+    Pass every tweet of screen_name between since_id and max_id to
+    handle_tweet, newest first, retrying where Twitter bailed out until all
+    are done.  Return the number of tweets handled.
+    """
 
     n_tweets = 0
+    attempt = 0
     while True:
         try:
-            tweets_processed, max_id = get_tweets(twitter, screen_name, max_id)
-            n_tweets += tweets_processed
-            log_debug("Processed %i tweets (max_id %s)" % (n_tweets, max_id))
-            if tweets_processed == 0:
-                log_debug("That's it, we got all the tweets. Done.")
-                break
-        except APIHTTPError as e:
-            log_debug("Twitter bailed out. I'm going to sleep a bit then "
-                      + "try again")
-            sleep(3)
+            # Pages are fetched in the background while handling tweets,
+            # and max_id is kept up to date to resume from if Twitter bails
+            # out
+            for tweet in get_tweets(twitter, screen_name, max_id, since_id):
+                handle_tweet(tweet)
+                max_id = tweet['id']
+                attempt = 0
+                n_tweets += 1
+                if n_tweets % 200 == 0:
+                    log_debug("%s: processed %i tweets (max_id %s)" % (
+                                            screen_name, n_tweets, max_id))
+            log_debug("%s: that's it, we got all %i tweets. Done." % (
+                                                    screen_name, n_tweets))
+            return n_tweets
+        except (APIHTTPError,) + NETWORK_ERRORS as e:
+            if getattr(e, 'status_code', None) in FATAL_STATUS_CODES:
+                raise
+
+            attempt += 1
+            delay = retry_delay(e, attempt)
+            log_debug("%s: Twitter bailed out. I'm going to sleep %.0f "
+                      "seconds then try again" % (screen_name, delay))
+            sleep(delay)
+
+
+def archive_tweets(twitter, screen_name, archive, max_id=None):
+    """
+    Store tweets of screen_name in archive, resuming where it left off.
+
+    The walk back in time in progress is checkpointed in the meta data of
+    the archive, which is only written along with the tweets fetched up to
+    that point.
+    """
+
+    checkpoint = archive.meta.get('checkpoint')
+    if checkpoint is None:
+        # Walk back from max_id (or the newest tweet) to the newest tweet
+        # archived by previous runs
+        checkpoint = {'max_id': max_id, 'since_id': None}
+        if max_id is None:
+            checkpoint['since_id'] = archive.max_id
+        archive.meta['checkpoint'] = checkpoint
+
+    def store(tweet):
+        checkpoint['max_id'] = tweet['id']
+        archive.append(tweet)
+
+    fetch_all(twitter, screen_name, store, checkpoint['max_id'],
+              checkpoint['since_id'])
+
+    del archive.meta['checkpoint']
+
+
+def log_user(twitter, screen_name, archive_dir=None, max_id=None):
+    """
+    Archive (or print, when no archive_dir is given) all tweets of
+    screen_name and return whether that succeeded
+    """
+
+    try:
+        if archive_dir is None:
+            fetch_all(twitter, screen_name, print_tweet, max_id)
+        else:
+            with TweetArchive(os.path.join(archive_dir,
+                                           screen_name)) as archive:
+                archive_tweets(twitter, screen_name, archive, max_id)
+    except APIHTTPError as e:
+        log_debug("%s: giving up, %s" % (screen_name, e))
+        return False
+    finally:
+        stdout_buffer.flush()
+
+    return True
+
+
+def read_screen_names(path):
+    """Return screen names listed in file at path, one per line"""
+
+    if path == '-':
+        lines = sys.stdin.readlines()
+    else:
+        with open(path) as names:
+            lines = names.readlines()
+
+    return [line.strip() for line in lines if line.strip()]
+
+
+def main(args=sys.argv[1:]):
+    try:
+        opts, args = gnu_getopt(args, 'a:f:w:',
+                                ['archive=', 'file=', 'workers='])
+    except GetoptError as e:
+        log_debug(str(e))
+        return 1
+
+    options = {}
+    for opt, value in opts:
+        options[opt.lstrip('-')[0]] = value
+
+    screen_names = list(args)
+    max_id = None
+
+    # A single user may be followed by the max_id to start from
+    if len(args) == 2 and args[1].isdigit():
+        screen_names = args[:1]
+        max_id = int(args[1])
+
+    if 'f' in options:
+        screen_names.extend(read_screen_names(options['f']))
+
+    if not screen_names:
+        print(__doc__)
+        return 1
+
+    workers = min(int(options.get('w', 8)), len(screen_names))
+
+    # Workers share connections, and all hold off once the rate limit is
+    # used up
+    twitter = Twitter(
+        auth=NoAuth(),
+        api_version='1',
+        domain='api.twitter.com',
+        pool=ConnectionPool(pool_maxsize=workers * 2),
+        rate_limiter=RateLimiter(policy='block'))
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(
+            lambda screen_name: log_user(twitter, screen_name,
+                                         options.get('a'), max_id),
+            screen_names))
+
+    if not all(results):
+        return 1
 
     return 0
 
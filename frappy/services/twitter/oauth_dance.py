@@ -29,9 +29,9 @@ def oauth_dance(app_name, consumer_key, consumer_secret, token_filename=None):
     print("Hi there! We're gonna get you all set up to use %s." % app_name)
     twitter = Twitter(
         auth=OAuth('', '', consumer_key, consumer_secret),
-        format='', api_version=None)
+        req_format='', api_version=None)
     oauth_token, oauth_token_secret = parse_oauth_tokens(
-        twitter.oauth.request_token())
+        twitter.oauth.request_token().response)
     print("""
 In the web browser window that opens please choose to Allow
 access. Copy the PIN number that appears on the next page and paste or
@@ -60,9 +60,9 @@ your PIN:
     twitter = Twitter(
         auth=OAuth(
             oauth_token, oauth_token_secret, consumer_key, consumer_secret),
-        format='', api_version=None)
+        req_format='', api_version=None)
     oauth_token, oauth_token_secret = parse_oauth_tokens(
-        twitter.oauth.access_token(oauth_verifier=oauth_verifier))
+        twitter.oauth.access_token(oauth_verifier=oauth_verifier).response)
     if token_filename:
         OAuth.write_token_file(
             token_filename, oauth_token, oauth_token_secret)
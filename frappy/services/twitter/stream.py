@@ -2,35 +2,88 @@
 Small wrapper around Twitter streaming API
 """
 
-import urllib2
 import json
+import time
 
 from frappy.core.api import APIHTTPError
+from frappy.core.pool import NETWORK_ERRORS
 from frappy.services.twitter.twitter import Twitter
 
 
 class TwitterJSONIter(object):
-    """Iterable JSON object"""
+    """
+    Iterable of JSON messages read from a stream response
+
+    Messages are framed by newlines.  When the stream is requested with
+    delimited=length every message is preceded by a line holding its length
+    in bytes, in which case that length is used instead of searching for the
+    end of the message.  Blank keep-alive lines are skipped.
+
+    Every message is decoded exactly once, and all complete messages from a
+    single read are yielded before reading again.  `read_size` is the max
+    number of bytes read at once and `max_buffer` is the largest incomplete
+    message that will be buffered before giving up.
+    """
 
-    def __init__(self, req, arg_data):
-        self.decoder = json.JSONDecoder()
+    def __init__(self, req, arg_data, read_size=8192, max_buffer=1048576):
         self.req = req
-        self.buf = b""
         self.arg_data = arg_data
+        self.read_size = read_size
+        self.max_buffer = max_buffer
+
+        # Prefer read1() which returns what is available instead of blocking
+        # until read_size bytes arrived
+        self._read = getattr(req, 'read1', req.read)
 
     def __iter__(self):
+        buf = bytearray()
+
+        # Position in buf newline search continues from and length of next
+        # message if the stream is length delimited
+        search_from = 0
+        length = None
+
         while True:
-            self.buf += self.req.read(1024)
-            try:
-                utf8_buf = self.buf.decode('utf8').lstrip()
-                res, ptr = self.decoder.raw_decode(utf8_buf)
-                self.buf = utf8_buf[ptr:].encode('utf8')
-                yield json.loads(utf8_buf)
-            except ValueError as e:
-                continue
-            except urllib2.HTTPError as err:
-                raise APIHTTPError(self.req.status_code,
-                                   self.req.get_full_url())
+            data = self._read(self.read_size)
+            if not data:
+                return
+
+            buf += data
+            start = 0
+
+            while True:
+                if length is not None:
+                    if len(buf) - start < length:
+                        break
+
+                    message = buf[start:start + length].strip()
+                    start += length
+                    search_from = start
+                    length = None
+                else:
+                    end = buf.find(b'\n', search_from)
+                    if end == -1:
+                        search_from = len(buf)
+                        break
+
+                    message = buf[start:end].strip()
+                    start = search_from = end + 1
+
+                    if not message:
+                        continue
+
+                    if message.isdigit():
+                        length = int(message)
+                        continue
+
+                yield json.loads(message.decode('utf8'))
+
+            del buf[:start]
+            search_from -= start
+
+            if len(buf) > self.max_buffer:
+                raise ValueError("Stream message exceeds %i bytes" % (
+                                                            self.max_buffer))
 
 
 class TwitterStream(Twitter):
@@ -46,26 +99,59 @@ class TwitterStream(Twitter):
     for tweet in iterator:
         ...do something with this tweet...
 
-    The iterator will yield tweets forever and ever (until the stream
-    breaks at which point it raises a TwitterHTTPError.)
+    The iterator will yield tweets forever and ever.  When the connection
+    drops, stalls or Twitter answers with an error the stream is reconnected
+    behind the scenes, backing off as Twitter asks streaming clients to:
+
+        network errors and stalls: linearly by 250ms, up to 16 seconds
+        HTTP errors: exponentially starting at 5 seconds, up to 320 seconds
+        HTTP 420 (rate limited): exponentially starting at 1 minute
+
+    The stream is considered stalled when nothing, not even a keep-alive
+    newline, was received for `stall_timeout` seconds.  An APIHTTPError is
+    only raised for errors that reconnecting can't fix (i.e. bad credentials)
+    or after `max_reconnects` reconnects in a row failed.
+
+    `read_size` is the max number of bytes read from the stream at once.
+    Any other keyword arguments are passed on to Twitter (and APICall),
+    i.e. `rate_limiter` or `compress_requests`.
+
+    User streams live at another domain and API version:
+
+    user_stream = TwitterStream(domain='userstream.twitter.com',
+                                api_version='2', auth=auth)
     """
-    def __init__(self, domain="stream.twitter.com", secure=True, auth=None):
+
+    # (first delay, max delay, exponential) for each class of error
+    backoff = {
+        'network': (0.25, 16, False),
+        'http': (5, 320, True),
+        'rate_limit': (60, 960, True),
+    }
+
+    # Errors reconnecting won't fix
+    fatal_status_codes = (401, 403, 404, 406, 413, 416)
+
+    def __init__(self, domain="stream.twitter.com", secure=True, auth=None,
+                 pool=None, read_size=8192, stall_timeout=90,
+                 connect_timeout=10, max_reconnects=None, api_version='1',
+                 **kwargs):
         Twitter.__init__(self, auth=auth, req_format="json", domain=domain,
-                         secure=secure, api_version='1')
+                         secure=secure, api_version=api_version, pool=pool,
+                         **kwargs)
+
+        self.read_size = read_size
+        self.stall_timeout = stall_timeout
+        self.connect_timeout = connect_timeout
+        self.max_reconnects = max_reconnects
 
-    def __call__(self, *args, **kwargs):
+    def _request(self, *args, **kwargs):
         """
         Finish building uri with leftover arguments, append authentication, and
-        send off request
+        return iterator over the stream
         """
 
-        kwargs = self._build_uri(**kwargs)
-
-        # Wrapper for child classes to customize creation of the uri
-        kwargs = self.service_build_uri(*args, **kwargs)
-
-        # Append any authentication specified to request
-        arg_data = self._handle_auth(**kwargs)
+        kwargs = self._prepare_call(*args, **kwargs)
 
         # Normally self.uri would be cleared between each __call__ to allow for
         # new requests and previous request location would be in requested_uri,
@@ -74,17 +160,80 @@ class TwitterStream(Twitter):
         # consistent with other supported services
         self.requested_uri = self.uri
 
-        resp = self._send_request(arg_data)
+        return self._iter_stream(kwargs)
+
+    def _iter_stream(self, kwargs):
+        """Yield messages from the stream, reconnecting whenever it breaks"""
+
+        attempts = {}
+
+        while True:
+            status_code = 0
+
+            try:
+                resp = self._send_request(self._request_args(**kwargs))
+            except NETWORK_ERRORS:
+                error = 'network'
+            else:
+                status_code = resp.status_code
+
+                if status_code == 200:
+                    attempts.clear()
+                    try:
+                        for message in self._handle_response(resp, kwargs):
+                            yield message
+                    except NETWORK_ERRORS:
+                        # Dropped or stalled (read timed out) connection
+                        pass
+                    finally:
+                        resp.close()
+
+                    # Server may also just close the stream on us
+                    error = 'network'
+                else:
+                    resp.close()
 
-        return self._handle_response(resp, arg_data)
+                    if status_code in self.fatal_status_codes:
+                        raise APIHTTPError(status_code, self.requested_uri,
+                                           resp.headers)
 
-    def _send_request(self, arg_data):
-        """Send request to self.uri"""
-        try:
-            req = urllib2.Request(self.uri, arg_data, self.headers['request'])
-            return urllib2.urlopen(req)
-        except (urllib2.HTTPError, urllib2.URLError), err:
-            raise APIHTTPError(req.status_code, req.get_full_url())
+                    error = 'http'
+                    if status_code == 420:
+                        error = 'rate_limit'
+
+            attempts[error] = attempts.get(error, 0) + 1
+
+            if (self.max_reconnects is not None and
+                    sum(attempts.values()) > self.max_reconnects):
+                raise APIHTTPError(status_code, self.requested_uri)
+
+            time.sleep(self._backoff_delay(error, attempts[error]))
+
+            # Reconnect with fresh authentication
+            self._handle_auth(**kwargs)
+
+    def _backoff_delay(self, error, attempt):
+        """Seconds to wait before reconnect `attempt` after `error`"""
+
+        first, maximum, exponential = self.backoff[error]
+
+        if exponential:
+            return min(first * 2 ** (attempt - 1), maximum)
+
+        return min(first * attempt, maximum)
+
+    def _send_request(self, request_args):
+        """Open stream to self.uri with request_args"""
+
+        return self.pool.request(self.method, self.uri, stream=True,
+                                 timeout=(self.connect_timeout,
+                                          self.stall_timeout),
+                                 **request_args)
 
     def _handle_response(self, resp, arg_data):
-        return iter(TwitterJSONIter(resp, arg_data))
+        """Return iterator of messages read from stream response"""
+
+        # Let the raw response take care of any gzip encoding
+        resp.raw.decode_content = True
+
+        return iter(TwitterJSONIter(resp.raw, arg_data, self.read_size))
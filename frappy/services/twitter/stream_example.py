@@ -12,7 +12,7 @@ from __future__ import print_function
 
 import sys
 
-from stream import TwitterStream
+from frappy.services.twitter.stream import TwitterStream
 from frappy.core.auth import UserPassAuth
 from frappy.core.util import printNicely
 
@@ -0,0 +1,84 @@
+"""
+Fast parsing of the fixed timestamp formats used by Twitter.
+"""
+
+import time
+
+_MONTHS = dict((name, number) for number, name in
+               enumerate(('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul',
+                          'Aug', 'Sep', 'Oct', 'Nov', 'Dec'), 1))
+
+_DAYS_BEFORE_MONTH = (None, 0, 31, 59, 90, 120, 151, 181, 212, 243, 273, 304,
+                      334)
+
+# Formats the fast path understands, for reference and as fallback
+CREATED_AT_FORMAT = "%a %b %d %H:%M:%S +0000 %Y"
+SEARCH_CREATED_AT_FORMAT = "%a, %d %b %Y %H:%M:%S +0000"
+
+
+def _timegm(year, month, day, hour, minute, second):
+    """
+    calendar.timegm, without importing calendar (and datetime with it)
+
+    >>> _timegm(2012, 2, 29, 23, 59, 59), _timegm(1969, 12, 31, 0, 0, 0)
+    (1330559999, -86400)
+    """
+
+    leap_days = year // 4 - year // 100 + year // 400
+    if month <= 2 and (year % 4 == 0 and
+                       (year % 100 != 0 or year % 400 == 0)):
+        leap_days -= 1
+    # 477 leap days up to 1970
+    days = ((year - 1970) * 365 + leap_days - 477 +
+            _DAYS_BEFORE_MONTH[month] + day - 1)
+    return ((days * 24 + hour) * 60 + minute) * 60 + second
+
+
+def parse_created_at(created_at):
+    """
+    Return UTC epoch seconds of a Twitter timestamp, in the format of the
+    REST or the search API.  Raises ValueError for anything else.
+
+    >>> parse_created_at('Wed Aug 27 13:08:45 +0000 2008')
+    1219842525
+    >>> parse_created_at('Wed, 27 Aug 2008 13:08:45 +0000')
+    1219842525
+    """
+
+    try:
+        if created_at[3] == ',':
+            _, day, month, year, clock, offset = created_at.split()
+        else:
+            _, month, day, clock, offset, year = created_at.split()
+
+        hour, minute, second = clock.split(':')
+
+        seconds = _timegm(int(year), _MONTHS[month], int(day),
+                          int(hour), int(minute), int(second))
+
+        offset_seconds = int(offset[1:3]) * 3600 + int(offset[3:5]) * 60
+        if offset[0] == '-':
+            offset_seconds = -offset_seconds
+        elif offset[0] != '+':
+            raise ValueError
+    except (ValueError, KeyError, IndexError):
+        raise ValueError("Unknown timestamp format: %r" % (created_at))
+
+    return seconds - offset_seconds
+
+
+def parse_with_format(created_at, format):
+    """
+    Return UTC epoch seconds of created_at, given in UTC in format, taking
+    the fast path for the formats Twitter uses
+    """
+
+    try:
+        return parse_created_at(created_at)
+    except ValueError:
+        import calendar
+        return calendar.timegm(time.strptime(created_at, format))
+
+
+__all__ = ["parse_created_at", "parse_with_format", "CREATED_AT_FORMAT",
+           "SEARCH_CREATED_AT_FORMAT"]
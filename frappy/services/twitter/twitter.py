@@ -77,6 +77,23 @@ class Twitter(APICall):
       x[0]['user']['screen_name']
 
 
+    Iterating over a whole timeline
+    -------------------------------
+
+    Every call has a paginate() variant which walks back through all pages
+    using max_id and yields the tweets one by one::
+
+      for tweet in twitter.statuses.user_timeline.paginate(
+              screen_name="billybob", count=200):
+          print(tweet['text'])
+
+    For the endpoints paging with cursors, ask for the 'cursor' scheme::
+
+      for user in twitter.statuses.followers.paginate(cursor=-1,
+                                                      pagination='cursor'):
+          ...
+
+
     Getting raw XML data
     --------------------
 
@@ -89,8 +106,11 @@ class Twitter(APICall):
       of XML.
 
     """
+
+    pagination = 'max_id'
+
     def __init__(self, req_format="json", domain="api.twitter.com",
-                secure=True, auth=None, api_version='1'):
+                secure=True, auth=None, api_version='1', **kwargs):
         """
         Create a new twitter API connector.
 
@@ -110,6 +130,21 @@ class Twitter(APICall):
         HTTPS.
 
         `api_version` is used to set the base uri. By default it's '1'.
+
+        Any other keyword arguments are passed on to APICall:
+
+        `pool` is the ConnectionPool to send requests through. Pass the same
+        pool to several connectors to have them share connections.
+
+        `cache` is an optional ResponseCache used to avoid downloading
+        unchanged responses again, `rate_limiter` an optional
+        RateLimiter pacing requests to stay within the rate limit,
+        `metrics` an optional RequestMetrics recording timings of calls
+        and `single_flight` an optional SingleFlight sharing one request
+        between identical calls made at the same time.
+
+        `compress_requests` is the encoding to compress request bodies
+        with (i.e. 'gzip'), for APIs accepting compressed requests.
         """
         if (req_format not in ("json", "xml", "")):
             raise ValueError("Unknown data format '%s'" % (req_format))
@@ -120,10 +155,11 @@ class Twitter(APICall):
             else:
                 api_version = None
 
-        domain += "/%s" % (api_version)
+        if api_version:
+            domain += "/%s" % (api_version)
 
         APICall.__init__(self, auth=auth, req_format=req_format, domain=domain,
-                        secure=secure)
+                        secure=secure, **kwargs)
 
     def service_build_uri(self, *args, **kwargs):
         """
@@ -0,0 +1,20 @@
+"""
+Asynchronous flavour of the Twitter API, in a module of its own so using
+Twitter (from frappy.services.twitter.twitter) doesn't import asyncio.
+"""
+
+from frappy.core.async_api import AsyncAPICall
+from frappy.services.twitter.twitter import Twitter
+
+
+class AsyncTwitter(AsyncAPICall, Twitter):
+    """
+    Asynchronous flavour of Twitter, all calls have to be awaited
+
+    t = AsyncTwitter()
+    statuses = await t.statuses.public_timeline()
+    """
+    pass
+
+
+__all__ = ["AsyncTwitter"]
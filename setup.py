@@ -1,6 +1,9 @@
 #!/usr/bin/env python
 
-from distutils.core import setup
+try:
+    from setuptools import setup
+except ImportError:
+    from distutils.core import setup
 
 setup(name='Frappy',
       version='0.1',
@@ -9,5 +12,6 @@ setup(name='Frappy',
       author_email='durdenmisc@gmail.com',
       url='http://github.com/durden/frappy',
       packages=['frappy', 'frappy.services', 'frappy.core',
-                'frappy.services.twitter']
+                'frappy.services.twitter'],
+      python_requires='>=3.7'
     )
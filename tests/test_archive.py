@@ -0,0 +1,160 @@
+"""
+Tests for frappy.services.twitter.archive.
+"""
+
+import json
+import os
+import random
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from frappy.services.twitter.archive import (MAX_RUNS, META, STRINGS,
+                                             TweetArchive)
+
+
+def make_tweet(tweet_id, screen_name='durden'):
+    return {'id': tweet_id, 'user': {'screen_name': screen_name},
+            'text': u'Tweet number %i ☃' % (tweet_id),
+            'created_at': 'Sat Jul 02 10:00:00 +0000 2011'}
+
+
+class TweetArchiveTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_append_and_read(self):
+        with TweetArchive(self.directory, buffer_size=2) as archive:
+            for tweet_id in (30, 20, 10):
+                archive.append(make_tweet(tweet_id))
+            archive.append(dict(make_tweet(5, 'luke'),
+                                in_reply_to_status_id=10))
+
+            self.assertEqual(len(archive), 4)
+            self.assertEqual((archive.min_id, archive.max_id), (5, 30))
+            self.assertEqual(archive[3], {
+                'id': 5, 'created_at': 1309600800,
+                'in_reply_to_status_id': 10, 'screen_name': 'luke',
+                'text': u'Tweet number 5 ☃'})
+
+        archive = TweetArchive(self.directory)
+        self.assertEqual([tweet['id'] for tweet in archive], [30, 20, 10, 5])
+        self.assertEqual(archive[0]['in_reply_to_status_id'], None)
+        self.assertEqual(archive[-1]['screen_name'], 'luke')
+        self.assertRaises(IndexError, archive.__getitem__, 4)
+        self.assertEqual(archive.column('id').tolist(), [30, 20, 10, 5])
+        archive.close()
+
+    def test_empty(self):
+        archive = TweetArchive(self.directory)
+
+        self.assertEqual(len(archive), 0)
+        self.assertEqual(list(archive), [])
+        self.assertEqual(archive.column('id').tolist(), [])
+        self.assertEqual(archive.column('strings').tolist(), [])
+        self.assertIsNone(archive.get(1))
+        self.assertRaises(IndexError, archive.__getitem__, 0)
+
+        archive.close()
+
+    def test_get_across_runs(self):
+        # History walked back newest first, then newer tweets on later runs
+        sessions = [range(100, 50, -1), range(130, 100, -1), [131, 131],
+                    range(140, 150)]
+        for tweet_ids in sessions:
+            with TweetArchive(self.directory, buffer_size=7) as archive:
+                for tweet_id in tweet_ids:
+                    archive.append(make_tweet(tweet_id))
+
+        archive = TweetArchive(self.directory)
+        self.assertEqual(archive.meta['runs'], [[0, 50, -1], [50, 80, -1],
+                                                [80, 92, 1]])
+
+        for tweet_id in range(45, 155):
+            tweet = archive.get(tweet_id)
+            if 51 <= tweet_id <= 131 or 140 <= tweet_id < 150:
+                self.assertEqual(tweet['id'], tweet_id)
+            else:
+                self.assertIsNone(tweet)
+        self.assertEqual(archive.get(131, 'missing')['id'], 131)
+        self.assertEqual(archive.get(1, 'missing'), 'missing')
+        archive.close()
+
+    def test_get_unordered(self):
+        tweet_ids = random.Random(0).sample(range(1000), MAX_RUNS * 4)
+        with TweetArchive(self.directory) as archive:
+            for tweet_id in tweet_ids:
+                archive.append(make_tweet(tweet_id))
+            self.assertIsNone(archive.meta['runs'])
+
+            for tweet_id in tweet_ids:
+                self.assertEqual(archive.get(tweet_id)['id'], tweet_id)
+            self.assertIsNone(archive.get(1001))
+
+    def test_get_without_runs(self):
+        with TweetArchive(self.directory) as archive:
+            for tweet_id in (3, 1, 2):
+                archive.append(make_tweet(tweet_id))
+
+        # Written before runs were kept track of
+        meta_path = os.path.join(self.directory, META)
+        with open(meta_path) as meta_file:
+            meta = json.load(meta_file)
+        del meta['runs']
+        with open(meta_path, 'w') as meta_file:
+            json.dump(meta, meta_file)
+
+        archive = TweetArchive(self.directory)
+        self.assertEqual([archive.get(i)['id'] for i in (1, 2, 3)],
+                         [1, 2, 3])
+        archive.close()
+
+    def test_crash_before_meta_written(self):
+        with TweetArchive(self.directory) as archive:
+            archive.append(make_tweet(1))
+            archive.append(make_tweet(2))
+        strings_size = os.path.getsize(os.path.join(self.directory, STRINGS))
+
+        # Die after the columns of the next flush are written
+        archive = TweetArchive(self.directory)
+        archive.append(make_tweet(3, 'luke'))
+        with mock.patch('json.dump', side_effect=OSError):
+            self.assertRaises(OSError, archive.flush)
+
+        archive = TweetArchive(self.directory)
+        self.assertEqual(len(archive), 2)
+        self.assertEqual(archive.max_id, 2)
+        self.assertEqual(
+                os.path.getsize(os.path.join(self.directory, STRINGS)),
+                strings_size)
+
+        archive.append(make_tweet(3, 'luke'))
+        archive.close()
+
+        archive = TweetArchive(self.directory)
+        self.assertEqual([tweet['id'] for tweet in archive], [1, 2, 3])
+        self.assertEqual(archive.get(3)['screen_name'], 'luke')
+        self.assertEqual(archive[-1]['text'], u'Tweet number 3 ☃')
+
+    def test_column_released_on_flush(self):
+        archive = TweetArchive(self.directory)
+        archive.append(make_tweet(1))
+
+        ids = archive.column('id')
+        self.assertEqual(ids.tolist(), [1])
+
+        archive.append(make_tweet(2))
+        archive.flush()
+        self.assertRaises(ValueError, len, ids)
+        self.assertEqual(archive.column('id').tolist(), [1, 2])
+
+        archive.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
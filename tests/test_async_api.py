@@ -0,0 +1,102 @@
+"""
+Tests for frappy.core.async_api, against a local server.
+"""
+
+import asyncio
+import json
+import unittest
+from unittest import mock
+
+from frappy.core.async_api import AsyncConnectionPool
+from frappy.core.auth import OAuth
+from frappy.core.metrics import RequestMetrics
+from frappy.services.github import Github
+from frappy.services.github_async import AsyncGithub
+
+from benchmarks.server import start_server
+
+
+class AsyncRequestTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server, cls.domain = start_server()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+
+    def async_call(self, make_call, **kwargs):
+        async def call():
+            service = AsyncGithub(domain=self.domain, secure=False, **kwargs)
+            try:
+                return await make_call(service)
+            finally:
+                await service.close()
+
+        return asyncio.run(call())
+
+    def requested_path(self, resp):
+        return json.loads(resp.content.decode('utf8'))['path']
+
+    def test_query_string_sent_as_signed(self):
+        # Reserved characters must be encoded once, like the sync client does
+        sync = Github(domain=self.domain, secure=False).foo(q='a b+c')
+        resp = self.async_call(lambda g: g.foo(q='a b+c'))
+
+        self.assertEqual(self.requested_path(sync), '/foo?q=a%20b%2Bc')
+        self.assertEqual(self.requested_path(resp), '/foo?q=a%20b%2Bc')
+
+    def test_oauth_query_string(self):
+        auth = OAuth('token', 'token secret', 'consumer key',
+                     'consumer secret')
+        resp = self.async_call(lambda g: g.search(q='frappy & co', page=2),
+                               auth=auth)
+
+        self.assertEqual(self.requested_path(resp),
+                         '/search?q=frappy%20%26%20co&page=2')
+        self.assertEqual(resp.requested_uri,
+                         'http://%s/search?q=frappy%%20%%26%%20co&page=2' % (
+                                                            self.domain))
+
+    def test_metrics(self):
+        samples = []
+        metrics = RequestMetrics(callback=samples.append)
+        resp = self.async_call(lambda g: g.users(1), metrics=metrics)
+
+        self.assertEqual(resp.response['path'], '/users/1')
+        self.assertEqual(len(samples), 1)
+        self.assertEqual((samples[0].method, samples[0].endpoint,
+                          samples[0].status, samples[0].bytes_in),
+                         ('get', 'users/:arg', 200, len(resp.content)))
+        self.assertEqual(sorted(samples[0].phases),
+                         ['handle_response', 'prepare', 'send'])
+        self.assertEqual(
+                metrics.as_dict()['GET users/:arg']['phases']['decode'][
+                                                                'count'], 1)
+
+
+class AsyncConnectionPoolTest(unittest.TestCase):
+
+    def test_close_leaves_given_pool_open(self):
+        pool = mock.Mock()
+        asyncio.run(AsyncConnectionPool(pool=pool).close())
+        self.assertFalse(pool.close.called)
+
+        with mock.patch('frappy.core.pool.ConnectionPool') as ConnectionPool:
+            asyncio.run(AsyncConnectionPool().close())
+        ConnectionPool.return_value.close.assert_called_once_with()
+
+    def test_service_close(self):
+        pool = mock.Mock()
+        asyncio.run(AsyncGithub(pool=pool).close())
+        self.assertFalse(pool.close.called)
+
+        github = AsyncGithub()
+        with mock.patch.object(github.pool, 'close') as close:
+            asyncio.run(github.close())
+        close.assert_called_once_with()
+
+
+if __name__ == "__main__":
+    unittest.main()
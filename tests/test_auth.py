@@ -0,0 +1,107 @@
+"""
+Tests for frappy.core.auth.
+"""
+
+import unittest
+from unittest import mock
+
+from frappy.core.auth import OAuth
+from frappy.core.util import percent_encode, urlencode_noplus
+
+# Credentials and request of the example in Twitter's documentation of
+# creating a signature, and the signature it arrives at
+CONSUMER_KEY = 'xvz1evFS4wEEPTGEFPHBog'
+CONSUMER_SECRET = 'kAcSOqF21Fu85e7zjz7ZN2U4ZRhfV3WpwPAoE3Z7kBw'
+TOKEN = '370773112-GmHxMAgYyLbNEtIKZeRNFsMKPR9EyMZeS9weJAEb'
+TOKEN_SECRET = 'LswwdoUaIvS8ltyTt5jkRh4J50vUPVVHtR2YPi5kE'
+NONCE = 'kYjzVBB8Y0ZFabxSWbWovY3uYSQ2pTgmZeNu2VS4cg'
+TIMESTAMP = 1318622958
+
+URI = 'https://api.twitter.com/1/statuses/update.json'
+PARAMS = {'include_entities': 'true',
+          'status': 'Hello Ladies + Gentlemen, a signed OAuth request!'}
+SIGNATURE = 'tnnArxj06cWHq44gCs1OSKk/jLY='
+
+
+class ExampleOAuth(OAuth):
+    """OAuth using the nonce of the example"""
+
+    def _oauth_params(self):
+        params = OAuth._oauth_params(self)
+        params['oauth_nonce'] = NONCE
+        return params
+
+
+class OAuthTest(unittest.TestCase):
+
+    def setUp(self):
+        self.auth = ExampleOAuth(TOKEN, TOKEN_SECRET, CONSUMER_KEY,
+                                 CONSUMER_SECRET)
+
+        patcher = mock.patch('frappy.core.auth.time', return_value=TIMESTAMP)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_example_header(self):
+        headers = self.auth.generate_headers(URI, 'post', PARAMS)
+
+        self.assertEqual(headers, {'Authorization': (
+            'OAuth oauth_consumer_key="xvz1evFS4wEEPTGEFPHBog", '
+            'oauth_nonce="kYjzVBB8Y0ZFabxSWbWovY3uYSQ2pTgmZeNu2VS4cg", '
+            'oauth_signature="tnnArxj06cWHq44gCs1OSKk%2FjLY%3D", '
+            'oauth_signature_method="HMAC-SHA1", '
+            'oauth_timestamp="1318622958", '
+            'oauth_token="370773112-GmHxMAgYyLbNEtIKZeRNFsMKPR9EyMZeS9weJAEb"'
+            ', oauth_version="1.0"')})
+
+    def test_example_query_string(self):
+        query = self.auth.encode_params(URI, 'POST', PARAMS)
+
+        self.assertEqual(query, (
+            'include_entities=true'
+            '&oauth_consumer_key=xvz1evFS4wEEPTGEFPHBog'
+            '&oauth_nonce=kYjzVBB8Y0ZFabxSWbWovY3uYSQ2pTgmZeNu2VS4cg'
+            '&oauth_signature_method=HMAC-SHA1'
+            '&oauth_timestamp=1318622958'
+            '&oauth_token=370773112-GmHxMAgYyLbNEtIKZeRNFsMKPR9EyMZeS9weJAEb'
+            '&oauth_version=1.0'
+            '&status=Hello%20Ladies%20%2B%20Gentlemen%2C%20a%20signed%20OAuth'
+            '%20request%21'
+            '&oauth_signature=tnnArxj06cWHq44gCs1OSKk%2FjLY%3D'))
+
+    def test_secrets_changed(self):
+        self.auth.generate_headers(URI, 'POST', PARAMS)
+
+        self.auth.token_secret = 'other secret'
+        headers = self.auth.generate_headers(URI, 'POST', PARAMS)
+        self.assertNotIn(percent_encode(SIGNATURE), headers['Authorization'])
+
+        self.auth.token_secret = TOKEN_SECRET
+        headers = self.auth.generate_headers(URI, 'POST', PARAMS)
+        self.assertIn(percent_encode(SIGNATURE), headers['Authorization'])
+
+
+class PercentEncodeTest(unittest.TestCase):
+
+    def test_reserved(self):
+        self.assertEqual(percent_encode(":/?#[]@!$&'()*+,;= %"),
+                         '%3A%2F%3F%23%5B%5D%40%21%24%26%27%28%29%2A%2B%2C'
+                         '%3B%3D%20%25')
+
+    def test_unreserved(self):
+        unreserved = ('ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz'
+                      '0123456789-._~')
+        self.assertEqual(percent_encode(unreserved), unreserved)
+
+    def test_text_and_bytes(self):
+        self.assertEqual(percent_encode(u'☃ \xe9'), '%E2%98%83%20%C3%A9')
+        self.assertEqual(percent_encode(b'\xff/'), '%FF%2F')
+        self.assertEqual(percent_encode(1318622958), '1318622958')
+
+    def test_query(self):
+        self.assertEqual(urlencode_noplus([('a b', 'c+d'), ('e', '~&=')]),
+                         'a%20b=c%2Bd&e=~%26%3D')
+
+
+if __name__ == "__main__":
+    unittest.main()
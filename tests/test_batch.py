@@ -0,0 +1,54 @@
+"""
+Tests for frappy.core.batch, replaying a cassette.
+"""
+
+import unittest
+
+from frappy.core.api import APIHTTPError
+from frappy.core.batch import BatchExecutor
+from frappy.core.transport import Cassette, CassetteMiss, ReplayPool
+from frappy.services.github import Github
+
+
+class BatchTest(unittest.TestCase):
+
+    def setUp(self):
+        cassette = Cassette()
+        cassette.add('get', 'https://api.github.com/users/1', None, 200,
+                     {'Content-Type': 'application/json'}, b'{"id": 1}')
+        cassette.add('get', 'https://api.github.com/users/404', None, 404,
+                     {}, b'')
+        cassette.add('get', 'https://api.github.com/users/304', None, 304,
+                     {}, b'')
+
+        self.batch = BatchExecutor(Github(pool=ReplayPool(cassette)),
+                                   workers=4)
+
+    def test_errors_stay_with_their_call(self):
+        results = self.batch.run([('users/1',),
+                                  ('users/404',),
+                                  ('users/2',),
+                                  ('users/1', {}, 'fetch'),
+                                  (['users', 1],)])
+
+        self.assertEqual([result.index for result in results],
+                         [0, 1, 2, 3, 4])
+        self.assertEqual([result.ok for result in results],
+                         [True, False, False, False, True])
+
+        self.assertEqual(results[0].response.response, {'id': 1})
+        self.assertIsInstance(results[1].error, APIHTTPError)
+        self.assertIsInstance(results[2].error, CassetteMiss)
+        self.assertIsInstance(results[3].error, AttributeError)
+        self.assertEqual(results[4].response.response, {'id': 1})
+
+    def test_not_modified(self):
+        # Without a cache 304 responses come back as an empty list
+        result, = self.batch.run([('users/304',)])
+
+        self.assertTrue(result.ok)
+        self.assertEqual(result.response, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,149 @@
+"""
+Tests for frappy.core.cache, replaying a cassette and against a local server
+validating ETags.
+"""
+
+import asyncio
+import json
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+
+from frappy.core.cache import CacheEntry, DiskCache, MemoryCache
+from frappy.core.transport import Cassette, ReplayPool
+from frappy.services.github import Github
+from frappy.services.github_async import AsyncGithub
+
+from benchmarks.server import StandInHandler, start_server
+
+
+class ETagHandler(StandInHandler):
+    """Answer like StandInHandler with an ETag, or 304 when it matches"""
+
+    etag = '"frappy"'
+    count = 0
+
+    def _respond(self):
+        ETagHandler.count += 1
+
+        if self.headers.get('If-None-Match') != self.etag:
+            return StandInHandler._respond(self)
+
+        self.send_response(304)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def end_headers(self):
+        self.send_header('ETag', self.etag)
+        StandInHandler.end_headers(self)
+
+    do_GET = do_HEAD = _respond
+
+
+class CacheTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server, cls.domain = start_server(ETagHandler)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def assertServedFromCache(self, cache, first, second):
+        self.assertEqual(cache.stats(), {'hits': 1, 'misses': 1,
+                                         'bytes_saved': len(first.content)})
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(json.loads(second.content.decode('utf8'))['path'],
+                         '/users/durden')
+
+    def test_not_modified_replayed(self):
+        cassette = Cassette()
+        uri = 'https://api.github.com/users/durden'
+        cassette.add('get', uri, None, 200,
+                     {'Content-Type': 'application/json', 'ETag': '"v1"',
+                      'x-ratelimit-remaining': '4999'}, b'{"id": 1}')
+        cassette.add('get', uri, None, 304,
+                     {'ETag': '"v1"', 'x-ratelimit-remaining': '4998'}, b'')
+
+        cache = MemoryCache()
+        g = Github(pool=ReplayPool(cassette), cache=cache)
+
+        first = g.users.durden()
+        second = g.users.durden()
+
+        self.assertEqual(second.response, {'id': 1})
+        self.assertEqual(second.rate_limit_remaining, 4998)
+        self.assertEqual(cache.stats(), {'hits': 1, 'misses': 1,
+                                         'bytes_saved': len(first.content)})
+
+    def test_not_modified(self):
+        for cache in (MemoryCache(), DiskCache(self.directory)):
+            g = Github(domain=self.domain, secure=False, cache=cache)
+
+            first = g.users.durden()
+            second = g.users.durden()
+
+            self.assertServedFromCache(cache, first, second)
+
+    def test_not_modified_async(self):
+        async def call_twice(cache):
+            g = AsyncGithub(domain=self.domain, secure=False, cache=cache)
+            try:
+                return (await g.users.durden(), await g.users.durden())
+            finally:
+                await g.close()
+
+        for cache in (MemoryCache(), DiskCache(self.directory)):
+            ETagHandler.count = 0
+            first, second = asyncio.run(call_twice(cache))
+
+            self.assertEqual(ETagHandler.count, 2)
+            self.assertServedFromCache(cache, first, second)
+
+    def test_disk_entry_round_trip(self):
+        cache = DiskCache(self.directory)
+        cache.set('key', CacheEntry(b'\x00body\n\xff', '"etag"',
+                                    'Sat, 02 Jul 2011 10:00:00 GMT', 42.0))
+
+        entry = cache.get('key')
+
+        self.assertEqual(entry.content, b'\x00body\n\xff')
+        self.assertEqual(entry.etag, '"etag"')
+        self.assertEqual(entry.last_modified, 'Sat, 02 Jul 2011 10:00:00 GMT')
+        self.assertEqual(entry.stored_at, 42.0)
+
+    def test_disk_never_unpickles(self):
+        cache = DiskCache(self.directory)
+        with open(os.path.join(self.directory, 'key'), 'wb') as entry_file:
+            pickle.dump(CacheEntry(b'body', '"etag"'), entry_file)
+
+        self.assertIsNone(cache.get('key'))
+
+    def test_disk_clear(self):
+        cache = DiskCache(self.directory)
+        key = cache.make_key('get', 'https://api.github.com/users/1', '')
+        cache.set(key, CacheEntry(b'body', '"etag"'))
+
+        # Whatever else lives in the directory isn't the cache's to remove
+        for name in ('notes.txt', key[:39], key + '.bak'):
+            with open(os.path.join(self.directory, name), 'w'):
+                pass
+
+        cache.clear()
+
+        self.assertIsNone(cache.get(key))
+        self.assertEqual(sorted(os.listdir(self.directory)),
+                         sorted([key[:39], key + '.bak', 'notes.txt']))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,164 @@
+"""
+Tests for frappy.core.metrics, replaying a cassette.
+"""
+
+import json
+import unittest
+
+from frappy.core.api import APIHTTPError
+from frappy.core.metrics import RequestMetrics, RequestSample
+from frappy.core.transport import Cassette, ReplayPool
+from frappy.services.github import Github
+
+
+class PagedGithub(Github):
+
+    def _prepare_call(self, *args, **kwargs):
+        kwargs.setdefault('per_page', 100)
+        return Github._prepare_call(self, *args, **kwargs)
+
+
+class RequestMetricsTest(unittest.TestCase):
+
+    def setUp(self):
+        cassette = Cassette()
+        cassette.add('get', 'https://api.github.com/users/1', None, 200,
+                     {'Content-Type': 'application/json'}, b'{"id": 1}')
+        cassette.add('get', 'https://api.github.com/users/2', None, 404,
+                     {}, b'Not Found')
+        cassette.add('post', 'https://api.github.com/gists',
+                     b'{"description": "x"}', 201,
+                     {'Content-Type': 'application/json'}, b'{"id": 7}')
+        cassette.add('get', 'https://api.github.com/users/1?per_page=100',
+                     None, 200, {'Content-Type': 'application/json'},
+                     b'[]')
+        self.pool = ReplayPool(cassette)
+
+        self.samples = []
+        self.metrics = RequestMetrics(callback=self.samples.append)
+
+    def test_samples(self):
+        g = Github(pool=self.pool, metrics=self.metrics)
+
+        user = g.users(1)
+        self.assertRaises(APIHTTPError, g.users, 2)
+        g.gists(method='post', description='x')
+        self.assertEqual(user.response, {'id': 1})
+
+        self.assertEqual(
+                [(sample.method, sample.endpoint, sample.status,
+                  sample.bytes_out, sample.bytes_in)
+                 for sample in self.samples],
+                [('get', 'users/:arg', 200, 0, 9),
+                 ('get', 'users/:arg', 404, 0, 9),
+                 ('post', 'gists', 201, 20, 9)])
+
+        for sample in self.samples:
+            self.assertEqual(sorted(sample.phases),
+                             ['handle_response', 'prepare', 'send'])
+            self.assertGreater(sample.duration, 0)
+
+        stats = self.metrics.as_dict()
+        self.assertEqual(sorted(stats), ['GET users/:arg', 'POST gists'])
+        self.assertEqual(stats['GET users/:arg']['statuses'],
+                         {'200': 1, '404': 1})
+        self.assertEqual(stats['GET users/:arg']['bytes_in'], 18)
+        self.assertEqual(stats['POST gists']['bytes_out'], 20)
+
+        # Only the decoded response counts in decode
+        phases = stats['GET users/:arg']['phases']
+        self.assertEqual(dict((phase, phases[phase]['count'])
+                              for phase in phases),
+                         {'prepare': 2, 'send': 2, 'handle_response': 2,
+                          'decode': 1})
+
+        self.assertEqual(json.loads(self.metrics.to_json()), stats)
+
+    def test_prepare_call_overridden(self):
+        g = PagedGithub(pool=self.pool, metrics=self.metrics)
+
+        self.assertEqual(g.users(1).response, [])
+        self.assertEqual(self.samples[0].status, 200)
+        self.assertIn('prepare', self.samples[0].phases)
+
+    def test_failed_call(self):
+        g = Github(pool=self.pool, metrics=self.metrics)
+
+        self.assertRaises(LookupError, g.users, 3)
+
+        self.assertEqual(len(self.samples), 1)
+        self.assertIsNone(self.samples[0].status)
+        self.assertIn('prepare', self.samples[0].phases)
+        self.assertEqual(self.metrics.as_dict()['GET users/:arg']['statuses'],
+                         {'None': 1})
+
+    def test_to_prometheus(self):
+        metrics = RequestMetrics(buckets=(0.1, 1))
+        metrics.record(RequestSample('get', 'users/:arg',
+                                     {'prepare': 0.05, 'send': 0.5}, 200,
+                                     0, 9))
+        metrics.record(RequestSample('get', 'users/:arg', {'prepare': 2.0},
+                                     None))
+        metrics.record(RequestSample('post', 'say "hi"', {'send': 0.25},
+                                     201, 20, 7))
+
+        self.assertEqual(metrics.to_prometheus(), '''\
+# TYPE frappy_request_phase_seconds histogram
+frappy_request_phase_seconds_bucket{method="GET",endpoint="users/:arg",\
+phase="prepare",le="0.1"} 1
+frappy_request_phase_seconds_bucket{method="GET",endpoint="users/:arg",\
+phase="prepare",le="1.0"} 1
+frappy_request_phase_seconds_bucket{method="GET",endpoint="users/:arg",\
+phase="prepare",le="+Inf"} 2
+frappy_request_phase_seconds_sum{method="GET",endpoint="users/:arg",\
+phase="prepare"} 2.05
+frappy_request_phase_seconds_count{method="GET",endpoint="users/:arg",\
+phase="prepare"} 2
+frappy_request_phase_seconds_bucket{method="GET",endpoint="users/:arg",\
+phase="send",le="0.1"} 0
+frappy_request_phase_seconds_bucket{method="GET",endpoint="users/:arg",\
+phase="send",le="1.0"} 1
+frappy_request_phase_seconds_bucket{method="GET",endpoint="users/:arg",\
+phase="send",le="+Inf"} 1
+frappy_request_phase_seconds_sum{method="GET",endpoint="users/:arg",\
+phase="send"} 0.5
+frappy_request_phase_seconds_count{method="GET",endpoint="users/:arg",\
+phase="send"} 1
+frappy_request_phase_seconds_bucket{method="POST",endpoint="say \\"hi\\"",\
+phase="send",le="0.1"} 0
+frappy_request_phase_seconds_bucket{method="POST",endpoint="say \\"hi\\"",\
+phase="send",le="1.0"} 1
+frappy_request_phase_seconds_bucket{method="POST",endpoint="say \\"hi\\"",\
+phase="send",le="+Inf"} 1
+frappy_request_phase_seconds_sum{method="POST",endpoint="say \\"hi\\"",\
+phase="send"} 0.25
+frappy_request_phase_seconds_count{method="POST",endpoint="say \\"hi\\"",\
+phase="send"} 1
+# TYPE frappy_requests_total counter
+frappy_requests_total{method="GET",endpoint="users/:arg",status="200"} 1
+frappy_requests_total{method="GET",endpoint="users/:arg",status="error"} 1
+frappy_requests_total{method="POST",endpoint="say \\"hi\\"",status="201"} 1
+# TYPE frappy_request_bytes_total counter
+frappy_request_bytes_total{method="GET",endpoint="users/:arg"} 0
+frappy_request_bytes_total{method="POST",endpoint="say \\"hi\\""} 20
+# TYPE frappy_response_bytes_total counter
+frappy_response_bytes_total{method="GET",endpoint="users/:arg"} 9
+frappy_response_bytes_total{method="POST",endpoint="say \\"hi\\""} 7
+''')
+
+        self.assertEqual(json.loads(metrics.to_json())['GET users/:arg'], {
+            'statuses': {'200': 1, 'None': 1},
+            'bytes_out': 0,
+            'bytes_in': 9,
+            'phases': {
+                'prepare': {'count': 2, 'sum': 2.05,
+                            'buckets': [['0.1', 1], ['1.0', 1],
+                                        ['+Inf', 2]]},
+                'send': {'count': 1, 'sum': 0.5,
+                         'buckets': [['0.1', 0], ['1.0', 1], ['+Inf', 1]]},
+            },
+        })
+
+
+if __name__ == "__main__":
+    unittest.main()
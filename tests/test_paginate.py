@@ -0,0 +1,69 @@
+"""
+Tests for paginating calls, replaying a cassette.
+"""
+
+import asyncio
+import json
+import unittest
+from unittest import mock
+
+from frappy.core.transport import Cassette, ReplayPool
+from frappy.services.twitter.twitter import Twitter
+from frappy.services.twitter.twitter_async import AsyncTwitter
+
+FOLLOWERS = 'https://api.twitter.com/1/statuses/followers.json'
+
+
+class PaginateTest(unittest.TestCase):
+
+    def setUp(self):
+        cassette = Cassette()
+        for cursor, ids, next_cursor in (('-1', [1, 2], 7), ('7', [3], 0),
+                                         ('-2', [4], 8)):
+            cassette.add('get', FOLLOWERS + '?cursor=' + cursor, None, 200,
+                         {'Content-Type': 'application/json'},
+                         json.dumps({'users': [{'id': user_id}
+                                               for user_id in ids],
+                                     'next_cursor': next_cursor}))
+        cassette.add('get', FOLLOWERS + '?cursor=8', None, 304, {}, b'')
+
+        self.pool = ReplayPool(cassette)
+        self.twitter = Twitter(pool=self.pool)
+
+    def test_pagination_per_call(self):
+        users = self.twitter.statuses.followers.paginate(
+                                            cursor=-1, pagination='cursor')
+
+        self.assertEqual([user['id'] for user in users], [1, 2, 3])
+        self.assertEqual(self.twitter.pagination, 'max_id')
+
+    def test_not_modified(self):
+        # Without a cache 304 responses come back as an empty list
+        users = self.twitter.statuses.followers.paginate(
+                                            cursor=-2, pagination='cursor')
+
+        self.assertEqual([user['id'] for user in users], [4])
+
+    def test_async(self):
+        async def paginate(cursor):
+            twitter = AsyncTwitter(pool=self.pool)
+            try:
+                return [user['id'] async for user in
+                        twitter.statuses.followers.paginate(
+                                        cursor=cursor, pagination='cursor')]
+            finally:
+                await twitter.close()
+
+        # Send requests through the replaying pool instead of aiohttp
+        with mock.patch('frappy.core.async_api._get_aiohttp',
+                        return_value=None):
+            self.assertEqual(asyncio.run(paginate(-1)), [1, 2, 3])
+            self.assertEqual(asyncio.run(paginate(-2)), [4])
+
+    def test_unknown_pagination(self):
+        self.assertRaises(ValueError, self.twitter.statuses.followers.paginate,
+                          cursor=-1, pagination='pages')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+"""
+Tests for frappy.core.pool, against a local server.
+"""
+
+import time
+import unittest
+
+from frappy.core.pool import NETWORK_ERRORS, RETRY_METHODS, ConnectionPool
+
+from benchmarks.server import StandInHandler, start_server
+
+
+class PortHandler(StandInHandler):
+    """
+    Answer with the port of the client's connection, dropping the
+    connection on the first request of every path starting with /flaky
+    """
+
+    def _respond(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            self.rfile.read(length)
+
+        if self.path.startswith('/flaky') and \
+                self.path not in self.server.dropped:
+            self.server.dropped.add(self.path)
+            self.close_connection = True
+            return
+
+        body = str(self.client_address[1]).encode('ascii')
+
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_HEAD = do_POST = do_PUT = do_DELETE = _respond
+
+
+class ConnectionPoolTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server, domain = start_server(PortHandler)
+        cls.server.dropped = set()
+        cls.base_uri = 'http://%s/' % (domain)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+
+    def client_ports(self, pool, method='get', paths=('a', 'b', 'c')):
+        return [pool.request(method, self.base_uri + path).text
+                for path in paths]
+
+    def test_keep_alive(self):
+        pool = ConnectionPool()
+        self.addCleanup(pool.close)
+
+        ports = self.client_ports(pool) + self.client_ports(pool, 'post')
+        self.assertEqual(len(set(ports)), 1)
+
+    def test_idle_connections_dropped(self):
+        pool = ConnectionPool(keepalive_timeout=0.05)
+        self.addCleanup(pool.close)
+
+        first, second = self.client_ports(pool, paths=('a', 'b'))
+        self.assertEqual(first, second)
+
+        time.sleep(0.1)
+        third, = self.client_ports(pool, paths=('c',))
+        self.assertNotEqual(second, third)
+
+    def test_retry_settings(self):
+        pool = ConnectionPool(retries=3)
+        self.addCleanup(pool.close)
+
+        for prefix in ('http://', 'https://'):
+            retry = pool.session.get_adapter(prefix).max_retries
+            self.assertEqual((retry.total, retry.connect, retry.read,
+                              retry.redirect, retry.status),
+                             (3, 3, 3, 0, 0))
+            self.assertEqual(getattr(retry, 'allowed_methods', None) or
+                             retry.method_whitelist, RETRY_METHODS)
+
+    def test_only_safe_methods_retried(self):
+        pool = ConnectionPool()
+        self.addCleanup(pool.close)
+
+        self.assertTrue(pool.request('get', self.base_uri + 'flaky/get').ok)
+        self.assertRaises(NETWORK_ERRORS, pool.request, 'post',
+                          self.base_uri + 'flaky/post')
+        self.assertRaises(NETWORK_ERRORS, pool.request, 'put',
+                          self.base_uri + 'flaky/put')
+
+
+if __name__ == "__main__":
+    unittest.main()
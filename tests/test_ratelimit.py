@@ -0,0 +1,99 @@
+"""
+Tests for frappy.core.ratelimit, replaying a cassette.
+"""
+
+import time
+import unittest
+from unittest import mock
+
+from frappy.core.ratelimit import RateLimiter, RateLimitError
+from frappy.core.transport import Cassette, ReplayPool
+from frappy.services.github import Github
+
+KEY = ('https://api.github.com', None)
+
+
+def limit_headers(remaining, reset_in, limit=5000):
+    return {'x-ratelimit-limit': str(limit),
+            'x-ratelimit-remaining': str(remaining),
+            'x-ratelimit-reset': str(int(time.time() + reset_in))}
+
+
+class RateLimiterTest(unittest.TestCase):
+
+    def acquire_delays(self, limiter, count):
+        """Return the seconds every one of count acquires slept"""
+
+        delays = []
+        with mock.patch('time.sleep') as sleep:
+            for _ in range(count):
+                sleep.reset_mock()
+                limiter.acquire(KEY)
+                delays.append(sum(args[0] for args, _ in
+                                  sleep.call_args_list))
+        return delays
+
+    def test_unknown_policy(self):
+        self.assertRaises(ValueError, RateLimiter, 'wait')
+
+    def test_nothing_known(self):
+        for policy in RateLimiter.policies:
+            self.assertEqual(self.acquire_delays(RateLimiter(policy), 3),
+                             [0, 0, 0])
+
+    def test_queue_spreads_requests(self):
+        limiter = RateLimiter('queue')
+        limiter.update(KEY, limit_headers(4, 100))
+
+        delays = self.acquire_delays(limiter, 4)
+
+        self.assertEqual(delays[0], 0)
+        self.assertTrue(delays[0] < delays[1] < delays[2] < delays[3])
+        self.assertTrue(20 < delays[1] < 30)
+
+    def test_block_until_reset(self):
+        limiter = RateLimiter('block', poll_interval=0.05)
+        # In seconds from now, as some APIs send it
+        limiter.update(KEY, dict(limit_headers(2, 0),
+                                 **{'x-ratelimit-reset': '0.3'}))
+
+        self.assertEqual(self.acquire_delays(limiter, 2), [0, 0])
+
+        start = time.time()
+        limiter.acquire(KEY)
+        self.assertTrue(time.time() - start >= 0.2)
+
+    def test_fail_when_used_up(self):
+        limiter = RateLimiter('fail')
+        limiter.update(KEY, limit_headers(1, 100))
+
+        limiter.acquire(KEY)
+        self.assertRaises(RateLimitError, limiter.acquire, KEY, '/users')
+
+    def test_tokens_never_handed_back(self):
+        limiter = RateLimiter('fail')
+        headers = limit_headers(1, 100)
+        limiter.update(KEY, headers)
+        limiter.acquire(KEY)
+
+        # Response to a request sent before the last one was counted
+        limiter.update(KEY, headers)
+        self.assertRaises(RateLimitError, limiter.acquire, KEY)
+
+    def test_calls_replayed(self):
+        cassette = Cassette()
+        cassette.add('get', 'https://api.github.com/users/durden', None, 200,
+                     dict(limit_headers(1, 100),
+                          **{'Content-Type': 'application/json'}),
+                     b'{"id": 1}')
+
+        g = Github(pool=ReplayPool(cassette),
+                   rate_limiter=RateLimiter('fail'))
+
+        self.assertEqual(g.users.durden().response, {'id': 1})
+        self.assertEqual(g.users.durden().response, {'id': 1})
+        self.assertRaises(RateLimitError, g.users.durden)
+
+
+if __name__ == "__main__":
+    unittest.main()
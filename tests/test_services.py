@@ -0,0 +1,41 @@
+"""
+Tests for the services in frappy.services.
+"""
+
+import unittest
+
+from frappy.core.cache import MemoryCache
+from frappy.core.transport import Cassette, ReplayPool
+from frappy.services.codrspace import Codrspace
+from frappy.services.forrst import Forrst
+from frappy.services.github import Github
+from frappy.services.twitter.stream import TwitterStream
+from frappy.services.twitter.twitter import Twitter
+
+
+class ServiceOptionsTest(unittest.TestCase):
+
+    def test_options_passed_on(self):
+        pool = ReplayPool(Cassette())
+        cache = MemoryCache()
+
+        for service in (Github(pool=pool, cache=cache,
+                               compress_requests='gzip'),
+                        Forrst(pool=pool, cache=cache,
+                               compress_requests='gzip'),
+                        Codrspace('durden', 'key', pool=pool, cache=cache,
+                                  compress_requests='gzip'),
+                        Twitter(pool=pool, cache=cache,
+                                compress_requests='gzip'),
+                        TwitterStream(pool=pool, cache=cache,
+                                      compress_requests='gzip')):
+            self.assertIs(service.pool, pool)
+            self.assertIs(service.cache, cache)
+            self.assertEqual(service.compress_requests, 'gzip')
+
+    def test_unknown_option(self):
+        self.assertRaises(TypeError, TwitterStream, compress='gzip')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+"""
+Tests for frappy.core.singleflight.
+"""
+
+import asyncio
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from frappy.core.api import APICall
+from frappy.core.metrics import RequestMetrics
+from frappy.core.singleflight import SingleFlight
+from frappy.core.transport import Cassette, ReplayPool
+from frappy.services.github import Github
+
+
+def make_pool():
+    cassette = Cassette()
+    cassette.add('get', 'https://api.github.com/users/durden', None, 200,
+                 {'Content-Type': 'application/json'}, b'{"id": 1}')
+    return ReplayPool(cassette)
+
+
+class SingleFlightTest(unittest.TestCase):
+
+    def test_calls_in_flight_shared(self):
+        flights = SingleFlight()
+        release = threading.Event()
+        results = []
+
+        def call():
+            release.wait()
+            results.append(object())
+            return results[-1]
+
+        with ThreadPoolExecutor(5) as executor:
+            futures = [executor.submit(flights.do, 'key', call)
+                       for _ in range(5)]
+            while flights.calls + flights.shared < 5:
+                release.wait(0.01)
+            release.set()
+
+        self.assertEqual(len(results), 1)
+        self.assertEqual([future.result() for future in futures],
+                         results * 5)
+        self.assertEqual((flights.calls, flights.shared), (1, 4))
+
+        # Nothing in flight any more, so the next call is made again
+        flights.do('key', call)
+        self.assertEqual(len(results), 2)
+
+    def test_errors_shared(self):
+        flights = SingleFlight()
+        release = threading.Event()
+
+        def call():
+            release.wait()
+            raise KeyError('durden')
+
+        with ThreadPoolExecutor(3) as executor:
+            futures = [executor.submit(flights.do, 'key', call)
+                       for _ in range(3)]
+            while flights.calls + flights.shared < 3:
+                release.wait(0.01)
+            release.set()
+
+        for future in futures:
+            self.assertRaises(KeyError, future.result)
+        self.assertEqual(flights.calls, 1)
+
+    def test_calls_in_flight_shared_async(self):
+        flights = SingleFlight()
+        calls = []
+
+        async def call():
+            calls.append(None)
+            await asyncio.sleep(0.01)
+            return len(calls)
+
+        async def main():
+            return await asyncio.gather(*[flights.do_async('key', call)
+                                          for _ in range(5)])
+
+        self.assertEqual(asyncio.run(main()), [1] * 5)
+        self.assertEqual((flights.calls, flights.shared), (1, 4))
+
+
+class SingleFlightCallTest(unittest.TestCase):
+
+    def test_request_args_built_once(self):
+        for metrics in (None, RequestMetrics()):
+            g = Github(pool=make_pool(), single_flight=SingleFlight(),
+                       metrics=metrics)
+
+            with mock.patch.object(APICall, '_request_args', autospec=True,
+                                   side_effect=APICall._request_args) as args:
+                self.assertEqual(g.users.durden().response, {'id': 1})
+
+            self.assertEqual(args.call_count, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+"""
+Tests for parsing streamed responses: frappy.core.streaming and the framing
+of TwitterJSONIter.
+"""
+
+import io
+import json
+import random
+import unittest
+
+from frappy.core.streaming import iter_json_array
+from frappy.core.transport import Cassette, ReplayPool
+from frappy.services.github import Github
+from frappy.services.twitter.stream import TwitterJSONIter
+
+MESSAGES = [{'id': 1, 'text': u'first'},
+            {'id': 2, 'text': u'line\nbreak and ☃'},
+            {'delete': {'status': {'id': 1}}},
+            [1, 2.5, -3e-2, None, True, u'x']]
+
+
+def split(data, rand, max_size=7):
+    """Return data split up in chunks of random sizes"""
+
+    chunks = []
+    while data:
+        size = rand.randint(1, max_size)
+        chunks.append(data[:size])
+        data = data[size:]
+    return chunks
+
+
+class ChunkedReader(object):
+    """File returning chunks of data from read1, like a socket would"""
+
+    def __init__(self, chunks):
+        self.chunks = list(chunks)
+
+    def read1(self, size):
+        if not self.chunks:
+            return b''
+        return self.chunks.pop(0)[:size]
+
+    read = read1
+
+
+class TwitterJSONIterTest(unittest.TestCase):
+
+    def messages(self, data, read_size=8192):
+        return list(TwitterJSONIter(io.BytesIO(data), {}, read_size))
+
+    def test_newline_framing(self):
+        data = b'\r\n'.join(json.dumps(message).encode('utf8')
+                            for message in MESSAGES) + b'\r\n'
+
+        for read_size in (1, 3, 8192):
+            self.assertEqual(self.messages(data, read_size), MESSAGES)
+
+    def test_keep_alives_skipped(self):
+        data = b'\r\n\r\n{"id": 1}\r\n\r\n\r\n{"id": 2}\r\n\r\n'
+
+        self.assertEqual(self.messages(data, 2), [{'id': 1}, {'id': 2}])
+
+    def test_length_delimited(self):
+        data = b''
+        for message in MESSAGES:
+            encoded = json.dumps(message).encode('utf8') + b'\r\n'
+            data += b'%i\r\n' % (len(encoded)) + encoded
+
+        rand = random.Random(0)
+        for _ in range(20):
+            reader = ChunkedReader(split(data, rand))
+            self.assertEqual(list(TwitterJSONIter(reader, {}, 8192)),
+                             MESSAGES)
+
+    def test_max_buffer(self):
+        stream = TwitterJSONIter(io.BytesIO(b'{"text": "' + b'x' * 100),
+                                 {}, read_size=10, max_buffer=50)
+
+        self.assertRaises(ValueError, list, stream)
+
+
+class IterJSONArrayTest(unittest.TestCase):
+
+    def test_any_chunking(self):
+        data = json.dumps(MESSAGES * 3).encode('utf8')
+
+        rand = random.Random(0)
+        for _ in range(50):
+            self.assertEqual(list(iter_json_array(split(data, rand))),
+                             MESSAGES * 3)
+
+    def test_empty(self):
+        self.assertEqual(list(iter_json_array([b' [ ', b'] '])), [])
+
+    def test_errors(self):
+        for chunks in ([b'{"id": 1}'], [b'[1, 2'], [b'[1 2]'], [b'[1]', b'2'],
+                       [b'[1, {"a"', b']']):
+            self.assertRaises(ValueError, list, iter_json_array(chunks))
+
+    def test_replayed_response(self):
+        cassette = Cassette()
+        cassette.add('get', 'https://api.github.com/users', None, 200,
+                     {'Content-Type': 'application/json'},
+                     json.dumps(MESSAGES))
+
+        g = Github(pool=ReplayPool(cassette))
+        with g.users(stream='items') as users:
+            self.assertEqual(list(users), MESSAGES)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,41 @@
+"""
+Tests for frappy.core.util.
+"""
+
+import io
+import unittest
+
+from frappy.core.util import OutputBuffer, decode_many, htmlentitydecode
+
+
+class HTMLEntityDecodeTest(unittest.TestCase):
+
+    def test_entities(self):
+        self.assertEqual(htmlentitydecode('&lt;&amp;&gt; &#39;&#x263a;&#X263A;'
+                                          ' &bogus; & &#; &#xZ;'),
+                         u"<&> '☺☺ &bogus; & &#; &#xZ;")
+
+    def test_unencodable_references_replaced(self):
+        for entity in ('&#55357;', '&#xD83D;', '&#56832;', '&#xdfff;',
+                       '&#0;', '&#x0;', '&#1114112;', '&#x110000;',
+                       '&#99999999999999999999;'):
+            self.assertEqual(htmlentitydecode(entity), u'�', entity)
+
+        decoded = htmlentitydecode('&#55357;&#56832; &#x10FFFF; &#xD7FF;')
+        self.assertEqual(decoded, u'�� \U0010ffff ퟿')
+
+        # Which then encodes, as printing and archiving it does
+        output = io.StringIO()
+        buffered = OutputBuffer(output)
+        buffered.write(decoded)
+        buffered.flush()
+        self.assertEqual(output.getvalue().encode('utf8'),
+                         decoded.encode('utf8'))
+
+    def test_decode_many(self):
+        self.assertEqual(decode_many(['&#0;', 'plain', '&amp;']),
+                         [u'�', 'plain', '&'])
+
+
+if __name__ == "__main__":
+    unittest.main()